@@ -5,33 +5,58 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+from typing import Optional
+
 from flask import Flask
-from database import init_database, add_sample_data
+from database import init_database, add_sample_data, release_db_connection
 from routes import register_blueprints
+from commands import register_commands
+from instrumentation import init_instrumentation
+
 
+# Load the sample books on startup (LIBRARY_SAMPLE_DATA=1); off by default so
+# production workers don't touch the books table while booting
+SAMPLE_DATA_ENABLED = os.environ.get('LIBRARY_SAMPLE_DATA', '0') == '1'
 
-def create_app():
+
+def create_app(sample_data: Optional[bool] = None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        sample_data: Add the sample books to an empty catalog
+            (default: the LIBRARY_SAMPLE_DATA environment variable)
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
+    # Request timing, SQL/gateway counters and /metrics (LIBRARY_INSTRUMENTATION=1)
+    init_instrumentation(app)
+    
+    # Bring the schema up to date; a single PRAGMA read when it already is
     init_database()
     
     # Add sample data for testing and demonstration
-    add_sample_data()
+    if SAMPLE_DATA_ENABLED if sample_data is None else sample_data:
+        add_sample_data()
+    
+    # Return each request's pooled database connection when its context ends
+    app.teardown_appcontext(release_db_connection)
     
     # Register all route blueprints
     register_blueprints(app)
     
+    # Register command line tools (flask --app app:create_app <command>)
+    register_commands(app)
+    
     return app
 
 
 if __name__ == '__main__':
-    app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only; use gunicorn -c gunicorn.conf.py wsgi:app in production
+    app = create_app(sample_data=True)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1', host='0.0.0.0', port=5000)
@@ -0,0 +1,7 @@
+"""
+Benchmarks for the Library Management System.
+
+Each bench_*.py module is runnable on its own, e.g.
+    python -m benchmarks.bench_borrow_indexes --loans 1000000
+and works against a throwaway database file, never library.db.
+"""
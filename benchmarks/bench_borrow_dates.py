@@ -0,0 +1,116 @@
+"""
+ISO text dates versus INTEGER Unix timestamps in borrow_records: decoding
+loan rows into datetimes and filtering overdue loans.
+
+The seeded borrow_records table is copied into borrow_records_text with the
+dates written back out as ISO text, indexed the same way, and the same
+queries are run against both.
+
+    python -m benchmarks.bench_borrow_dates --loans 1000000
+"""
+
+import argparse
+from datetime import datetime
+
+import database
+from benchmarks.common import temp_database, seed_books, seed_loans, time_call, print_result
+
+
+def make_text_copy() -> None:
+    conn = database.get_db_connection()
+    conn.execute('''
+        CREATE TABLE borrow_records_text AS
+        SELECT id, patron_id, book_id,
+               strftime('%Y-%m-%dT%H:%M:%S', borrow_date, 'unixepoch', 'localtime') AS borrow_date,
+               strftime('%Y-%m-%dT%H:%M:%S', due_date, 'unixepoch', 'localtime') AS due_date,
+               strftime('%Y-%m-%dT%H:%M:%S', return_date, 'unixepoch', 'localtime') AS return_date
+        FROM borrow_records
+    ''')
+    conn.execute('CREATE INDEX idx_text_due ON borrow_records_text (due_date)')
+    conn.execute('CREATE INDEX idx_text_open_due ON borrow_records_text (due_date) WHERE return_date IS NULL')
+    conn.execute('CREATE INDEX idx_int_due ON borrow_records (due_date)')
+    conn.commit()
+    conn.close()
+
+
+def fetch(sql, params=()):
+    conn = database.get_db_connection()
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+def decode_text(rows):
+    # the conversions get_patron_borrowed_books() did per row before
+    return [{'borrow_date': datetime.fromisoformat(row['borrow_date']),
+             'due_date': datetime.fromisoformat(row['due_date']),
+             'is_overdue': datetime.now() > datetime.fromisoformat(row['due_date'])} for row in rows]
+
+
+def decode_int(rows):
+    now = database.to_timestamp(datetime.now())
+    return [{'borrow_date': database.from_timestamp(row['borrow_date']),
+             'due_date': database.from_timestamp(row['due_date']),
+             'is_overdue': now > row['due_date']} for row in rows]
+
+
+def run(books: int, loans: int, repeat: int) -> dict:
+    results = {}
+    with temp_database():
+        seed_books(books)
+        seed_loans(loans, max(1, loans // 10), books, open_ratio=0.05)
+        make_text_copy()
+
+        text_rows = fetch('SELECT * FROM borrow_records_text LIMIT 1000')
+        int_rows = fetch('SELECT * FROM borrow_records LIMIT 1000')
+        results["decode 1000 rows/text"] = time_call(lambda: decode_text(text_rows), repeat)
+        results["decode 1000 rows/integer"] = time_call(lambda: decode_int(int_rows), repeat)
+
+        now = datetime.now()
+        results["count overdue open loans/text"] = time_call(lambda: fetch(
+            'SELECT COUNT(*) FROM borrow_records_text WHERE return_date IS NULL AND due_date < ?',
+            (now.isoformat(),)), repeat)
+        results["count overdue open loans/integer"] = time_call(lambda: fetch(
+            'SELECT COUNT(*) FROM borrow_records WHERE return_date IS NULL AND due_date < ?',
+            (database.to_timestamp(now),)), repeat)
+
+        # loans due in one month, over the whole history
+        start, end = datetime(now.year - 1, 3, 1), datetime(now.year - 1, 4, 1)
+        results["due-date range, one month/text"] = time_call(lambda: fetch(
+            'SELECT COUNT(*), MIN(due_date) FROM borrow_records_text WHERE due_date >= ? AND due_date < ?',
+            (start.isoformat(), end.isoformat())), repeat)
+        results["due-date range, one month/integer"] = time_call(lambda: fetch(
+            'SELECT COUNT(*), MIN(due_date) FROM borrow_records WHERE due_date >= ? AND due_date < ?',
+            (database.to_timestamp(start), database.to_timestamp(end))), repeat)
+
+        conn = database.get_db_connection()
+        pages = {table: conn.execute(f"SELECT SUM(pgsize) FROM dbstat WHERE name = '{table}'").fetchone()[0]
+                 for table in ('borrow_records', 'borrow_records_text')} if _has_dbstat(conn) else {}
+        conn.close()
+        for table, size in pages.items():
+            print(f"{table:<24} {size / loans:6.1f} bytes per loan")
+    return results
+
+
+def _has_dbstat(conn) -> bool:
+    try:
+        conn.execute('SELECT 1 FROM dbstat LIMIT 1')
+        return True
+    except database.sqlite3.OperationalError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"--- {args.loans} loans")
+    for name, result in run(args.books, args.loans, args.repeat).items():
+        print_result(name, result)
+
+
+if __name__ == "__main__":
+    main()
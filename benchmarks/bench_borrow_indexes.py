@@ -0,0 +1,67 @@
+"""
+Open-loan lookups with and without the borrow_records indexes, and the
+patrons counter that replaced counting a patron's open loans.
+
+    python -m benchmarks.bench_borrow_indexes --loans 1000000
+"""
+
+import argparse
+import random
+
+import database
+from benchmarks.common import temp_database, seed_books, seed_loans, time_call, print_result
+
+OPEN_LOAN_INDEXES = ("idx_borrow_records_open_patron", "idx_borrow_records_open_book", "idx_borrow_records_open_due")
+
+
+def count_open_loans(patron_id: str) -> int:
+    # what get_patron_borrow_count() ran before the patrons table
+    conn = database.get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL",
+                         (patron_id,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def run(loans: int, patrons: int, books: int, repeat: int) -> dict:
+    results = {}
+    with temp_database():
+        seed_books(books)
+        seed_loans(loans, patrons, books)
+        rng = random.Random(1)
+        patron_ids = [f"{100000 + rng.randrange(patrons)}" for _ in range(repeat)]
+        results["get_patron_borrow_count (patrons counter)"] = time_call(
+            lambda: database.get_patron_borrow_count(rng.choice(patron_ids)), repeat)
+        calls = {
+            "COUNT(*) open loans": lambda: count_open_loans(rng.choice(patron_ids)),
+            "get_patron_borrowed_books": lambda: database.get_patron_borrowed_books(rng.choice(patron_ids)),
+        }
+
+        for name, fn in calls.items():
+            results[f"indexed/{name}"] = time_call(fn, repeat)
+
+        conn = database.get_db_connection()
+        for index in OPEN_LOAN_INDEXES:
+            conn.execute(f"DROP INDEX {index}")
+        conn.commit()
+        conn.close()
+
+        for name, fn in calls.items():
+            results[f"full_scan/{name}"] = time_call(fn, max(1, repeat // 20))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=1_000_000, help="historical loans to seed")
+    parser.add_argument("--patrons", type=int, default=20_000)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, result in run(args.loans, args.patrons, args.books, args.repeat).items():
+        print_result(name, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Whole-catalog listing versus keyset pages, in the data layer and through
+the /catalog and /api/books routes.
+
+    python -m benchmarks.bench_catalog_pages --scales 10000,100000,1000000
+"""
+
+import argparse
+
+import database
+from benchmarks.common import temp_database, seed_books, time_call, print_result
+
+
+def run(books: int, repeat: int) -> dict:
+    from app import create_app
+
+    results = {}
+    with temp_database():
+        seed_books(books)
+        app = create_app()
+        client = app.test_client()
+
+        # a key roughly in the middle of the catalog, to show deep pages cost the same
+        middle = (f"Title {books // 2:07d}", books // 2)
+
+        results["get_all_books"] = time_call(database.get_all_books, max(1, repeat // 50))
+        results["get_books_page/first"] = time_call(lambda: database.get_books_page(None, 50), repeat)
+        results["get_books_page/middle"] = time_call(lambda: database.get_books_page(middle, 50), repeat)
+        results["GET /catalog"] = time_call(lambda: client.get("/catalog"), repeat)
+        cursor = database.encode_cursor(middle)
+        results["GET /catalog?after=middle"] = time_call(lambda: client.get(f"/catalog?after={cursor}"), repeat)
+        results["GET /api/books"] = time_call(lambda: client.get("/api/books?limit=100"), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10000,100000,1000000", help="comma-separated catalog sizes")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    for books in (int(scale) for scale in args.scales.split(",")):
+        print(f"--- {books} books")
+        for name, result in run(books, args.repeat).items():
+            print_result(name, result)
+
+
+if __name__ == "__main__":
+    main()
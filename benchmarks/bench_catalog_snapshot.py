@@ -0,0 +1,120 @@
+"""
+The in-memory catalog snapshot versus reading the books table: memory per
+book, the first load, whole-catalog listing, keyset catalog pages (with and
+without a write before each read) and the substring search used when SQLite
+lacks FTS5.
+
+    python -m benchmarks.bench_catalog_snapshot --scales 10000,100000
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+
+import database
+from benchmarks.common import temp_database, seed_books, time_call, print_result
+
+
+def traced_bytes(build) -> int:
+    """Bytes still allocated by build() while its result is alive."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def sql_books():
+    conn = database.get_db_connection()
+    rows = conn.execute('SELECT * FROM books ORDER BY title, id').fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def sql_page(after):
+    enabled = database.CATALOG_SNAPSHOT_ENABLED
+    database.CATALOG_SNAPSHOT_ENABLED = False
+    try:
+        return database.get_books_page(after, 50)
+    finally:
+        database.CATALOG_SNAPSHOT_ENABLED = enabled
+
+
+def sql_substring(term):
+    conn = database.get_db_connection()
+    rows = conn.execute("SELECT * FROM books WHERE title LIKE ? ORDER BY title, id",
+                        (f"%{term}%",)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def run(books: int, repeat: int) -> dict:
+    rng = random.Random(3)
+    results = {}
+    with temp_database():
+        seed_books(books)
+
+        def snapshot():
+            database.catalog_snapshot.clear()
+            database.catalog_snapshot.records()
+            return database.catalog_snapshot
+
+        dict_bytes = traced_bytes(sql_books)
+        snapshot_bytes = traced_bytes(snapshot)
+        print(f"memory per book: list of dicts {dict_bytes / books:7.0f} B   "
+              f"snapshot {snapshot_bytes / books:7.0f} B   (x{dict_bytes / snapshot_bytes:.2f})")
+
+        slow = max(1, repeat // 20)
+        results["first load (each process)"] = time_call(snapshot, slow)
+        results["get_all_books/sql"] = time_call(sql_books, slow)
+        results["get_all_books/snapshot"] = time_call(database.get_all_books, slow)
+        results["snapshot records()"] = time_call(database.catalog_snapshot.records, slow)
+
+        # a key roughly in the middle of the catalog
+        middle = (f"Title {books // 2:07d}", books // 2)
+        results["catalog page/sql keyset"] = time_call(lambda: sql_page(middle), repeat)
+        results["catalog page/snapshot"] = time_call(lambda: database.get_books_page(middle, 50), repeat)
+
+        term = lambda: f"{rng.randrange(books):07d}"[:4]
+        results["substring search/sql LIKE"] = time_call(lambda: sql_substring(term()), slow)
+        results["substring search/snapshot"] = time_call(
+            lambda: database._search_snapshot(term(), "title"), slow)
+
+        # one write, then the read that catches up with it
+        conn = database.get_db_connection()
+
+        def write_then(read):
+            # what a borrow or return does to the books table
+            conn.execute("UPDATE books SET available_copies = available_copies WHERE id = ?",
+                         (rng.randint(1, books),))
+            conn.commit()
+            read()
+
+        results["write only"] = time_call(lambda: write_then(lambda: None), repeat)
+        results["write + page/sql keyset"] = time_call(lambda: write_then(lambda: sql_page(middle)), repeat)
+        results["write + page/snapshot"] = time_call(
+            lambda: write_then(lambda: database.get_books_page(middle, 50)), repeat)
+        results["write + records()"] = time_call(lambda: write_then(database.catalog_snapshot.records), slow)
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10000,100000", help="comma-separated catalog sizes")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for books in (int(scale) for scale in args.scales.split(",")):
+        print(f"--- {books} books")
+        for name, result in run(books, args.repeat).items():
+            print_result(name, result)
+
+
+if __name__ == "__main__":
+    main()
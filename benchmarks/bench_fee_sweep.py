@@ -0,0 +1,52 @@
+"""
+Library-wide late fee sweep versus calling calculate_late_fee_for_book per loan.
+
+    python -m benchmarks.bench_fee_sweep --loans 2000000 --open-ratio 0.25
+"""
+
+import argparse
+import random
+import time
+
+import database
+from benchmarks.common import temp_database, seed_books, seed_loans, time_call, print_result
+from services.fee_service import sweep_late_fees
+from services.library_service import calculate_late_fee_for_book
+
+
+def run(loans: int, open_ratio: float, patrons: int, books: int) -> dict:
+    results = {}
+    with temp_database():
+        seed_books(books)
+        seed_loans(loans, patrons, books, open_ratio=open_ratio)
+
+        conn = database.get_db_connection()
+        open_loans = conn.execute(
+            "SELECT patron_id, book_id FROM borrow_records WHERE return_date IS NULL").fetchall()
+        conn.close()
+
+        results["sweep_late_fees"] = time_call(sweep_late_fees, 3)
+        sample = random.Random(1).sample(list(open_loans), min(200, len(open_loans)))
+        per_loan = time_call(lambda: calculate_late_fee_for_book(*random.choice(sample)), len(sample))
+        results["calculate_late_fee_for_book (one loan)"] = per_loan
+        results["open_loans"] = len(open_loans)
+        results["per_loan_estimate_s"] = per_loan["mean_ms"] * len(open_loans) / 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=2_000_000)
+    parser.add_argument("--open-ratio", type=float, default=0.25)
+    parser.add_argument("--patrons", type=int, default=200_000)
+    parser.add_argument("--books", type=int, default=50_000)
+    args = parser.parse_args()
+
+    results = run(args.loans, args.open_ratio, args.patrons, args.books)
+    print_result("sweep_late_fees", results["sweep_late_fees"])
+    print_result("calculate_late_fee_for_book (one loan)", results["calculate_late_fee_for_book (one loan)"])
+    print(f"per-loan loop over {results['open_loans']} open loans would take ~{results['per_loan_estimate_s']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
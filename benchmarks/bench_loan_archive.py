@@ -0,0 +1,91 @@
+"""
+Hot borrow_records queries before and after archiving closed loans.
+
+Seeds a long loan history (default 1M loans over three years, almost all
+returned), times the queries borrows, returns and fee jobs run, archives
+loans returned more than --older-than-days ago and times them again.
+
+    python -m benchmarks.bench_loan_archive --loans 10000000
+"""
+
+import argparse
+import random
+
+import database
+from benchmarks.common import temp_database, seed_books, seed_loans, time_call, print_result
+from services.archive_service import archive_closed_loans, get_archive_stats
+from services.fee_service import sweep_late_fees
+
+BENCH_PATRON = "999999"
+
+
+def table_pages(table: str) -> int:
+    conn = database.get_db_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+    except database.sqlite3.OperationalError:   # SQLite built without dbstat
+        return -1
+    finally:
+        conn.close()
+
+
+def hot_queries(books: int, patrons: int, repeat: int) -> dict:
+    rng = random.Random(4)
+    patron_ids = [f"{100000 + rng.randrange(patrons)}" for _ in range(repeat)]
+    cycle_books = [rng.randint(1, books) for _ in range(repeat)]
+    results = {
+        "get_patron_borrow_count": time_call(
+            lambda: database.get_patron_borrow_count(rng.choice(patron_ids)), repeat),
+        "get_patron_borrowed_books": time_call(
+            lambda: database.get_patron_borrowed_books(rng.choice(patron_ids)), repeat),
+        "sweep_late_fees": time_call(sweep_late_fees, max(1, repeat // 20)),
+        "check_patron_counters": time_call(database.check_patron_counters, 1),
+    }
+    now = database.datetime.now()
+    due = now + database.timedelta(days=14)
+    cycle = iter(range(10 ** 9))
+
+    def borrow_and_return():
+        book_id = cycle_books[next(cycle) % repeat]
+        database.borrow_book_transaction(BENCH_PATRON, book_id, now, due)
+        database.return_book_transaction(BENCH_PATRON, book_id, now)
+
+    results["borrow + return"] = time_call(borrow_and_return, repeat)
+    return results
+
+
+def run(loans: int, patrons: int, books: int, older_than_days: int, repeat: int) -> None:
+    with temp_database():
+        seed_books(books)
+        seed_loans(loans, patrons, books)
+
+        print(f"--- before: {get_archive_stats()}, borrow_records {table_pages('borrow_records')} pages")
+        for name, result in hot_queries(books, patrons, repeat).items():
+            print_result(name, result)
+
+        report = archive_closed_loans(older_than_days)
+        print(f"archived {report['archived']} loans in {report['batches']} batches, {report['seconds']:.1f}s "
+              f"({report['archived'] / max(report['seconds'], 1e-9):.0f} loans/s)")
+        conn = database.get_db_connection()
+        conn.execute("VACUUM")   # give the freed pages back, so page counts compare
+        conn.close()
+
+        print(f"--- after: {get_archive_stats()}, borrow_records {table_pages('borrow_records')} pages")
+        for name, result in hot_queries(books, patrons, repeat).items():
+            print_result(name, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--patrons", type=int, default=50_000)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--older-than-days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.loans, args.patrons, args.books, args.older_than_days, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Overdue notice job: throughput and peak Python memory as the number of
+overdue loans grows. Peak memory should stay flat.
+
+    python -m benchmarks.bench_overdue_notices --loans 100000,1000000,10000000
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from benchmarks.common import temp_database, seed_books, seed_loans
+from services.notice_service import write_overdue_notices
+
+
+def run(loans: int, books: int, fmt: str) -> dict:
+    with temp_database():
+        # a high open ratio so most seeded loans are overdue
+        seed_loans(loans, max(1, loans // 5), books, open_ratio=0.5)
+        seed_books(books)
+        with open(os.devnull, "w") as sink:
+            start = time.perf_counter()
+            report = write_overdue_notices(sink, fmt)
+            seconds = time.perf_counter() - start
+            # a second, traced run for memory: tracing slows the job down several times
+            tracemalloc.start()
+            write_overdue_notices(sink, fmt)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    report.update(seconds=seconds, peak_kib=peak / 1024, loans_per_sec=report["loans"] / seconds)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", default="100000,1000000", help="comma-separated loan counts to seed")
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--format", dest="fmt", choices=["jsonl", "csv"], default="jsonl")
+    args = parser.parse_args()
+
+    for loans in (int(count) for count in args.loans.split(",")):
+        result = run(loans, args.books, args.fmt)
+        print(f"{loans:>10} loans: {result['loans']:>9} overdue for {result['patrons']:>8} patrons in "
+              f"{result['seconds']:7.2f}s ({result['loans_per_sec']:8.0f} loans/s), "
+              f"peak Python memory {result['peak_kib']:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
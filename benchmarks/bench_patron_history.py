@@ -0,0 +1,54 @@
+"""
+Patron borrow history: the first page versus a deep page for a patron with
+many loans, before and after archiving. Deep pages should cost the same.
+
+    python -m benchmarks.bench_patron_history --loans 1000000 --patrons 100
+"""
+
+import argparse
+
+import database
+from benchmarks.common import temp_database, seed_books, seed_loans, time_call, print_result
+from services.archive_service import archive_closed_loans
+
+
+def run(loans: int, patrons: int, books: int, repeat: int) -> dict:
+    from app import create_app
+
+    results = {}
+    with temp_database():
+        seed_books(books)
+        seed_loans(loans, patrons, books)
+        client = create_app().test_client()
+        patron_id = "100000"
+
+        for stage in ("hot", "archived"):
+            if stage == "archived":
+                archive_closed_loans(older_than_days=365)
+            # the key of a loan roughly halfway through the patron's history
+            _, key = database.get_patron_borrow_history(patron_id, limit=loans // patrons // 2)
+            results[f"{stage}/first page"] = time_call(
+                lambda: database.get_patron_borrow_history(patron_id), repeat)
+            results[f"{stage}/middle page"] = time_call(
+                lambda: database.get_patron_borrow_history(patron_id, key), repeat)
+            cursor = database.encode_cursor(key)
+            results[f"{stage}/GET history?after=middle"] = time_call(
+                lambda: client.get(f"/api/patrons/{patron_id}/history?after={cursor}"), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=200_000)
+    parser.add_argument("--patrons", type=int, default=50)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"--- {args.loans} loans over {args.patrons} patrons")
+    for name, result in run(args.loans, args.patrons, args.books, args.repeat).items():
+        print_result(name, result)
+
+
+if __name__ == "__main__":
+    main()
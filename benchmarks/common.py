@@ -0,0 +1,96 @@
+"""
+Shared helpers for the benchmark scripts: throwaway databases, synthetic
+data and timing.
+"""
+
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+import database
+
+
+@contextmanager
+def temp_database() -> Iterator[str]:
+    """Point the database module at a fresh file in a temporary directory."""
+    original = database.DATABASE
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = str(Path(tmp) / "bench.db")
+        try:
+            database.init_database()
+            yield database.DATABASE
+        finally:
+            database.close_db_connections()
+            database.DATABASE = original
+
+
+def seed_books(count: int, copies: int = 5) -> None:
+    """Insert count synthetic books with distinct titles and ISBNs."""
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((f"Title {i:07d}", f"Author {i % 997}", f"{9000000000000 + i}", copies, copies)
+          for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def seed_loans(count: int, patrons: int, books: int, open_ratio: float = 0.001, seed: int = 327) -> None:
+    """
+    Insert count synthetic loans spread over the last few years.
+    Roughly open_ratio of them are still out; the rest have been returned.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    def rows():
+        for _ in range(count):
+            borrowed = now - timedelta(days=rng.randint(0, 3 * 365), seconds=rng.randint(0, 86399))
+            due = borrowed + timedelta(days=14)
+            returned = None if rng.random() < open_ratio else borrowed + timedelta(days=rng.randint(1, 20))
+            yield (f"{100000 + rng.randrange(patrons)}", rng.randint(1, books),
+                   database.to_timestamp(borrowed), database.to_timestamp(due),
+                   returned and database.to_timestamp(returned))
+
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+    conn.close()
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Summarize latencies in milliseconds: mean, percentiles and calls per second."""
+    samples = sorted(samples)
+    mean = statistics.fmean(samples)
+    return {
+        "calls": len(samples),
+        "mean_ms": mean,
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[max(0, int(len(samples) * 0.95) - 1)],
+        "max_ms": samples[-1],
+        "ops_per_sec": 1000 / mean if mean else float("inf"),
+    }
+
+
+def time_call(fn: Callable[[], object], repeat: int = 200) -> Dict:
+    """Call fn repeatedly and summarize the latencies in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def print_result(name: str, result: Dict) -> None:
+    print(f"{name:<40} mean {result['mean_ms']:9.3f} ms   p50 {result['p50_ms']:9.3f} ms   "
+          f"p95 {result['p95_ms']:9.3f} ms   ({result['calls']} calls)")
@@ -0,0 +1,149 @@
+"""
+Load test of the production server: throughput as gunicorn workers are added.
+
+Starts gunicorn (gunicorn.conf.py, wsgi:app) against a seeded throwaway
+database once per worker count, drives it with keep-alive HTTP clients for
+a fixed time and reports requests per second and latency.
+
+    python -m benchmarks.load_test --workers 1,2,4,8 --duration 10
+"""
+
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import database
+from benchmarks.common import seed_books, seed_loans
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start listening on port {port}")
+
+
+def drive(port: int, paths, clients: int, duration: float) -> dict:
+    """Send requests from `clients` keep-alive connections for `duration` seconds."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        i = index
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                ok = False
+            if ok:
+                mine.append((time.perf_counter() - start) * 1000)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "req_per_sec": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+    }
+
+
+def run(workers: int, threads: int, clients: int, duration: float, port: int, workdir: str, paths) -> dict:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), LIBRARY_THREADS=str(threads),
+               LIBRARY_BIND=f"127.0.0.1:{port}", LIBRARY_ACCESS_LOG="/dev/null",
+               PYTHONPATH=str(REPO_ROOT))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(REPO_ROOT / "gunicorn.conf.py"), "wsgi:app"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        drive(port, paths, clients, min(2.0, duration))   # warm up every worker
+        return drive(port, paths, clients, duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}", help="comma-separated worker counts")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per worker count")
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("gunicorn") is None:
+        parser.error("gunicorn is not installed (pip install -r requirements.txt; not available on Windows)")
+
+    paths = ["/api/books?limit=50", "/catalog", "/api/search?q=Title+0000042&type=title",
+             "/api/late_fee/100001/1"]
+    worker_counts = sorted({int(count) for count in args.workers.split(",") if count.strip()})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # the server opens library.db in its working directory
+        original = database.DATABASE
+        database.DATABASE = str(Path(workdir) / "library.db")
+        try:
+            database.init_database()
+            seed_books(args.books)
+            seed_loans(args.books * 10, 5_000, args.books, open_ratio=0.05)
+        finally:
+            database.close_db_connections()
+            database.DATABASE = original
+
+        print(f"{os.cpu_count()} CPUs, {args.threads} threads/worker, {args.clients} clients, "
+              f"{args.duration:g}s per run")
+        baseline = None
+        for workers in worker_counts:
+            result = run(workers, args.threads, args.clients, args.duration, args.port, workdir, paths)
+            baseline = baseline or result["req_per_sec"]
+            print(f"{workers:>3} workers: {result['req_per_sec']:8.0f} req/s  (x{result['req_per_sec'] / baseline:.2f})   "
+                  f"mean {result['mean_ms']:7.2f} ms   p95 {result['p95_ms']:7.2f} ms   "
+                  f"{result['errors']} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark suite: service functions and HTTP routes at several data scales.
+
+Each scale seeds a throwaway database with a synthetic catalog and loan
+history, then times every benchmark. Results can be written as JSON and
+compared with an earlier run, e.g. from the previous commit:
+
+    python -m benchmarks.run --scales small,medium --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import database
+from benchmarks.common import temp_database, seed_books, seed_loans, summarize, time_call
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, calculate_late_fee_for_book,
+    search_books_in_catalog, get_patron_status_report
+)
+
+# name -> (books, loans, patrons)
+SCALES = {
+    "small": (1_000, 10_000, 1_000),
+    "medium": (50_000, 500_000, 20_000),
+    "large": (500_000, 5_000_000, 200_000),
+}
+
+# patrons used for borrow/return cycles, outside the range seed_loans() uses
+BENCH_PATRON_BASE = 900000
+
+
+def time_cycle(first: Callable[[int], object], second: Callable[[int], object], repeat: int) -> Tuple[Dict, Dict]:
+    """Time first(i) then second(i) for each i, e.g. a borrow and the matching return."""
+    first_samples, second_samples = [], []
+    for i in range(repeat):
+        start = time.perf_counter()
+        first(i)
+        first_samples.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        second(i)
+        second_samples.append((time.perf_counter() - start) * 1000)
+    return summarize(first_samples), summarize(second_samples)
+
+
+def service_benchmarks(books: int, repeat: int, open_loans: List[sqlite3.Row]) -> Dict:
+    rng = random.Random(1)
+    results = {}
+
+    cycle_books = [rng.randint(1, books) for _ in range(repeat)]
+    patron = lambda i: f"{BENCH_PATRON_BASE + i}"
+    results["borrow_book_by_patron"], results["return_book_by_patron"] = time_cycle(
+        lambda i: borrow_book_by_patron(patron(i), cycle_books[i]),
+        lambda i: return_book_by_patron(patron(i), cycle_books[i]),
+        repeat)
+
+    results["search_books_in_catalog/title"] = time_call(
+        lambda: search_books_in_catalog(f"Title {rng.randrange(books):07d}", "title"), repeat)
+    results["search_books_in_catalog/author"] = time_call(
+        lambda: search_books_in_catalog(f"Author {rng.randrange(997)}", "author"), repeat)
+    results["search_books_in_catalog/isbn"] = time_call(
+        lambda: search_books_in_catalog(f"{9000000000000 + rng.randrange(books)}", "isbn"), repeat)
+
+    if open_loans:
+        results["calculate_late_fee_for_book"] = time_call(
+            lambda: calculate_late_fee_for_book(*rng.choice(open_loans)), repeat)
+        results["get_patron_status_report"] = time_call(
+            lambda: get_patron_status_report(rng.choice(open_loans)[0]), repeat)
+    return results
+
+
+def route_benchmarks(books: int, repeat: int, open_loans: List[sqlite3.Row]) -> Dict:
+    from app import create_app
+
+    rng = random.Random(2)
+    client = create_app().test_client()
+    results = {}
+
+    results["GET /catalog"] = time_call(lambda: client.get("/catalog"), repeat)
+    results["GET /api/books"] = time_call(lambda: client.get("/api/books?limit=100"), repeat)
+    results["GET /search?type=title"] = time_call(
+        lambda: client.get(f"/search?q=Title+{rng.randrange(books):07d}&type=title"), repeat)
+    results["GET /api/search?type=author"] = time_call(
+        lambda: client.get(f"/api/search?q=Author+{rng.randrange(997)}&type=author"), repeat)
+    if open_loans:
+        results["GET /api/late_fee"] = time_call(
+            lambda: client.get("/api/late_fee/%s/%d" % tuple(rng.choice(open_loans))), repeat)
+
+    cycle_books = [rng.randint(1, books) for _ in range(repeat)]
+    form = lambda i: {"patron_id": f"{BENCH_PATRON_BASE + 50000 + i}", "book_id": cycle_books[i]}
+    results["POST /borrow"], results["POST /return"] = time_cycle(
+        lambda i: client.post("/borrow", data=form(i)),
+        lambda i: client.post("/return", data=form(i)),
+        repeat)
+    return results
+
+
+def run_scale(name: str, repeat: int) -> Dict:
+    books, loans, patrons = SCALES[name]
+    with temp_database():
+        start = time.perf_counter()
+        seed_books(books)
+        seed_loans(loans, patrons, books, open_ratio=0.05)
+        seed_seconds = time.perf_counter() - start
+
+        conn = database.get_db_connection()
+        open_loans = conn.execute('''
+            SELECT patron_id, book_id FROM borrow_records WHERE return_date IS NULL LIMIT 1000
+        ''').fetchall()
+        conn.close()
+        open_loans = [tuple(loan) for loan in open_loans]
+
+        results = service_benchmarks(books, repeat, open_loans)
+        results.update(route_benchmarks(books, repeat, open_loans))
+    return {"books": books, "loans": loans, "patrons": patrons,
+            "seed_seconds": seed_seconds, "results": results}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "storage_profile": database.STORAGE_PROFILE,
+    }
+
+
+def print_report(report: Dict, baseline: Dict = None) -> None:
+    for scale, data in report["scales"].items():
+        print(f"\n== {scale}: {data['books']} books, {data['loans']} loans "
+              f"(seeded in {data['seed_seconds']:.1f}s)")
+        before = (baseline or {}).get("scales", {}).get(scale, {}).get("results", {})
+        for name, result in data["results"].items():
+            line = (f"{name:<36} mean {result['mean_ms']:9.3f} ms   p95 {result['p95_ms']:9.3f} ms   "
+                    f"{result['ops_per_sec']:10.0f} ops/s")
+            if name in before:
+                line += f"   x{result['mean_ms'] / before[name]['mean_ms']:.2f} vs baseline"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per benchmark")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare mean latency with")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    report = {"environment": environment(), "repeat": args.repeat,
+              "scales": {scale: run_scale(scale, args.repeat) for scale in scales}}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.json_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
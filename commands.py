@@ -0,0 +1,91 @@
+"""
+Command line tools for the Library Management System, run through the
+Flask CLI, e.g.:
+
+    flask --app app:create_app import-books books.csv
+"""
+
+import click
+
+
+def register_commands(app):
+    """Register all CLI commands with the Flask app."""
+
+    @app.cli.command('import-books')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+                  help='File format (default: guessed from the extension).')
+    @click.option('--chunk-size', type=int, default=None, help='Books inserted per transaction.')
+    def import_books_command(path, fmt, chunk_size):
+        """Bulk import books from a CSV or JSONL file (columns: title, author, isbn, total_copies)."""
+        from services.import_service import import_books_file, IMPORT_CHUNK_SIZE
+
+        report = import_books_file(path, fmt, chunk_size or IMPORT_CHUNK_SIZE)
+        for error in report['errors']:
+            click.echo(f"line {error['line']}: {error['error']} (ISBN {error['isbn'] or '-'})", err=True)
+        click.echo(f"{report['rows']} rows: {report['imported']} imported, {report['duplicates']} duplicates, "
+                   f"{report['rejected']} rejected in {report['seconds']:.2f}s ({report['rows_per_sec']:.0f} rows/sec)")
+
+    @app.cli.command('reconcile-payments')
+    @click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Day to reconcile (default: today).')
+    def reconcile_payments_command(day):
+        """Check a day's recorded payments against the payment gateway."""
+        from services.payment_status import reconcile_payments
+
+        report = reconcile_payments(day.date() if day else None)
+        for payment in report['unsettled']:
+            click.echo(f"{payment['transaction_id']}: {payment['status']} (${payment['amount']:.2f})", err=True)
+        for payment in report['unknown']:
+            click.echo(f"payment {payment['payment_id']} for {payment['patron_id']}: gateway timed out, "
+                       f"outcome unknown (${payment['amount']:.2f})", err=True)
+        click.echo(f"{report['date']}: {report['payments']} payments, {report['completed']} completed, "
+                   f"{len(report['unsettled'])} unsettled in {report['seconds']:.2f}s")
+
+    @app.cli.command('check-patrons')
+    @click.option('--repair', is_flag=True, help='Rebuild mismatched counters from the loan history.')
+    def check_patrons_command(repair):
+        """Check each patron's open loan counter against borrow_records."""
+        from database import check_patron_counters
+
+        mismatches = check_patron_counters(repair=repair)
+        for row in mismatches:
+            click.echo(f"{row['patron_id']}: open_loans {row['open_loans']}, actual {row['actual']}", err=True)
+        action = 'repaired' if repair else 'found'
+        click.echo(f"{len(mismatches)} mismatched patron counters {action}")
+        if mismatches and not repair:
+            raise SystemExit(1)
+
+    @app.cli.command('refresh-fees')
+    def refresh_fees_command():
+        """Store every patron's outstanding late fees from a library-wide sweep."""
+        from services.fee_service import refresh_outstanding_fees
+
+        click.echo(f"{refresh_outstanding_fees()} patrons with outstanding fees")
+
+    @app.cli.command('overdue-notices')
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+                  help='File format (default: guessed from the extension).')
+    @click.option('--as-of', 'as_of', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']),
+                  default=None, help='Time to compute overdue loans and fees at (default: now).')
+    def overdue_notices_command(path, fmt, as_of):
+        """Write a notice for every patron with overdue books to a CSV or JSONL file."""
+        from services.notice_service import write_overdue_notice_file
+
+        report = write_overdue_notice_file(path, fmt, as_of)
+        click.echo(f"{report['patrons']} patrons, {report['loans']} overdue loans, "
+                   f"${report['total_fee']:.2f} in late fees written to {path} in {report['seconds']:.2f}s")
+
+    @app.cli.command('archive-loans')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive loans returned more than this many days ago (default: ARCHIVE_AFTER_DAYS).')
+    @click.option('--batch-size', type=int, default=None, help='Loans moved per transaction.')
+    def archive_loans_command(older_than_days, batch_size):
+        """Move old returned loans from borrow_records into the archive table."""
+        from services.archive_service import archive_closed_loans, get_archive_stats, ARCHIVE_BATCH_SIZE
+
+        report = archive_closed_loans(older_than_days, batch_size or ARCHIVE_BATCH_SIZE)
+        stats = get_archive_stats()
+        click.echo(f"{report['archived']} loans archived in {report['batches']} batches ({report['seconds']:.2f}s); "
+                   f"{stats['hot']} in borrow_records, {stats['archived']} archived")
@@ -3,29 +3,695 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import base64
+import bisect
+import json
+import os
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from flask import g, has_app_context
+except ImportError:  # database helpers are usable without Flask installed
+    g = None
+
+    def has_app_context():
+        return False
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Connection pool configuration
+POOL_SIZE = 8        # maximum number of open connections per database file
+POOL_TIMEOUT = 5.0   # seconds to wait for a free connection before giving up
 
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+# Storage profiles: PRAGMAs applied to every new connection. 'isolation_level'
+# is not a PRAGMA; it sets how implicit transactions begin (see sqlite3 docs).
+STORAGE_PROFILES = {
+    # WAL lets /catalog readers proceed while a borrow/return is committing
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -16000,    # negative means KiB, i.e. 16 MB
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # WAL plus writers that take the write lock up front and queue on it,
+    # so concurrent borrow/return requests wait instead of failing with
+    # "database is locked" when upgrading a read to a write
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 15000,
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'isolation_level': 'IMMEDIATE',
+    },
+    # SQLite defaults: rollback journal, synchronous=FULL
+    'rollback': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+}
+# Changes take effect for connections opened after close_db_connections()
+STORAGE_PROFILE = os.environ.get('LIBRARY_DB_PROFILE', 'wal')
 
 
+def apply_storage_profile(conn: sqlite3.Connection, profile: Optional[str] = None):
+    """Apply the PRAGMAs of a storage profile (default STORAGE_PROFILE) to a connection."""
+    settings = STORAGE_PROFILES[profile or STORAGE_PROFILE]
+    for name, value in settings.items():
+        if name == 'isolation_level':
+            conn.isolation_level = value
+        else:
+            conn.execute(f'PRAGMA {name} = {value}')
 
-def init_database():
-    """Initialize the database with required tables."""
+
+def get_storage_settings() -> Dict:
+    """Get the storage PRAGMAs currently in effect on a pooled connection."""
     conn = get_db_connection()
-    
-    # Create books table
+    settings = {'profile': STORAGE_PROFILE, 'isolation_level': conn.isolation_level}
+    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'):
+        settings[name] = conn.execute(f'PRAGMA {name}').fetchone()[0]
+    conn.close()
+    return settings
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the pool timeout."""
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A sqlite3 connection owned by a ConnectionPool.
+
+    close() hands the connection back to its pool instead of closing it, so the
+    existing helpers keep their get_db_connection() / conn.close() pairs.
+    A connection pinned to a Flask app context ignores close() until the
+    context is torn down.
+    """
+
+    pool = None
+    pinned = False
+
+    def close(self):
+        if self.pinned:
+            # Same outcome as a real close: uncommitted work is discarded
+            if self.in_transaction:
+                self.rollback()
+            return
+        if self.pool is None:
+            sqlite3.Connection.close(self)
+        else:
+            self.pool.release(self)
+
+
+# Class of new pooled connections; instrumentation swaps in a subclass that
+# times every statement. Takes effect after close_db_connections().
+CONNECTION_FACTORY = PooledConnection
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared between threads."""
+
+    def __init__(self, database: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.opened = 0
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=CONNECTION_FACTORY)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        try:
+            apply_storage_profile(conn)
+        except Exception:
+            sqlite3.Connection.close(conn)
+            raise
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Check a connection out of the pool, opening one if none is idle."""
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f'No database connection available after {self.timeout}s')
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+            self.opened += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self.opened -= 1
+            self._slots.release()
+            raise
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, rolling back any unfinished transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            if self._closed:
+                keep = False
+            else:
+                keep = True
+                self._idle.append(conn)
+        if not keep:
+            self._discard(conn)
+            return
+        self._slots.release()
+
+    def _discard(self, conn: PooledConnection):
+        conn.pool = None
+        sqlite3.Connection.close(conn)
+        with self._lock:
+            self.opened -= 1
+        self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones are closed on release."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self.opened -= len(idle)
+        for conn in idle:
+            conn.pool = None
+            sqlite3.Connection.close(conn)
+
+    def stats(self) -> Dict:
+        """Snapshot of pool size and usage counters."""
+        with self._lock:
+            return {
+                'database': self.database,
+                'size': self.size,
+                'timeout': self.timeout,
+                'open': self.opened,
+                'idle': len(self._idle),
+                'in_use': self.opened - len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'timeouts': self.timeouts,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Get the connection pool for the configured DATABASE, creating it on first use."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.database == DATABASE:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.database != DATABASE:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DATABASE, POOL_SIZE, POOL_TIMEOUT)
+        return _pool
+
+
+def get_pool_stats() -> Dict:
+    """Get size, timeout and hit/miss counters of the connection pool."""
+    return get_pool().stats()
+
+
+def close_db_connections():
+    """
+    Close all pooled connections.
+    Call this before deleting or replacing the database file.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+    book_cache.clear()
+    catalog_snapshot.clear()
+
+
+# SQLite connections must not be used or closed in a forked child: closing
+# one can checkpoint or remove the WAL the parent still has open. Pre-fork
+# servers close the pool before forking (see wsgi.py); as a safety net a
+# child drops any inherited pool without closing its connections.
+_inherited_pools = []
+
+
+def _forget_pool_after_fork():
+    global _pool, _pool_lock
+    if _pool is not None:
+        _inherited_pools.append(_pool)   # kept referenced so nothing closes them
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+
+def get_db_connection():
+    """
+    Get a database connection from the pool.
+
+    Inside a Flask app context the same connection is reused for the whole
+    context and returned to the pool by release_db_connection() at teardown.
+    Elsewhere, conn.close() returns the connection to the pool.
+    """
+    if has_app_context():
+        conn = g.get('_library_db')
+        if conn is None or conn.pool is not get_pool():
+            release_db_connection()
+            conn = get_pool().acquire()
+            conn.pinned = True
+            g._library_db = conn
+        return conn
+    return get_pool().acquire()
+
+
+def release_db_connection(exception=None):
+    """Return the app context's connection to the pool (registered as a teardown handler)."""
+    conn = g.pop('_library_db', None)
+    if conn is not None:
+        conn.pinned = False
+        conn.close()
+
+
+
+# Book row cache: book metadata rarely changes, so get_book_by_id and
+# get_book_by_isbn are served from memory. Every write to books in this
+# module invalidates the affected row, and each lookup first drops the rows
+# the book_changes log shows were written since, so writes made by other
+# processes are seen too.
+BOOK_CACHE_ENABLED = os.environ.get('LIBRARY_BOOK_CACHE', '1') != '0'
+BOOK_CACHE_SIZE = 10000   # maximum number of cached books
+BOOK_CACHE_TTL = 30.0     # seconds before a cached book is re-read
+
+
+class BookCache:
+    """LRU cache of book rows with a time-to-live, looked up by id or ISBN."""
+
+    def __init__(self, size: int = BOOK_CACHE_SIZE, ttl: float = BOOK_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._books = OrderedDict()   # id -> (expires_at, book)
+        self._isbns = {}              # isbn -> id
+        self._lock = threading.Lock()
+        self._database = None
+        self._seq = None              # last book_changes entry applied
+        # Bumped by every invalidation; a read that raced with a write
+        # (started before it, finished after) must not repopulate the cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, book_id=None, isbn=None) -> Optional[Dict]:
+        """Get a copy of a cached book by id or ISBN, or None on a miss."""
+        with self._lock:
+            if book_id is None:
+                book_id = self._isbns.get(isbn)
+            entry = self._books.get(book_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, book = entry
+            if expires_at < time.monotonic():
+                self._remove(book_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._books.move_to_end(book_id)
+            self.hits += 1
+            return dict(book)
+
+    def put(self, book: Dict, generation: int):
+        """Cache a book read while the cache was at the given generation."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._remove(book['id'])
+            self._books[book['id']] = (time.monotonic() + self.ttl, dict(book))
+            self._isbns[book['isbn']] = book['id']
+            while len(self._books) > self.size:
+                self._remove(next(iter(self._books)))
+                self.evictions += 1
+
+    def invalidate(self, book_id: int):
+        """Drop a book after it has been written."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._remove(book_id)
+
+    def sync(self, conn: sqlite3.Connection):
+        """Drop the books written since the last sync, by any process, as recorded in book_changes."""
+        with self._lock:
+            database, seq = self._database, self._seq
+        if database != DATABASE or seq is None:
+            latest = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM book_changes').fetchone()[0]
+            with self._lock:
+                self._reset(latest)
+            return
+        changes = conn.execute('SELECT seq, book_id FROM book_changes WHERE seq > ? ORDER BY seq',
+                               (seq,)).fetchall()
+        if not changes:
+            return
+        with self._lock:
+            if self._database != database or self._seq is None or self._seq >= changes[-1]['seq']:
+                return   # another thread got further meanwhile
+            # a gap means the log was pruned past our position
+            if changes[0]['seq'] != seq + 1:
+                self._reset(changes[-1]['seq'])
+                return
+            self.generation += 1
+            for change in changes:
+                self._remove(change['book_id'])
+            self.invalidations += 1
+            self._seq = changes[-1]['seq']
+
+    def clear(self):
+        with self._lock:
+            self._reset(None)
+            self._database = None
+
+    def _reset(self, seq):
+        self.generation += 1
+        self._books.clear()
+        self._isbns.clear()
+        self._seq = seq
+        self._database = DATABASE
+
+    def _remove(self, book_id):
+        entry = self._books.pop(book_id, None)
+        if entry is not None:
+            self._isbns.pop(entry[1]['isbn'], None)
+
+    def stats(self) -> Dict:
+        """Snapshot of cache size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': BOOK_CACHE_ENABLED,
+                'size': len(self._books),
+                'max_size': self.size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+book_cache = BookCache()
+
+
+def get_book_cache_stats() -> Dict:
+    """Get hit rate, eviction and invalidation counters of the book cache."""
+    return book_cache.stats()
+
+
+# In-process catalog snapshot: every book as a compact record, in catalog
+# order, serving catalog pages and whole-catalog listings. Each process
+# holds its own copy. LIBRARY_CATALOG_SNAPSHOT=0 disables it.
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('LIBRARY_CATALOG_SNAPSHOT', '1') != '0'
+# Catching up on more changed books than this reloads the whole snapshot
+SNAPSHOT_RELOAD_THRESHOLD = 2000
+# Entries kept in the book_changes log; a snapshot further behind reloads
+BOOK_CHANGES_KEPT = 10000
+
+_BOOK_COLUMNS = 'id, title, author, isbn, total_copies, available_copies'
+
+
+class BookRecord:
+    """One book in the catalog snapshot; a fraction of the size of a dict."""
+
+    __slots__ = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+
+    def __init__(self, id, title, author, isbn, total_copies, available_copies):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.isbn = isbn
+        self.total_copies = total_copies
+        self.available_copies = available_copies
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.title, self.id)
+
+    def as_dict(self) -> Dict:
+        """The book in the same shape as a books row, as returned by get_book_by_id()."""
+        return {'id': self.id, 'title': self.title, 'author': self.author, 'isbn': self.isbn,
+                'total_copies': self.total_copies, 'available_copies': self.available_copies}
+
+
+class CatalogSnapshot:
+    """
+    All books held in memory, sorted by (title, id) like the catalog page.
+
+    Loaded on first use. Before each read it catches up with the
+    book_changes log, which triggers on the books table fill in, so writes
+    from any connection or process are picked up by re-reading only the
+    books that changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._database = None
+        self._seq = None             # last book_changes entry applied
+        self._by_id = {}             # id -> BookRecord
+        self._keys = []              # sorted (title, id), parallel to _records
+        self._records = []
+        self.loads = 0
+        self.updates = 0
+
+    def records(self) -> List[BookRecord]:
+        """All books in catalog order. The records are shared: don't modify them."""
+        with self._lock:
+            self._sync()
+            return list(self._records)
+
+    def page(self, after: Optional[Tuple[str, int]], limit: int) -> Tuple[List[BookRecord], Optional[Tuple[str, int]]]:
+        """The limit books after the (title, id) key, and the key to continue from (None on the last page)."""
+        with self._lock:
+            self._sync()
+            start = 0 if after is None else bisect.bisect_right(self._keys, tuple(after))
+            records = self._records[start:start + limit + 1]
+        if len(records) > limit:
+            return records[:limit], records[limit - 1].key
+        return records, None
+
+    def clear(self):
+        with self._lock:
+            self._database = None
+            self._seq = None
+            self._by_id, self._keys, self._records = {}, [], []
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'books': len(self._records), 'seq': self._seq,
+                    'loads': self.loads, 'updates': self.updates}
+
+    def _sync(self):
+        conn = get_db_connection()
+        try:
+            if self._database != DATABASE or self._seq is None:
+                self._load(conn)
+                return
+            changes = conn.execute('SELECT seq, book_id FROM book_changes WHERE seq > ? ORDER BY seq',
+                                   (self._seq,)).fetchall()
+            if not changes:
+                return
+            book_ids = {change['book_id'] for change in changes}
+            # a gap means the log was pruned past our position
+            if changes[0]['seq'] != self._seq + 1 or len(book_ids) > SNAPSHOT_RELOAD_THRESHOLD:
+                self._load(conn)
+                return
+            placeholders = ','.join('?' * len(book_ids))
+            rows = conn.execute(f'SELECT {_BOOK_COLUMNS} FROM books WHERE id IN ({placeholders})',
+                                list(book_ids)).fetchall()
+            current = {row['id']: row for row in rows}
+            for book_id in book_ids:
+                row = current.get(book_id)
+                record = self._by_id.get(book_id)
+                if row is not None and record is not None and row['title'] == record.title:
+                    # same place in catalog order, e.g. a borrow or return: swap the record in place
+                    self._replace(record, BookRecord(*row))
+                    continue
+                self._remove(book_id)
+                if row is not None:
+                    self._insert(BookRecord(*row))
+            self._seq = changes[-1]['seq']
+            self.updates += 1
+        finally:
+            conn.close()
+
+    def _load(self, conn: sqlite3.Connection):
+        # read the log position first: a change landing in between is simply applied again
+        seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM book_changes').fetchone()[0]
+        records = [BookRecord(*row) for row in
+                   conn.execute(f'SELECT {_BOOK_COLUMNS} FROM books ORDER BY title, id')]
+        self._records = records
+        self._keys = [record.key for record in records]
+        self._by_id = {record.id: record for record in records}
+        self._seq = seq
+        self._database = DATABASE
+        self.loads += 1
+
+    def _remove(self, book_id: int):
+        record = self._by_id.pop(book_id, None)
+        if record is None:
+            return
+        index = bisect.bisect_left(self._keys, record.key)
+        del self._keys[index]
+        del self._records[index]
+
+    def _insert(self, record: BookRecord):
+        index = bisect.bisect_left(self._keys, record.key)
+        self._keys.insert(index, record.key)
+        self._records.insert(index, record)
+        self._by_id[record.id] = record
+
+    def _replace(self, old: BookRecord, record: BookRecord):
+        self._records[bisect.bisect_left(self._keys, old.key)] = record
+        self._by_id[record.id] = record
+
+
+catalog_snapshot = CatalogSnapshot()
+
+
+def get_catalog_snapshot_stats() -> Dict:
+    """Get the size, log position and load/update counters of the catalog snapshot."""
+    return catalog_snapshot.stats()
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """Check whether this SQLite build includes the FTS5 extension."""
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp._fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _create_books_fts(conn: sqlite3.Connection):
+    """
+    Full-text index over book titles and authors, kept in sync with books by
+    triggers. Skipped on SQLite builds without FTS5; search then falls back
+    to LIKE scans.
+    """
+    if not fts5_available(conn):
+        return
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, author,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
     conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+
+# borrow_records dates are stored as INTEGER Unix timestamps (whole seconds)
+# of the naive local datetimes the application works with. Convert only at
+# the boundary: datetimes in, datetimes out.
+
+def to_timestamp(value: datetime) -> int:
+    """Convert a naive local datetime to the stored Unix timestamp."""
+    return int(value.timestamp())
+
+
+def from_timestamp(value: Optional[int]) -> Optional[datetime]:
+    """Convert a stored Unix timestamp back to a naive local datetime."""
+    return None if value is None else datetime.fromtimestamp(value)
+
+
+def _borrow_dates_to_timestamps(conn: sqlite3.Connection):
+    """
+    Rebuild borrow_records with INTEGER date columns, converting the ISO text
+    dates (local time) to Unix timestamps. Ids are kept, so payment
+    allocations still point at the same loans.
+    """
+    conn.execute('''
+        CREATE TABLE borrow_records_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO borrow_records_new (id, patron_id, book_id, borrow_date, due_date, return_date)
+        SELECT id, patron_id, book_id,
+               CAST(strftime('%s', borrow_date, 'utc') AS INTEGER),
+               CAST(strftime('%s', due_date, 'utc') AS INTEGER),
+               CAST(strftime('%s', return_date, 'utc') AS INTEGER)
+        FROM borrow_records
+    ''')
+    conn.execute('DROP TABLE borrow_records')
+    conn.execute('ALTER TABLE borrow_records_new RENAME TO borrow_records')
+    # the partial open-loan indexes of migration 2 went with the old table
+    for statement in SCHEMA_MIGRATIONS[1]:
+        conn.execute(statement)
+
+
+# Schema migrations, applied in order by migrate_database(). Each entry is a
+# list of statements or a function taking the connection; PRAGMA user_version
+# records how many have been applied. Only ever append to this list.
+SCHEMA_MIGRATIONS = [
+    # 1: books and borrow_records tables
+    [
+        '''
         CREATE TABLE IF NOT EXISTS books (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -34,10 +700,8 @@ def init_database():
             total_copies INTEGER NOT NULL,
             available_copies INTEGER NOT NULL
         )
-    ''')
-    
-    # Create borrow_records table
-    conn.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS borrow_records (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             patron_id TEXT NOT NULL,
@@ -47,17 +711,266 @@ def init_database():
             return_date TEXT,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
-    ''')
-    
-    conn.commit()
+        ''',
+    ],
+    # 2: partial indexes over open loans, so patron/book/overdue lookups
+    # don't scan the whole loan history
+    [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_patron
+        ON borrow_records (patron_id, borrow_date) WHERE return_date IS NULL
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_book
+        ON borrow_records (book_id) WHERE return_date IS NULL
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_due
+        ON borrow_records (due_date) WHERE return_date IS NULL
+        ''',
+    ],
+    # 3: full-text search over titles and authors
+    _create_books_fts,
+    # 4: catalog order (title, id) for keyset pagination; the index already
+    # carries the rowid, so it covers the id tie-break
+    [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)
+        ''',
+    ],
+    # 5: payment ledger. A payment is 'pending' while the gateway is being
+    # charged and 'completed' once it returns a transaction ID; allocations
+    # record which loans each payment settled.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT UNIQUE,
+            transaction_id TEXT UNIQUE,
+            patron_id TEXT NOT NULL,
+            amount REAL NOT NULL,
+            refunded_amount REAL NOT NULL DEFAULT 0,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS payment_allocations (
+            payment_id INTEGER NOT NULL,
+            borrow_record_id INTEGER,
+            book_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            FOREIGN KEY (payment_id) REFERENCES payments (id),
+            FOREIGN KEY (borrow_record_id) REFERENCES borrow_records (id)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_payment_allocations_loan
+        ON payment_allocations (borrow_record_id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_payment_allocations_payment
+        ON payment_allocations (payment_id)
+        ''',
+    ],
+    # 6: change log of book ids, written by triggers on every insert, update
+    # and delete, so catalog snapshots in any process can catch up on just the
+    # rows that changed. Only the last BOOK_CHANGES_KEPT entries are kept.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS book_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS book_changes_insert AFTER INSERT ON books BEGIN
+            INSERT INTO book_changes (book_id) VALUES (new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS book_changes_update AFTER UPDATE ON books BEGIN
+            INSERT INTO book_changes (book_id) VALUES (new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS book_changes_delete AFTER DELETE ON books BEGIN
+            INSERT INTO book_changes (book_id) VALUES (old.id);
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS book_changes_prune AFTER INSERT ON book_changes BEGIN
+            DELETE FROM book_changes WHERE seq <= new.seq - {BOOK_CHANGES_KEPT};
+        END
+        ''',
+    ],
+    # 7: borrow_records dates as INTEGER Unix timestamps instead of ISO text
+    _borrow_dates_to_timestamps,
+    # 8: per-patron counters, so the borrow limit check and the status report
+    # read one row instead of counting loans. Triggers keep open_loans in step
+    # with borrow_records inside the writing transaction; outstanding_fees is
+    # the late fee total as of fees_as_of, written by refresh_outstanding_fees()
+    # and reduced as payments complete.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS patrons (
+            patron_id TEXT PRIMARY KEY,
+            open_loans INTEGER NOT NULL DEFAULT 0,
+            outstanding_fees REAL NOT NULL DEFAULT 0,
+            fees_as_of INTEGER
+        )
+        ''',
+        '''
+        INSERT OR IGNORE INTO patrons (patron_id, open_loans)
+        SELECT patron_id, SUM(return_date IS NULL) FROM borrow_records GROUP BY patron_id
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_insert AFTER INSERT ON borrow_records BEGIN
+            INSERT OR IGNORE INTO patrons (patron_id) VALUES (new.patron_id);
+            UPDATE patrons SET open_loans = open_loans + (new.return_date IS NULL)
+            WHERE patron_id = new.patron_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_update AFTER UPDATE OF return_date ON borrow_records
+        WHEN (old.return_date IS NULL) != (new.return_date IS NULL) BEGIN
+            UPDATE patrons SET open_loans = open_loans + (new.return_date IS NULL) - (old.return_date IS NULL)
+            WHERE patron_id = new.patron_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_delete AFTER DELETE ON borrow_records
+        WHEN old.return_date IS NULL BEGIN
+            UPDATE patrons SET open_loans = open_loans - 1 WHERE patron_id = old.patron_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS patrons_payment_completed AFTER UPDATE OF status ON payments
+        WHEN old.status = 'pending' AND new.status = 'completed' BEGIN
+            UPDATE patrons SET outstanding_fees = MAX(outstanding_fees - new.amount, 0)
+            WHERE patron_id = new.patron_id;
+        END
+        ''',
+    ],
+    # 9: archive of closed loans, moved out of borrow_records by
+    # archive_closed_loans() so the hot table only grows with recent history.
+    # Rows keep their ids (borrow_records' AUTOINCREMENT never reuses one),
+    # and borrow_history reads both tables as one.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS borrow_records_archive (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_archive_patron
+        ON borrow_records_archive (patron_id, borrow_date)
+        ''',
+        '''
+        CREATE VIEW IF NOT EXISTS borrow_history AS
+        SELECT id, patron_id, book_id, borrow_date, due_date, return_date, 0 AS archived FROM borrow_records
+        UNION ALL
+        SELECT id, patron_id, book_id, borrow_date, due_date, return_date, 1 AS archived FROM borrow_records_archive
+        ''',
+    ],
+    # 10: a patron's returned loans by date, for the paginated history. The
+    # counterpart of the open-loan index of migration 2, so queries over open
+    # loans keep using that smaller one; the archive got the same index with
+    # its table.
+    [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_closed_patron
+        ON borrow_records (patron_id, borrow_date) WHERE return_date IS NOT NULL
+        ''',
+    ],
+    # 11: background payment jobs, so a status poll can be answered by any
+    # worker process, not just the one that queued the job
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS payment_jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            success INTEGER,
+            message TEXT,
+            transaction_id TEXT,
+            submitted_at REAL NOT NULL,
+            finished_at REAL
+        )
+        ''',
+    ],
+    # 12: payments whose gateway call timed out go pending -> unknown ->
+    # completed; take those off outstanding_fees too when they complete
+    [
+        'DROP TRIGGER IF EXISTS patrons_payment_completed',
+        '''
+        CREATE TRIGGER patrons_payment_completed AFTER UPDATE OF status ON payments
+        WHEN old.status IN ('pending', 'unknown') AND new.status = 'completed' BEGIN
+            UPDATE patrons SET outstanding_fees = MAX(outstanding_fees - new.amount, 0)
+            WHERE patron_id = new.patron_id;
+        END
+        ''',
+    ],
+]
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the number of schema migrations applied to the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate_database(conn: sqlite3.Connection) -> int:
+    """
+    Apply any pending schema migrations.
+
+    Runs under BEGIN IMMEDIATE so that several processes starting at once
+    apply each migration exactly once.
+
+    Returns:
+        int: number of migrations applied
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = get_schema_version(conn)
+        for migration in SCHEMA_MIGRATIONS[version:]:
+            if callable(migration):
+                migration(conn)
+            else:
+                for statement in migration:
+                    conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return SCHEMA_VERSION - version
+
+
+def init_database():
+    """Initialize the database with required tables."""
+    # The file may have been deleted or replaced since the pool last saw it
+    close_db_connections()
+    conn = get_db_connection()
+    migrate_database(conn)
     conn.close()
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
-    book_count = conn.execute('SELECT COUNT(*) as count FROM books').fetchone()['count']
+    # EXISTS stops at the first row, where COUNT(*) would scan the whole catalog
+    has_books = conn.execute('SELECT EXISTS (SELECT 1 FROM books)').fetchone()[0]
     
-    if book_count == 0:
+    if not has_books:
         # Add sample books
         sample_books = [
             ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
@@ -76,81 +989,397 @@ def add_sample_data():
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              to_timestamp(datetime.now() - timedelta(days=5)),
+              to_timestamp(datetime.now() + timedelta(days=9))))
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
         
         conn.commit()
+        book_cache.clear()
     
     conn.close()
 
 # Helper Functions for Database Operations
 
 def get_all_books() -> List[Dict]:
-    """Get all books from the database."""
+    """Get all books from the database, in title order."""
+    if CATALOG_SNAPSHOT_ENABLED:
+        return [record.as_dict() for record in catalog_snapshot.records()]
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    books = conn.execute('SELECT * FROM books ORDER BY title, id').fetchall()
     conn.close()
     return [dict(book) for book in books]
 
 
 
+def encode_cursor(key: Tuple) -> str:
+    """Encode a keyset pagination key as an opaque, URL-safe cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip('=')
+
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    """Decode a cursor made by encode_cursor(); raises ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list):
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+
+
+def get_books_page(after: Optional[Tuple[str, int]] = None, limit: int = 50) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+    """
+    Get one page of the catalog in (title, id) order.
+
+    Seeks straight to the first book after the (title, id) key instead of
+    skipping rows with OFFSET, so every page costs the same. With the
+    catalog snapshot enabled the seek is a bisect over the snapshot.
+
+    Returns:
+        tuple: (books, next_key) where next_key is None on the last page
+    """
+    if CATALOG_SNAPSHOT_ENABLED:
+        records, next_key = catalog_snapshot.page(after, limit)
+        return [record.as_dict() for record in records], next_key
+    conn = get_db_connection()
+    if after is None:
+        books = conn.execute('''
+            SELECT * FROM books ORDER BY title, id LIMIT ?
+        ''', (limit + 1,)).fetchall()
+    else:
+        books = conn.execute('''
+            SELECT * FROM books WHERE (title, id) > (?, ?) ORDER BY title, id LIMIT ?
+        ''', (after[0], after[1], limit + 1)).fetchall()
+    conn.close()
+
+    books = [dict(book) for book in books]
+    next_key = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_key = (books[-1]['title'], books[-1]['id'])
+    return books, next_key
+
+
+
+def iter_books(page_size: int = 500) -> Iterator[List[Dict]]:
+    """Yield the whole catalog one page at a time, in (title, id) order."""
+    after = None
+    while True:
+        books, after = get_books_page(after, page_size)
+        if books:
+            yield books
+        if after is None:
+            return
+
+
+
 def get_book_by_id(book_id: int) -> Optional[Dict]:
     """Get a specific book by ID."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
-    return dict(book) if book else None
+    try:
+        if BOOK_CACHE_ENABLED:
+            book_cache.sync(conn)
+            book = book_cache.get(book_id=book_id)
+            if book is not None:
+                return book
+            generation = book_cache.generation
+        book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    finally:
+        conn.close()
+    if not book:
+        return None
+    book = dict(book)
+    if BOOK_CACHE_ENABLED:
+        book_cache.put(book, generation)
+    return book
 
 
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     """Get a specific book by ISBN."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
-    return dict(book) if book else None
+    try:
+        if BOOK_CACHE_ENABLED:
+            book_cache.sync(conn)
+            book = book_cache.get(isbn=isbn)
+            if book is not None:
+                return book
+            generation = book_cache.generation
+        book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    finally:
+        conn.close()
+    if not book:
+        return None
+    book = dict(book)
+    if BOOK_CACHE_ENABLED:
+        book_cache.put(book, generation)
+    return book
+
+
+
+def _fts_query(search_term: str, column: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching words that start with each search word."""
+    words = re.findall(r'\w+', search_term.lower())
+    if not words:
+        return None
+    return '{%s} : (%s)' % (column, ' AND '.join(f'"{word}"*' for word in words))
+
+
+
+def search_books(search_term: str, field: str, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Search books by 'title', 'author' or 'isbn'.
+
+    Title and author searches use the books_fts full-text index (words
+    starting with each search word, best matches first); ISBN is an exact
+    lookup on the unique isbn index. Without FTS5, title and author searches
+    are substring matches, answered from the catalog snapshot when enabled.
+    """
+    if field == 'isbn':
+        book = get_book_by_isbn(search_term)
+        return [book] if book else []
+    if field not in ('title', 'author'):
+        return []
+
+    conn = get_db_connection()
+    try:
+        has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'books_fts'").fetchone()
+    finally:
+        conn.close()
+    if has_fts:
+        query = _fts_query(search_term, field)
+        if query is None:
+            return []
+        sql = '''
+            SELECT b.* FROM books_fts 
+            JOIN books b ON b.id = books_fts.rowid 
+            WHERE books_fts MATCH ? 
+            ORDER BY books_fts.rank, b.title
+        '''
+        params = [query]
+    elif CATALOG_SNAPSHOT_ENABLED:
+        # Called with no connection held: a sync takes its own under the snapshot lock
+        return _search_snapshot(search_term, field, limit)
+    else:
+        pattern = '%' + search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        sql = f"SELECT * FROM books WHERE {field} LIKE ? ESCAPE '\\' ORDER BY title"
+        params = [pattern]
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    conn = get_db_connection()
+    try:
+        books = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [dict(book) for book in books]
+
+
 
+def _search_snapshot(search_term: str, field: str, limit: Optional[int] = None) -> List[Dict]:
+    """Case-insensitive substring search over the catalog snapshot, in title order."""
+    term = search_term.lower()
+    books = []
+    for record in catalog_snapshot.records():
+        if term in getattr(record, field).lower():
+            books.append(record.as_dict())
+            if limit is not None and len(books) >= limit:
+                break
+    return books
 
 
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
-    """Get currently borrowed books for a patron."""
+    """
+    Get currently borrowed books for a patron.
+
+    Each loan also carries its borrow record id and fees_paid, the late fees
+    already settled against it by payments in the ledger. Payments still
+    pending count, so a fee being paid is not owed twice.
+    """
     conn = get_db_connection()
     records = conn.execute('''
-        SELECT br.*, b.title, b.author 
-        FROM borrow_records br 
-        JOIN books b ON br.book_id = b.id 
+        SELECT br.*, b.title, b.author,
+               (SELECT COALESCE(SUM(pa.amount), 0)
+                FROM payment_allocations pa
+                WHERE pa.borrow_record_id = br.id) AS fees_paid
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
         WHERE br.patron_id = ? AND br.return_date IS NULL
-        ORDER BY br.borrow_date
+        ORDER BY br.borrow_date, br.id
     ''', (patron_id,)).fetchall()
     conn.close()
-    
+
+    now = to_timestamp(datetime.now())
     borrowed_books = []
     for record in records:
         borrowed_books.append({
+            'record_id': record['id'],
+            'fees_paid': record['fees_paid'],
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'borrow_date': from_timestamp(record['borrow_date']),
+            'due_date': from_timestamp(record['due_date']),
+            'is_overdue': now > record['due_date']
         })
     
     return borrowed_books
 
 
 
+def _loan_dict(record: sqlite3.Row) -> Dict:
+    loan = dict(record)
+    for column in ('borrow_date', 'due_date', 'return_date'):
+        loan[column] = from_timestamp(loan[column])
+    if 'archived' in loan:
+        loan['archived'] = bool(loan['archived'])
+    return loan
+
+
+def get_borrow_record(record_id: int) -> Optional[Dict]:
+    """Get one loan by id, whether still in borrow_records or archived, with its book title."""
+    conn = get_db_connection()
+    record = conn.execute('''
+        SELECT h.*, b.title, b.author FROM borrow_history h
+        LEFT JOIN books b ON b.id = h.book_id
+        WHERE h.id = ?
+    ''', (record_id,)).fetchone()
+    conn.close()
+    return _loan_dict(record) if record else None
+
+
+def get_patron_loan_history(patron_id: str) -> List[Dict]:
+    """
+    Get all of a patron's returned loans, archived or not, most recent first.
+    Each loan has its book title and author and an 'archived' flag.
+    """
+    conn = get_db_connection()
+    records = conn.execute('''
+        SELECT h.*, b.title, b.author FROM borrow_history h
+        LEFT JOIN books b ON b.id = h.book_id
+        WHERE h.patron_id = ? AND h.return_date IS NOT NULL
+        ORDER BY h.borrow_date DESC, h.id DESC
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [_loan_dict(record) for record in records]
+
+
+HISTORY_PAGE_SIZE = 50
+
+# Each side of the UNION ALL seeks into its (patron_id, borrow_date) index of returned loans
+# and reads in key order; SQLite merges the two and stops at the LIMIT, so a
+# page costs the same however long the patron's history is.
+_HISTORY_PAGE_SQL = '''
+    SELECT br.id AS id, br.book_id, br.borrow_date AS borrow_date, br.due_date, br.return_date,
+           0 AS archived, b.title, b.author
+    FROM borrow_records br LEFT JOIN books b ON b.id = br.book_id
+    WHERE br.patron_id = :patron_id AND br.return_date IS NOT NULL {after}
+    UNION ALL
+    SELECT ar.id, ar.book_id, ar.borrow_date, ar.due_date, ar.return_date,
+           1, b.title, b.author
+    FROM borrow_records_archive ar LEFT JOIN books b ON b.id = ar.book_id
+    WHERE ar.patron_id = :patron_id {archive_after}
+    ORDER BY borrow_date DESC, id DESC
+    LIMIT :limit
+'''
+
+
+def get_patron_borrow_history(patron_id: str, after: Optional[Tuple[int, int]] = None,
+                              limit: int = HISTORY_PAGE_SIZE) -> Tuple[List[Dict], Optional[Tuple[int, int]]]:
+    """
+    Get one page of a patron's returned loans, archived or not, most recent first.
+
+    Pages are keyed on (borrow_date timestamp, id) like the catalog pages,
+    so deep pages cost the same as the first.
+
+    Returns:
+        tuple: (loans, next_key) where next_key is None on the last page
+    """
+    if after is None:
+        sql = _HISTORY_PAGE_SQL.format(after='', archive_after='')
+        params = {'patron_id': patron_id, 'limit': limit + 1}
+    else:
+        sql = _HISTORY_PAGE_SQL.format(after='AND (br.borrow_date, br.id) < (:date, :id)',
+                                       archive_after='AND (ar.borrow_date, ar.id) < (:date, :id)')
+        params = {'patron_id': patron_id, 'limit': limit + 1, 'date': after[0], 'id': after[1]}
+    conn = get_db_connection()
+    records = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    next_key = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_key = (records[-1]['borrow_date'], records[-1]['id'])
+    return [_loan_dict(record) for record in records], next_key
+
+
+def get_patron(patron_id: str) -> Optional[Dict]:
+    """
+    Get a patron's counters: open_loans, outstanding_fees and fees_as_of
+    (a datetime, or None if fees were never refreshed). None if the patron
+    has never borrowed.
+    """
+    conn = get_db_connection()
+    patron = conn.execute('SELECT * FROM patrons WHERE patron_id = ?', (patron_id,)).fetchone()
+    conn.close()
+    if not patron:
+        return None
+    patron = dict(patron)
+    patron['fees_as_of'] = from_timestamp(patron['fees_as_of'])
+    return patron
+
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
     conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
+    row = conn.execute('SELECT open_loans FROM patrons WHERE patron_id = ?', (patron_id,)).fetchone()
     conn.close()
-    return count
+    return row['open_loans'] if row else 0
+
+
+def check_patron_counters(repair: bool = False) -> List[Dict]:
+    """
+    Compare every patron's open_loans counter with a count over borrow_records.
+
+    Args:
+        repair: rebuild the mismatched counters from borrow_records, in the
+            same transaction as the check
+
+    Returns:
+        list: one dict per mismatch (patron_id, open_loans as stored, actual),
+        ordered by patron_id
+    """
+    conn = get_db_connection()
+    try:
+        # the write lock keeps borrows and returns out until the check (and repair) is done
+        conn.execute('BEGIN IMMEDIATE')
+        mismatches = [dict(row) for row in conn.execute('''
+            SELECT patron_id, SUM(open_loans) AS open_loans, SUM(actual) AS actual FROM (
+                SELECT patron_id, open_loans, 0 AS actual FROM patrons
+                UNION ALL
+                SELECT patron_id, 0, SUM(return_date IS NULL) FROM borrow_records GROUP BY patron_id
+            )
+            GROUP BY patron_id
+            HAVING SUM(open_loans) != SUM(actual)
+            ORDER BY patron_id
+        ''')]
+        if repair and mismatches:
+            conn.executemany('INSERT OR IGNORE INTO patrons (patron_id) VALUES (?)',
+                             [(row['patron_id'],) for row in mismatches])
+            conn.executemany('UPDATE patrons SET open_loans = ? WHERE patron_id = ?',
+                             [(row['actual'], row['patron_id']) for row in mismatches])
+        conn.commit()
+        return mismatches
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 
 
@@ -158,12 +1387,13 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
     """Insert a new book into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        book_id = conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
+        ''', (title, author, isbn, total_copies, available_copies)).lastrowid
         conn.commit()
         conn.close()
+        book_cache.invalidate(book_id)
         return True
     except Exception as e:
         conn.close()
@@ -171,6 +1401,42 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
 
 
 
+def insert_books_bulk(books: List[Tuple[str, str, str, int, int]]) -> Tuple[int, Set[str]]:
+    """
+    Insert many books in one transaction, skipping ISBNs already in the catalog.
+    
+    Args:
+        books: (title, author, isbn, total_copies, available_copies) tuples
+        
+    Returns:
+        tuple: (number inserted, set of ISBNs that already existed)
+    """
+    conn = get_db_connection()
+    try:
+        # Checking and inserting under one write lock leaves no gap for a concurrent add
+        conn.execute('BEGIN IMMEDIATE')
+        existing = set()
+        isbns = [book[2] for book in books]
+        for start in range(0, len(isbns), 500):
+            chunk = isbns[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            existing.update(row['isbn'] for row in conn.execute(
+                f'SELECT isbn FROM books WHERE isbn IN ({placeholders})', chunk))
+        new_books = [book for book in books if book[2] not in existing]
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', new_books)
+        conn.commit()
+        return len(new_books), existing
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
@@ -178,7 +1444,7 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        ''', (patron_id, book_id, to_timestamp(borrow_date), to_timestamp(due_date)))
         conn.commit()
         conn.close()
         return True
@@ -197,6 +1463,7 @@ def update_book_availability(book_id: int, change: int) -> bool:
         ''', (change, book_id))
         conn.commit()
         conn.close()
+        book_cache.invalidate(book_id)
         return True
     except Exception as e:
         conn.close()
@@ -212,10 +1479,110 @@ def update_borrow_record_return_date(patron_id: str, book_id: int, return_date:
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+        ''', (to_timestamp(return_date), patron_id, book_id))
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
+
+
+
+# Transactional borrow/return: each runs as one BEGIN IMMEDIATE transaction
+# on one connection, so checks and writes can't interleave with another
+# request and the whole operation costs a single commit.
+
+MAX_BORROWED_BOOKS = 5
+
+
+def borrow_book_transaction(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                            max_borrowed: int = MAX_BORROWED_BOOKS) -> Tuple[str, Optional[Dict]]:
+    """
+    Check availability and the patron's limit, take a copy and record the loan atomically.
+
+    Returns:
+        tuple: (status, book) where status is 'borrowed', 'not_found',
+        'unavailable', 'limit_reached' or 'error'
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+        if not book:
+            conn.rollback()
+            return 'not_found', None
+        book = dict(book)
+
+        if book['available_copies'] <= 0:
+            conn.rollback()
+            return 'unavailable', book
+
+        # open_loans is kept current by triggers on borrow_records
+        patron = conn.execute('SELECT open_loans FROM patrons WHERE patron_id = ?', (patron_id,)).fetchone()
+        if patron and patron['open_loans'] >= max_borrowed:
+            conn.rollback()
+            return 'limit_reached', book
+
+        # The conditional update is what stops two patrons taking the last copy
+        taken = conn.execute('''
+            UPDATE books SET available_copies = available_copies - 1 
+            WHERE id = ? AND available_copies > 0
+        ''', (book_id,)).rowcount
+        if not taken:
+            conn.rollback()
+            return 'unavailable', book
+
+        conn.execute('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+            VALUES (?, ?, ?, ?)
+        ''', (patron_id, book_id, to_timestamp(borrow_date), to_timestamp(due_date)))
+        conn.commit()
+        book_cache.invalidate(book_id)
+        book['available_copies'] -= 1
+        return 'borrowed', book
+    except Exception as e:
+        conn.rollback()
+        return 'error', None
+    finally:
+        conn.close()
+
+
+
+def return_book_transaction(patron_id: str, book_id: int, return_date: datetime) -> Tuple[str, Optional[Dict]]:
+    """
+    Close the patron's oldest open loan of a book and put the copy back atomically.
+
+    Returns:
+        tuple: (status, loan) where status is 'returned', 'not_borrowed' or 'error'
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        loan = conn.execute('''
+            SELECT * FROM borrow_records 
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+            ORDER BY borrow_date, id LIMIT 1
+        ''', (patron_id, book_id)).fetchone()
+        if not loan:
+            conn.rollback()
+            return 'not_borrowed', None
+
+        returned_at = to_timestamp(return_date)
+        conn.execute('UPDATE borrow_records SET return_date = ? WHERE id = ?',
+                     (returned_at, loan['id']))
+        conn.execute('''
+            UPDATE books SET available_copies = available_copies + 1 WHERE id = ?
+        ''', (book_id,))
+        conn.commit()
+        book_cache.invalidate(book_id)
+        loan = dict(loan)
+        loan['borrow_date'] = from_timestamp(loan['borrow_date'])
+        loan['due_date'] = from_timestamp(loan['due_date'])
+        loan['return_date'] = from_timestamp(returned_at)
+        return 'returned', loan
+    except Exception as e:
+        conn.rollback()
+        return 'error', None
+    finally:
+        conn.close()
@@ -0,0 +1,55 @@
+"""
+Gunicorn settings for the Library Management System.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden with an environment variable (shown next
+to it) or on the command line.
+"""
+
+import multiprocessing
+import os
+
+# Address to listen on (LIBRARY_BIND)
+bind = os.environ.get('LIBRARY_BIND', '0.0.0.0:5000')
+
+# Worker processes (WEB_CONCURRENCY), each running several request threads
+# (LIBRARY_THREADS). Requests mostly wait on SQLite and the payment gateway,
+# so threads are cheap; processes add CPU parallelism.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('LIBRARY_THREADS', 4))
+worker_class = 'gthread'
+
+# Seconds an idle keep-alive connection is held open (LIBRARY_KEEPALIVE)
+keepalive = int(os.environ.get('LIBRARY_KEEPALIVE', 5))
+
+# Build the app once in the master and fork workers from it, so migrations
+# run once and workers start instantly
+preload_app = True
+
+# Seconds a worker may take on one request before it is restarted, and that
+# workers get to finish in-flight requests on shutdown or reload
+timeout = int(os.environ.get('LIBRARY_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('LIBRARY_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.environ.get('LIBRARY_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('LIBRARY_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # database.py drops any inherited connection pool in the child (see
+    # _forget_pool_after_fork); log it so a leaked connection is noticed
+    import database
+    if database._inherited_pools:
+        server.log.warning("worker %s inherited open database connections", worker.pid)
+
+
+def worker_exit(server, worker):
+    # job state outlives the worker in SQLite, but the payments themselves
+    # run on its threads: let queued ones finish so none is left 'processing'
+    from services.payment_jobs import shutdown_payment_queue
+    shutdown_payment_queue()
@@ -0,0 +1,307 @@
+"""
+Request instrumentation for the Library Management System.
+
+When enabled (LIBRARY_INSTRUMENTATION=1), every request records its wall
+time, the number and duration of its SQL statements and its payment gateway
+calls. Each response gets a Server-Timing header, each request is logged as
+one JSON line on the 'library.requests' logger, and running totals are
+served in Prometheus text format at /metrics.
+
+When disabled no request hooks are installed and connections are plain
+PooledConnections, so the only cost is the /metrics route itself.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from flask import request
+
+import database
+
+INSTRUMENTATION_ENABLED = os.environ.get('LIBRARY_INSTRUMENTATION', '0') == '1'
+
+# Upper bounds (seconds) of the request duration histogram buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger('library.requests')
+
+
+class RequestStats:
+    """Time spent in SQL and the payment gateway during one request."""
+
+    __slots__ = ('start', 'sql_count', 'sql_seconds', 'gateway_count', 'gateway_seconds')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.gateway_count = 0
+        self.gateway_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar('library_request_stats', default=None)
+
+
+class Metrics:
+    """Process-wide counters and the request duration histogram."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}        # (method, endpoint, status) -> count
+            self.durations = {}       # endpoint -> [bucket counts..., total count, total seconds]
+            self.sql_statements = 0
+            self.sql_seconds = 0.0
+            self.gateway_calls = 0
+            self.gateway_seconds = 0.0
+
+    def observe_request(self, method: str, endpoint: str, status: int, seconds: float):
+        with self._lock:
+            key = (method, endpoint, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.durations.get(endpoint)
+            if histogram is None:
+                histogram = self.durations[endpoint] = [0] * len(REQUEST_BUCKETS) + [0, 0.0]
+            for index, bound in enumerate(REQUEST_BUCKETS):
+                if seconds <= bound:
+                    histogram[index] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+
+    def observe_sql(self, statements: int, seconds: float):
+        with self._lock:
+            self.sql_statements += statements
+            self.sql_seconds += seconds
+
+    def observe_gateway(self, seconds: float):
+        with self._lock:
+            self.gateway_calls += 1
+            self.gateway_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'durations': {endpoint: list(histogram) for endpoint, histogram in self.durations.items()},
+                'sql_statements': self.sql_statements,
+                'sql_seconds': self.sql_seconds,
+                'gateway_calls': self.gateway_calls,
+                'gateway_seconds': self.gateway_seconds,
+            }
+
+
+metrics = Metrics()
+
+
+def _record_sql(statements: int, seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += statements
+        stats.sql_seconds += seconds
+    metrics.observe_sql(statements, seconds)
+
+
+def record_gateway_call(seconds: float):
+    """Count a payment gateway call against the current request, if instrumentation is on."""
+    if not INSTRUMENTATION_ENABLED:
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.gateway_count += 1
+        stats.gateway_seconds += seconds
+    metrics.observe_gateway(seconds)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times statement execution and row fetching."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(1, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(1, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _record_sql(0, time.perf_counter() - start)
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            _record_sql(0, time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _record_sql(0, time.perf_counter() - start)
+
+
+class TimedConnection(database.PooledConnection):
+    """Pooled connection whose execute()/executemany() go through a TimedCursor."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _begin_request():
+    _current.set(RequestStats())
+
+
+def _finish_request(response):
+    stats = _current.get()
+    if stats is None:
+        return response
+    seconds = time.perf_counter() - stats.start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe_request(request.method, endpoint, response.status_code, seconds)
+
+    timings = [f'app;dur={seconds * 1000:.2f}',
+               f'db;dur={stats.sql_seconds * 1000:.2f};desc="{stats.sql_count} queries"']
+    if stats.gateway_count:
+        timings.append(f'gateway;dur={stats.gateway_seconds * 1000:.2f};desc="{stats.gateway_count} calls"')
+    response.headers.add('Server-Timing', ', '.join(timings))
+
+    logger.info(json.dumps({
+        'event': 'request',
+        'method': request.method,
+        'path': request.path,
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'duration_ms': round(seconds * 1000, 3),
+        'sql_count': stats.sql_count,
+        'sql_ms': round(stats.sql_seconds * 1000, 3),
+        'gateway_count': stats.gateway_count,
+        'gateway_ms': round(stats.gateway_seconds * 1000, 3),
+    }))
+    return response
+
+
+def _end_request(exception=None):
+    _current.set(None)
+
+
+def _configure_request_logger():
+    # nothing else configures 'library.requests', and Python's last-resort
+    # handler drops INFO records, so give it a level and a handler of its own
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+
+
+def init_instrumentation(app, enabled: Optional[bool] = None):
+    """
+    Install the request hooks if instrumentation is enabled
+    (default: the LIBRARY_INSTRUMENTATION environment variable).
+    """
+    global INSTRUMENTATION_ENABLED
+    if enabled is None:
+        enabled = INSTRUMENTATION_ENABLED
+    INSTRUMENTATION_ENABLED = enabled
+
+    factory = TimedConnection if enabled else database.PooledConnection
+    if database.CONNECTION_FACTORY is not factory:
+        database.CONNECTION_FACTORY = factory
+        database.close_db_connections()
+
+    if enabled:
+        _configure_request_logger()
+        app.before_request(_begin_request)
+        app.after_request(_finish_request)
+        app.teardown_request(_end_request)
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(name: str, value, labels: Tuple[Tuple[str, object], ...] = ()) -> str:
+    if labels:
+        name += '{' + ','.join(f'{key}="{_label(val)}"' for key, val in labels) + '}'
+    return f'{name} {value}'
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from services.gateway_client import get_payment_gateway, OPEN
+
+    snapshot = metrics.snapshot()
+    lines: List[str] = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('library_http_requests_total', 'counter', 'HTTP requests by method, route and status.')
+    for (method, endpoint, status), count in sorted(snapshot['requests'].items()):
+        lines.append(_format('library_http_requests_total', count,
+                             (('method', method), ('endpoint', endpoint), ('status', status))))
+
+    family('library_http_request_duration_seconds', 'histogram', 'HTTP request wall time.')
+    for endpoint, histogram in sorted(snapshot['durations'].items()):
+        name = 'library_http_request_duration_seconds'
+        for bound, count in zip(REQUEST_BUCKETS, histogram):
+            lines.append(_format(f'{name}_bucket', count, (('endpoint', endpoint), ('le', bound))))
+        lines.append(_format(f'{name}_bucket', histogram[-2], (('endpoint', endpoint), ('le', '+Inf'))))
+        lines.append(_format(f'{name}_count', histogram[-2], (('endpoint', endpoint),)))
+        lines.append(_format(f'{name}_sum', histogram[-1], (('endpoint', endpoint),)))
+
+    family('library_sql_statements_total', 'counter', 'SQL statements executed.')
+    lines.append(_format('library_sql_statements_total', snapshot['sql_statements']))
+    family('library_sql_seconds_total', 'counter', 'Time spent executing SQL and fetching rows.')
+    lines.append(_format('library_sql_seconds_total', snapshot['sql_seconds']))
+    family('library_gateway_calls_total', 'counter', 'Payment gateway calls.')
+    lines.append(_format('library_gateway_calls_total', snapshot['gateway_calls']))
+    family('library_gateway_seconds_total', 'counter', 'Time spent waiting on the payment gateway.')
+    lines.append(_format('library_gateway_seconds_total', snapshot['gateway_seconds']))
+
+    for prefix, stats, gauges, counters in (
+        ('library_db_pool', database.get_pool_stats(), ('size', 'open', 'idle', 'in_use'),
+         ('hits', 'misses', 'timeouts')),
+        ('library_book_cache', database.get_book_cache_stats(), ('size', 'max_size'),
+         ('hits', 'misses', 'evictions', 'expirations', 'invalidations')),
+    ):
+        what = prefix.replace('library_', '').replace('_', ' ')
+        for key in gauges:
+            family(f'{prefix}_{key}', 'gauge', f'{what.capitalize()} {key.replace("_", " ")}.')
+            lines.append(_format(f'{prefix}_{key}', stats[key]))
+        for key in counters:
+            family(f'{prefix}_{key}_total', 'counter', f'{what.capitalize()} {key}.')
+            lines.append(_format(f'{prefix}_{key}_total', stats[key]))
+
+    family('library_gateway_breaker_open', 'gauge', '1 while the payment gateway circuit breaker is open.')
+    lines.append(_format('library_gateway_breaker_open', int(get_payment_gateway().breaker.state == OPEN)))
+
+    return '\n'.join(lines) + '\n'
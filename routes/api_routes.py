@@ -2,8 +2,14 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
+from database import get_books_page, iter_books, encode_cursor, get_patron_borrow_history
 from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from services.import_service import import_books_stream, detect_format
+from services.payment_jobs import get_payment_queue
+from .catalog_routes import parse_page_args
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -37,3 +43,121 @@ def search_books_api():
         'results': books,
         'count': len(books)
     })
+
+
+@api_bp.route('/books')
+def list_books_api():
+    """
+    One page of the catalog in (title, id) order.
+    Pass the returned 'next' cursor as ?after= to get the following page.
+    """
+    try:
+        after, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    books, next_key = get_books_page(after, limit)
+    
+    return jsonify({
+        'books': books,
+        'count': len(books),
+        'next': encode_cursor(next_key) if next_key else None
+    })
+
+@api_bp.route('/books/stream')
+def stream_books_api():
+    """
+    The whole catalog as newline-delimited JSON, fetched and sent page by page
+    so the full table is never held in memory.
+    """
+    def generate():
+        for page in iter_books():
+            yield ''.join(json.dumps(book) + '\n' for book in page)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@api_bp.route('/books/import', methods=['POST'])
+def import_books_api():
+    """
+    Bulk import books from an uploaded CSV or JSONL file (form field 'file'),
+    or from the request body with a text/csv or application/x-ndjson content type.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        fmt = request.form.get('format') or detect_format(upload.filename or '')
+        stream = upload.stream
+    elif request.mimetype in ('text/csv', 'application/x-ndjson', 'application/jsonl'):
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+        stream = request.stream
+    else:
+        return jsonify({'error': 'Upload a CSV or JSONL file as "file", or send text/csv or application/x-ndjson'}), 400
+    
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'error': 'Format must be csv or jsonl'}), 400
+    
+    report = import_books_stream(stream, fmt)
+    return jsonify(report)
+
+@api_bp.route('/payments', methods=['POST'])
+def submit_payment_api():
+    """
+    Queue a late fee payment for a borrowed book.
+    Responds 202 with a job ID straight away; poll /api/payments/<job_id> for the outcome.
+    An Idempotency-Key header makes retries of the same payment safe.
+    """
+    data = request.get_json(silent=True) or request.form
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid request body. Must be a JSON object.'}), 400
+    patron_id = str(data.get('patron_id', '')).strip()
+    
+    if not patron_id.isdigit() or len(patron_id) != 6:
+        return jsonify({'error': 'Invalid patron ID. Must be exactly 6 digits.'}), 400
+    
+    try:
+        book_id = int(data.get('book_id', ''))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid book ID.'}), 400
+    
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key') or None
+    job_id = get_payment_queue().submit_late_fee_payment(patron_id, book_id, idempotency_key)
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('api.payment_status_api', job_id=job_id)
+    }), 202
+
+@api_bp.route('/payments/<job_id>')
+def payment_status_api(job_id):
+    """Status of a queued late fee payment."""
+    job = get_payment_queue().get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Payment job not found'}), 404
+    
+    return jsonify(job)
+
+@api_bp.route('/patrons/<patron_id>/history')
+def patron_history_api(patron_id):
+    """
+    One page of a patron's returned loans with book titles, most recent first.
+    Pass the returned 'next' cursor as ?after= to get the following page.
+    """
+    if not patron_id.isdigit() or len(patron_id) != 6:
+        return jsonify({'error': 'Invalid patron ID. Must be exactly 6 digits.'}), 400
+    
+    try:
+        after, limit = parse_page_args(request.args, key_types=(int, int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    loans, next_key = get_patron_borrow_history(patron_id, after, limit)
+    for loan in loans:
+        for column in ('borrow_date', 'due_date', 'return_date'):
+            loan[column] = loan[column].isoformat()
+    
+    return jsonify({
+        'patron_id': patron_id,
+        'loans': loans,
+        'count': len(loans),
+        'next': encode_cursor(next_key) if next_key else None
+    })
@@ -3,11 +3,37 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+from database import get_books_page, encode_cursor, decode_cursor
 from services.library_service import add_book_to_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
 
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 500
+
+
+def parse_page_args(args, key_types=(str, int)):
+    """
+    Read ?after=<cursor>&limit=<n> pagination arguments. The cursor key must
+    hold exactly key_types, (title, id) for the catalog.
+
+    Returns:
+        tuple: (after key or None, limit); raises ValueError on bad input
+    """
+    cursor = args.get('after', '').strip()
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None and (len(after) != len(key_types)
+                              or not all(type(value) is kind for value, kind in zip(after, key_types))):
+        raise ValueError('Invalid cursor')
+    try:
+        limit = int(args.get('limit', CATALOG_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError('Limit must be a positive integer')
+    if limit <= 0:
+        raise ValueError('Limit must be a positive integer')
+    return after, min(limit, CATALOG_MAX_PAGE_SIZE)
+
+
 @catalog_bp.route('/')
 def index():
     """Home page redirects to catalog."""
@@ -16,11 +42,19 @@ def index():
 @catalog_bp.route('/catalog')
 def catalog():
     """
-    Display all books in the catalog.
+    Display the books in the catalog, one page at a time.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    try:
+        after, limit = parse_page_args(request.args)
+    except ValueError:
+        flash('Invalid catalog page.', 'error')
+        after, limit = None, CATALOG_PAGE_SIZE
+    
+    books, next_key = get_books_page(after, limit)
+    next_cursor = encode_cursor(next_key) if next_key else None
+    return render_template('catalog.html', books=books, next_cursor=next_cursor,
+                           is_first_page=after is None, limit=limit)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -0,0 +1,14 @@
+"""
+Metrics Routes - Prometheus scrape endpoint
+"""
+
+from flask import Blueprint, Response
+
+from instrumentation import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Request, SQL, gateway, pool and cache metrics in Prometheus text format."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,87 @@
+"""
+Archive Service Module - Closed Loan Archival
+Moves loans returned more than a configurable time ago from borrow_records
+into borrow_records_archive, a batch at a time, so the table borrows and
+returns write to stays small. Archived loans stay readable through the
+borrow_history view (see get_borrow_record, get_patron_loan_history).
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database import get_db_connection, to_timestamp
+
+# Loans returned longer ago than this are archived (LIBRARY_ARCHIVE_AFTER_DAYS)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('LIBRARY_ARCHIVE_AFTER_DAYS', '365'))
+ARCHIVE_BATCH_SIZE = 5000    # loans moved per transaction
+
+_CLOSED = 'return_date IS NOT NULL AND return_date < :cutoff'
+
+
+def archive_closed_loans(older_than_days: Optional[int] = None, batch_size: int = ARCHIVE_BATCH_SIZE,
+                         now: Optional[datetime] = None) -> Dict:
+    """
+    Move loans returned more than older_than_days ago into the archive.
+
+    Walks borrow_records in id order, so every row is read once however
+    many batches it takes. Each batch is copied and deleted in its own
+    short write transaction; borrows and returns run in between.
+
+    Returns:
+        dict: archived (loans moved), batches and seconds
+    """
+    if older_than_days is None:
+        older_than_days = ARCHIVE_AFTER_DAYS
+    cutoff = to_timestamp((now or datetime.now()) - timedelta(days=older_than_days))
+    report = {'archived': 0, 'batches': 0}
+    start = time.perf_counter()
+    after = 0
+
+    conn = get_db_connection()
+    try:
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            last = conn.execute(f'''
+                SELECT MAX(id) FROM (
+                    SELECT id FROM borrow_records
+                    WHERE id > :after AND {_CLOSED}
+                    ORDER BY id LIMIT :batch
+                )
+            ''', {'cutoff': cutoff, 'after': after, 'batch': batch_size}).fetchone()[0]
+            if last is None:
+                conn.rollback()
+                break
+            params = {'cutoff': cutoff, 'after': after, 'last': last}
+            conn.execute(f'''
+                INSERT INTO borrow_records_archive (id, patron_id, book_id, borrow_date, due_date, return_date)
+                SELECT id, patron_id, book_id, borrow_date, due_date, return_date
+                FROM borrow_records WHERE id > :after AND id <= :last AND {_CLOSED}
+            ''', params)
+            moved = conn.execute(f'''
+                DELETE FROM borrow_records WHERE id > :after AND id <= :last AND {_CLOSED}
+            ''', params).rowcount
+            conn.commit()
+            report['archived'] += moved
+            report['batches'] += 1
+            after = last
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def get_archive_stats() -> Dict:
+    """Get the number of loans in borrow_records and in the archive."""
+    conn = get_db_connection()
+    stats = {
+        'hot': conn.execute('SELECT COUNT(*) FROM borrow_records').fetchone()[0],
+        'archived': conn.execute('SELECT COUNT(*) FROM borrow_records_archive').fetchone()[0],
+    }
+    conn.close()
+    return stats
@@ -0,0 +1,156 @@
+"""
+Fee Service Module - Late Fee Rules
+Late fee tiers shared by the per-book calculation, the patron status report
+and bulk fee computations over many loans.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from database import get_db_connection, get_patron_borrowed_books, to_timestamp
+
+# $0.50/day for the first 7 days overdue, then $1.00/day, capped at $15.00
+FIRST_TIER_DAYS = 7
+FIRST_TIER_RATE = 0.50
+SECOND_TIER_RATE = 1.00
+MAX_LATE_FEE = 15.00
+
+
+def late_fee_for_days(days_overdue: int) -> float:
+    """
+    Late fee for a book returned the given number of days late.
+    Implements the R5 fee tiers (the $15.00 cap is reached after 18 days).
+    """
+    if days_overdue <= 0:
+        return 0.0
+    if days_overdue <= FIRST_TIER_DAYS:
+        return days_overdue * FIRST_TIER_RATE
+    fee = FIRST_TIER_DAYS * FIRST_TIER_RATE + (days_overdue - FIRST_TIER_DAYS) * SECOND_TIER_RATE
+    return min(fee, MAX_LATE_FEE)
+
+
+def loan_late_fee(loan: Dict, now: Optional[datetime] = None) -> Dict:
+    """
+    Late fee still owed on one open loan, as returned by get_patron_borrowed_books().
+    Fees already paid against the loan (its 'fees_paid') are deducted.
+    
+    Args:
+        loan: loan dict with a datetime 'due_date'
+        now: time to compute the fee at (defaults to now)
+        
+    Returns:
+        dict: fee_amount, days_overdue and status, in the same shape as
+        calculate_late_fee_for_book()
+    """
+    now = now or datetime.now()
+    if not now > loan['due_date']:
+        return {
+            'fee_amount': 0.00,
+            'days_overdue': 0,
+            'status': 'Book returned before due date - no late fee applied'
+        }
+    
+    days_overdue = (now.date() - loan['due_date'].date()).days
+    fee = late_fee_for_days(days_overdue) - loan.get('fees_paid', 0.0)
+    return {
+        'fee_amount': round(max(fee, 0.0), 2),
+        'days_overdue': days_overdue,
+        'status': f'Book returned {days_overdue} days after the due date'
+    }
+
+
+def calculate_patron_late_fees(patron_id: str, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Late fees for all of a patron's open loans, from a single query.
+    
+    Returns:
+        list: the patron's borrowed books (see get_patron_borrowed_books),
+        each with fee_amount, days_overdue and status added
+    """
+    now = now or datetime.now()
+    return [dict(loan, **loan_late_fee(loan, now)) for loan in get_patron_borrowed_books(patron_id)]
+
+
+# Library-wide sweep: the same tiers as late_fee_for_days(), evaluated by
+# SQLite over every overdue open loan in one pass over a partial open-loan
+# index, so the cost follows open loans rather than the whole loan history.
+# Days overdue are counted in whole calendar days and fees paid by completed
+# payments are deducted per loan. Unlike loan_late_fee(), payments still
+# pending or unknown are not deducted: the patrons_payment_completed trigger
+# takes them off outstanding_fees when they complete.
+_SWEEP_SQL = '''
+    SELECT patron_id,
+           COUNT(*) AS overdue_loans,
+           MAX(days_overdue) AS max_days_overdue,
+           SUM(MAX(CASE
+                       WHEN days_overdue <= 0 THEN 0.0
+                       WHEN days_overdue <= :tier_days THEN days_overdue * :first_rate
+                       ELSE MIN(:tier_days * :first_rate + (days_overdue - :tier_days) * :second_rate, :max_fee)
+                   END - fees_paid, 0.0)) AS total_fee
+    FROM (
+        SELECT br.patron_id,
+               CAST(julianday(:as_of_date) - julianday(br.due_date, 'unixepoch', 'localtime', 'start of day')
+                    AS INTEGER) AS days_overdue,
+               (SELECT COALESCE(SUM(pa.amount), 0)
+                FROM payment_allocations pa
+                JOIN payments p ON p.id = pa.payment_id
+                WHERE pa.borrow_record_id = br.id AND p.status = 'completed') AS fees_paid
+        FROM borrow_records br
+        WHERE br.return_date IS NULL AND br.due_date < :as_of
+    )
+    GROUP BY patron_id
+    ORDER BY patron_id
+'''
+
+
+def sweep_late_fees(as_of: Optional[datetime] = None) -> List[Dict]:
+    """
+    Outstanding late fees for every patron with overdue books, for nightly billing.
+    
+    Args:
+        as_of: time to compute fees at (defaults to now)
+        
+    Returns:
+        list: one dict per patron (patron_id, overdue_loans, max_days_overdue,
+        total_fee), ordered by patron_id
+    """
+    as_of = as_of or datetime.now()
+    conn = get_db_connection()
+    rows = conn.execute(_SWEEP_SQL, {
+        'as_of': to_timestamp(as_of),
+        'as_of_date': as_of.date().isoformat(),
+        'tier_days': FIRST_TIER_DAYS,
+        'first_rate': FIRST_TIER_RATE,
+        'second_rate': SECOND_TIER_RATE,
+        'max_fee': MAX_LATE_FEE,
+    }).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def refresh_outstanding_fees(as_of: Optional[datetime] = None) -> int:
+    """
+    Store each patron's late fee total from a sweep in patrons.outstanding_fees.
+    Patrons without overdue books are reset to 0. All counters are written in
+    one transaction, so readers see either the old or the new totals.
+    
+    Returns:
+        int: number of patrons with outstanding fees
+    """
+    as_of = as_of or datetime.now()
+    totals = sweep_late_fees(as_of)
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('UPDATE patrons SET outstanding_fees = 0, fees_as_of = ?', (to_timestamp(as_of),))
+        conn.executemany('INSERT OR IGNORE INTO patrons (patron_id) VALUES (?)',
+                         [(row['patron_id'],) for row in totals])
+        conn.executemany('UPDATE patrons SET outstanding_fees = ?, fees_as_of = ? WHERE patron_id = ?',
+                         [(round(row['total_fee'], 2), to_timestamp(as_of), row['patron_id']) for row in totals])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return sum(1 for row in totals if row['total_fee'] > 0)
@@ -0,0 +1,255 @@
+"""
+Gateway Client Module - Resilient Payment Gateway Access
+Wraps PaymentGateway with per-call deadlines, retries for idempotent calls
+and a circuit breaker, so a slow or failing gateway can't hold up requests.
+ResilientGateway has the same interface as PaymentGateway and is used
+wherever the services create a gateway themselves.
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Tuple
+
+from instrumentation import record_gateway_call
+from .payment_service import PaymentGateway
+
+GATEWAY_TIMEOUT = 2.0             # seconds allowed per gateway call
+GATEWAY_WORKERS = 16              # threads making gateway calls
+VERIFY_RETRIES = 3                # extra attempts for verify_payment_status
+RETRY_BASE_DELAY = 0.1            # seconds; doubled on each retry, with full jitter
+RETRY_MAX_DELAY = 2.0
+BREAKER_FAILURE_THRESHOLD = 5     # consecutive failures that open the breaker
+BREAKER_RESET_TIMEOUT = 30.0      # seconds the breaker stays open before a trial call
+LATENCY_SAMPLES = 1000            # recent latencies kept per operation
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class GatewayError(Exception):
+    """The payment gateway could not be reached or did not answer in time."""
+
+
+class GatewayTimeout(GatewayError):
+    """
+    The gateway did not answer in time. The call keeps running; future is
+    the abandoned call, so its outcome can still be recorded when it ends.
+    """
+
+    def __init__(self, message: str, future=None):
+        super().__init__(message)
+        self.future = future
+
+
+class CircuitOpenError(GatewayError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency for a while.
+
+    After failure_threshold consecutive failures the breaker opens and
+    rejects calls. Once reset_timeout has passed it lets a single trial call
+    through (half-open): success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.times_opened += 1
+                self._state = OPEN
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+def percentile(samples, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ResilientGateway:
+    """
+    Payment gateway client with deadlines, retries and a circuit breaker.
+
+    Every call runs on a worker thread and is abandoned after timeout
+    seconds. Only verify_payment_status is retried: charging or refunding
+    twice is worse than failing, so a timed-out charge is raised as
+    GatewayTimeout, which carries the still-running call.
+    Gateway exceptions, timeouts and open-breaker rejections are raised as
+    GatewayError; declined payments are returned as usual.
+    """
+
+    def __init__(self, gateway=None, timeout: float = GATEWAY_TIMEOUT, retries: int = VERIFY_RETRIES,
+                 base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = GATEWAY_WORKERS):
+        self.gateway = gateway or PaymentGateway()
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gateway')
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counts = {'calls': 0, 'errors': 0, 'timeouts': 0, 'rejected': 0, 'retries': 0}
+
+    def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        return self._call('process_payment', self.gateway.process_payment, patron_id, amount, description)
+
+    def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        return self._call('refund_payment', self.gateway.refund_payment, transaction_id, amount)
+
+    def verify_payment_status(self, transaction_id: str) -> Dict:
+        attempt = 0
+        while True:
+            try:
+                return self._call('verify_payment_status', self.gateway.verify_payment_status, transaction_id)
+            except CircuitOpenError:
+                raise
+            except GatewayError:
+                if attempt >= self.retries:
+                    raise
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            attempt += 1
+            self._count('retries')
+
+    def metrics(self) -> Dict:
+        """Breaker state, call counters and latency percentiles (ms) per operation."""
+        with self._lock:
+            latencies = {name: list(samples) for name, samples in self._latencies.items()}
+            counts = dict(self._counts)
+        return dict(
+            counts,
+            breaker_state=self.breaker.state,
+            breaker_opened=self.breaker.times_opened,
+            latency_ms={
+                name: {
+                    'count': len(samples),
+                    'p50': round(percentile(samples, 0.50) * 1000, 2),
+                    'p95': round(percentile(samples, 0.95) * 1000, 2),
+                    'p99': round(percentile(samples, 0.99) * 1000, 2),
+                    'max': round(max(samples) * 1000, 2),
+                }
+                for name, samples in latencies.items() if samples
+            },
+        )
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+    def _call(self, name: str, fn: Callable, *args):
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError("Payment gateway is unavailable, try again later")
+
+        self._count('calls')
+        start = time.perf_counter()
+        future = self._executor.submit(fn, *args)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._count('timeouts')
+            self.breaker.record_failure()
+            raise GatewayTimeout(f"Payment gateway did not respond within {self.timeout:g}s", future)
+        except Exception as e:
+            self._count('errors')
+            self.breaker.record_failure()
+            raise GatewayError(f"Payment gateway error: {e}") from e
+        finally:
+            self._record_latency(name, time.perf_counter() - start)
+
+        self.breaker.record_success()
+        return result
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counts[counter] += 1
+
+    def _record_latency(self, name: str, seconds: float):
+        record_gateway_call(seconds)
+        with self._lock:
+            samples = self._latencies.get(name)
+            if samples is None:
+                samples = self._latencies[name] = deque(maxlen=LATENCY_SAMPLES)
+            samples.append(seconds)
+
+
+_default_gateway = None
+_default_gateway_lock = threading.Lock()
+
+
+def get_payment_gateway() -> ResilientGateway:
+    """The process-wide gateway client, shared so its circuit breaker sees every call."""
+    global _default_gateway
+    with _default_gateway_lock:
+        if _default_gateway is None:
+            _default_gateway = ResilientGateway()
+        return _default_gateway
+
+
+def set_payment_gateway(gateway: Optional[ResilientGateway]):
+    """Replace the process-wide gateway client (None creates a fresh one on next use)."""
+    global _default_gateway
+    with _default_gateway_lock:
+        _default_gateway = gateway
+
+
+def _forget_gateway_after_fork():
+    # the parent's gateway threads don't exist in a forked child
+    global _default_gateway, _default_gateway_lock
+    _default_gateway = None
+    _default_gateway_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_gateway_after_fork)
@@ -0,0 +1,151 @@
+"""
+Import Service Module - Bulk Catalog Import
+Streams books from CSV or JSONL files into the catalog in large batches,
+applying the same R1 validation as add_book_to_catalog.
+"""
+
+import codecs
+import csv
+import io
+import json
+import time
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from database import insert_books_bulk
+from .library_service import validate_book_details
+
+IMPORT_CHUNK_SIZE = 5000      # books inserted per transaction
+MAX_REPORTED_ERRORS = 1000    # per-row errors kept in the report (all are counted)
+
+BOOK_FIELDS = ('title', 'author', 'isbn', 'total_copies')
+
+
+def read_books_csv(stream: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line number, row) for each book in a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_books_jsonl(stream: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line number, row) for each JSON object line; blank lines are skipped."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else {'_error': 'Line is not a JSON object.'}
+
+
+def detect_format(filename: str) -> str:
+    """Guess 'csv' or 'jsonl' from a file name."""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+
+def _parse_copies(value) -> Optional[int]:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def import_books(rows: Iterable[Tuple[int, Dict]], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """
+    Validate and insert books from (line number, row) pairs.
+    
+    Rows are validated one by one, de-duplicated by ISBN within the import
+    and against the catalog, and written chunk_size at a time with one
+    executemany per transaction.
+    
+    Returns:
+        dict: rows, imported, duplicates, rejected counts, errors
+        (list of {'line', 'isbn', 'error'}), seconds and rows_per_sec
+    """
+    report = {'rows': 0, 'imported': 0, 'duplicates': 0, 'rejected': 0, 'errors': []}
+    seen_isbns = set()
+    pending: List[Tuple[int, Tuple[str, str, str, int, int]]] = []
+    start = time.perf_counter()
+
+    def record_error(kind, line_number, isbn, message):
+        report[kind] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_number, 'isbn': isbn, 'error': message})
+
+    def reject(line_number, isbn, message):
+        record_error('rejected', line_number, isbn, message)
+
+    def flush():
+        inserted, existing = insert_books_bulk([book for _, book in pending])
+        report['imported'] += inserted
+        for line_number, book in pending:
+            if book[2] in existing:
+                record_error('duplicates', line_number, book[2], "A book with this ISBN already exists.")
+        pending.clear()
+
+    for line_number, row in rows:
+        report['rows'] += 1
+        if '_error' in row:
+            reject(line_number, None, row['_error'])
+            continue
+
+        title, author, isbn = (_text(row.get(field)) for field in BOOK_FIELDS[:3])
+        try:
+            (title + author + isbn).encode('utf-8')
+        except UnicodeEncodeError:
+            # bytes that were not UTF-8, kept as surrogates by the decoder
+            reject(line_number, None, "Row is not valid UTF-8.")
+            continue
+        copies = _parse_copies(row.get('total_copies'))
+        if copies is None:
+            reject(line_number, isbn, "Total copies must be a positive integer.")
+            continue
+
+        valid, result = validate_book_details(title, author, isbn, copies)
+        if not valid:
+            reject(line_number, isbn, result)
+            continue
+        isbn = result
+
+        if isbn in seen_isbns:
+            record_error('duplicates', line_number, isbn, "ISBN appears more than once in this import.")
+            continue
+        seen_isbns.add(isbn)
+
+        pending.append((line_number, (title.strip(), author.strip(), isbn, copies, copies)))
+        if len(pending) >= chunk_size:
+            flush()
+
+    if pending:
+        flush()
+
+    report['seconds'] = time.perf_counter() - start
+    report['rows_per_sec'] = report['rows'] / report['seconds'] if report['seconds'] > 0 else 0.0
+    return report
+
+
+def import_books_stream(stream: IO, fmt: str = 'csv', chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """
+    Import books from an open text or binary (UTF-8) stream in 'csv' or 'jsonl' format.
+    Rows with bytes that are not UTF-8 are rejected; the rest still import.
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        # decode line by line so uploads are never read into memory whole
+        text = codecs.iterdecode(stream, 'utf-8-sig', errors='surrogateescape')
+    reader = read_books_jsonl if fmt == 'jsonl' else read_books_csv
+    return import_books(reader(text), chunk_size)
+
+
+def import_books_file(path: str, fmt: Optional[str] = None, chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """Import books from a CSV or JSONL file; the format is guessed from the extension if not given."""
+    with open(path, encoding='utf-8-sig', errors='surrogateescape', newline='') as stream:
+        return import_books_stream(stream, fmt or detect_format(path), chunk_size)
@@ -6,29 +6,26 @@ Contains all the core business logic for the Library Management System
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from database import (
-    get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
-    insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books, get_patron_borrowed_books
+    get_book_by_id, get_book_by_isbn,
+    insert_book, get_patron_borrowed_books, get_patron, get_patron_borrow_history,
+    borrow_book_transaction, return_book_transaction, search_books, MAX_BORROWED_BOOKS
 )
+from .fee_service import loan_late_fee, calculate_patron_late_fees
 from .payment_service import PaymentGateway
+from .gateway_client import get_payment_gateway, GatewayTimeout
+from . import payment_ledger
+from .payment_status import status_cache
 
 
 
-def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+def validate_book_details(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
-    Add a new book to the catalog.
-    Implements R1: Book Catalog Management
+    Validate the details of a new book against the R1 rules.
+    Shared by add_book_to_catalog and the bulk importer.
     
-    Args:
-        title: Book title (max 200 chars)
-        author: Book author (max 100 chars)
-        isbn: 13-digit ISBN
-        total_copies: Number of copies (positive integer)
-        
     Returns:
-        tuple: (success: bool, message: str)
+        tuple: (True, isbn with spaces removed) if valid, else (False, error message)
     """
-    # Input validation
     if not title or not title.strip():
         return False, "Title is required."
     
@@ -49,6 +46,30 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     if not isinstance(total_copies, int) or total_copies <= 0:
         return False, "Total copies must be a positive integer."
     
+    return True, isbn
+
+
+
+def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+    """
+    Add a new book to the catalog.
+    Implements R1: Book Catalog Management
+    
+    Args:
+        title: Book title (max 200 chars)
+        author: Book author (max 100 chars)
+        isbn: 13-digit ISBN
+        total_copies: Number of copies (positive integer)
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    # Input validation
+    valid, result = validate_book_details(title, author, isbn, total_copies)
+    if not valid:
+        return False, result
+    isbn = result
+    
     # Check for duplicate ISBN
     existing = get_book_by_isbn(isbn)
     if existing:
@@ -79,34 +100,25 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
-    book = get_book_by_id(book_id)
-    if not book:
+    # Loan period is 14 days
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=14)
+    
+    # Check the book and the patron's limit, then record the loan, all in one transaction
+    status, book = borrow_book_transaction(patron_id, book_id, borrow_date, due_date, MAX_BORROWED_BOOKS)
+    if status == 'not_found':
         return False, "Book not found."
     
-    if book['available_copies'] <= 0:
+    if status == 'unavailable':
         return False, "This book is currently not available."
     
-    # Check patron's current borrowed books count
-    current_borrowed = get_patron_borrow_count(patron_id)
-    
     # Fixed error which allowed 6 books to be borrowed
-    if current_borrowed >= 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    if status == 'limit_reached':
+        return False, f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books."
     
-    # Create borrow record
-    borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
-    
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
+    if status != 'borrowed':
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
 
@@ -145,12 +157,14 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
 
     late_fee = calculate_late_fee_for_book(patron_id, book_id)
 
-    if not update_borrow_record_return_date(patron_id, book_id, datetime.now()):
+    # Close the loan and put the copy back in one transaction
+    status, loan = return_book_transaction(patron_id, book_id, datetime.now())
+    if status == 'not_borrowed':
+        return False, "Book was not borrowed by this user"
+
+    if status != 'returned':
         return False, "Updating borrow record failed"
     
-    if not update_book_availability(book_id, 1):
-        return False, "Updating book availability failed"
-    
     return True, f"Fee Amount: {late_fee['fee_amount']}.  Days Overdue: {late_fee['days_overdue']}.  Status: {late_fee['status']}"
     
     
@@ -209,48 +223,9 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         }
     
 
-    time_now = datetime.now().date()
-    time_due = this_book["due_date"].date()
-
-    if not this_book["is_overdue"]:
-        return  {
-            'fee_amount': 0.00,
-            'days_overdue': 0,
-            'status': 'Book returned before due date - no late fee applied'
-        }
-    
-    else:
-        # calculate late fee, return result in json format
-        days_overdue = (time_now - time_due).days
-
-        # 0.5 dollar sper day up to 7 days
-        if days_overdue <= 7:
-            return  {
-                'fee_amount': days_overdue * 0.5,
-                'days_overdue': days_overdue,
-                'status': f'Book returned {days_overdue} days after the due date'
-            }
-        
-        # 1 dollar per day after 7 days, up to 18 days (ater 18, fine stays at $15)
-        elif 7 < days_overdue <= 18:
-            return  {
-                'fee_amount': 3.5 + (days_overdue - 7),
-                'days_overdue': days_overdue,
-                'status': f'Book returned {days_overdue} days after the due date'
-            }
-        
-        else:
-            return  {
-                'fee_amount': 15.00,
-                'days_overdue': days_overdue,
-                'status': f'Book returned {days_overdue} days after the due date'
-            }
-
-
-            
-
-
-
+    # fee tiers live in the fee service so bulk calculations share them;
+    # record_id lets a payment be allocated to this loan in the ledger
+    return dict(loan_late_fee(this_book), record_id=this_book['record_id'], fees_paid=this_book['fees_paid'])
 
 
 
@@ -270,48 +245,23 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     if search_type not in ["author", "title", "isbn"]:
         return []
     
-    all_books = get_all_books()
-    
-    results = []
-
     # if search term is empty string, then the search will always return nothing, no matter the search type
     if search_term == "":
-        return results
-
-
-    # search by author
-    if search_type == "author":
-        q = search_term.lower()
-        for book in all_books:
-            if q in book["author"].lower():
-                results.append(book)
-        return results
-
-    # search by title
-    if search_type == "title":
-        q = search_term.lower()
-        for book in all_books:
-            if q in book["title"].lower() or q == book["title"].lower():
-                results.append(book)
-        return results 
-    
-    # search by isbn
-    if search_type == "isbn":
-        q = search_term
-        # check that q is a valid isbn number
-        if not q.isdigit() or len(q) != 13:
-            return []
-        
-        for book in all_books:
-            # isbn is digits, and therefor cannot be in loewrcase. other code ensures isbn is correct
-            if q == book["isbn"]:
-                results.append(book)
-        return results 
-    
-    # in case of some unidentified error
-    return []
+        return []
+
+    # check that an isbn search term is a valid isbn number
+    if search_type == "isbn" and (not search_term.isdigit() or len(search_term) != 13):
+        return []
+
+    # title/author go through the full-text index (words starting with each search word,
+    # best matches first), isbn is an exact indexed lookup
+    return search_books(search_term, search_type)
+
 
 
+# Returned loans listed in the status report, most recent first
+REPORT_HISTORY_SIZE = 50
+
 
 def get_patron_status_report(patron_id: str) -> Dict:
     """
@@ -331,22 +281,33 @@ def get_patron_status_report(patron_id: str) -> Dict:
         "borrow_history": [],
         "status": "No issues"
     }
-    borrow_count = get_patron_borrow_count(patron_id)
+    # no counters row means the patron has never borrowed anything
+    patron = get_patron(patron_id)
+    if not patron:
+        return report
 
-    if borrow_count == 0:
+    # the most recent returned loans; the full history pages through /api/patrons/<id>/history
+    history, _ = get_patron_borrow_history(patron_id, limit=REPORT_HISTORY_SIZE)
+    report["borrow_history"] = [(loan["title"], loan["borrow_date"], loan["return_date"]) for loan in history]
+
+    if not patron["open_loans"]:
+        return report
+
+    # one query for all open loans, fees computed from the same rows
+    loans = calculate_patron_late_fees(patron_id)
+
+    if not loans:
         return report
 
-    borrowed_books = get_patron_borrowed_books(patron_id)
     total_fee = 0.00
 
     # handle calculations of total late fees, as well as creating a list of tuples for borrowed books and their due dates
-    for book in borrowed_books:
-        fee_info = calculate_late_fee_for_book(patron_id, book["book_id"])
-        report["currently_borrowed"].append((book["title"], book["due_date"]))
-        total_fee += fee_info["fee_amount"]
+    for loan in loans:
+        report["currently_borrowed"].append((loan["title"], loan["due_date"]))
+        total_fee += loan["fee_amount"]
     
     report["owed_late_fees"] = total_fee
-    report["current_borrow_count"] = borrow_count
+    report["current_borrow_count"] = patron["open_loans"]
 
     return report
 
@@ -354,7 +315,8 @@ def get_patron_status_report(patron_id: str) -> Dict:
 
 
 # CODE FOR PART 1
-def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None,
+                  idempotency_key: Optional[str] = None) -> Tuple[bool, str, Optional[str]]:
     """
     Process payment for late fees using external payment gateway.
     
@@ -365,6 +327,8 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         patron_id: 6-digit library card ID
         book_id: ID of the book with late fees
         payment_gateway: Payment gateway instance (injectable for testing)
+        idempotency_key: Client-supplied key for this payment attempt; retrying with
+            the same key returns the recorded result instead of charging again
         
     Returns:
         tuple: (success: bool, message: str, transaction_id: Optional[str])
@@ -379,6 +343,12 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits.", None
     
+    # A retry of a recorded payment is answered from the ledger
+    if idempotency_key:
+        previous = payment_ledger.find_payment(idempotency_key)
+        if previous:
+            return _recorded_payment_result(previous)
+    
     # Calculate late fee first
     fee_info = calculate_late_fee_for_book(patron_id, book_id)
     
@@ -396,9 +366,21 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     if not book:
         return False, "Book not found.", None
     
-    # Use provided gateway or create new one
+    # Record the payment as pending before charging, claiming the idempotency key
+    payment_id, previous = payment_ledger.start_payment(
+        patron_id, fee_amount,
+        [{'book_id': book_id, 'record_id': fee_info.get('record_id'), 'fee_amount': fee_amount,
+          'fees_paid': fee_info.get('fees_paid', 0.0)}],
+        idempotency_key
+    )
+    if previous:
+        return _recorded_payment_result(previous)
+    if payment_id is None:
+        return False, "Late fees for this book are already being paid.", None
+    
+    # Use provided gateway or the shared client (deadlines, retries, circuit breaker)
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = get_payment_gateway()
     
     # Process payment through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
@@ -410,17 +392,170 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         )
         
         if success:
-            return True, f"Payment successful! {message}", transaction_id
+            message = f"Payment successful! {message}"
+            payment_ledger.complete_payment(payment_id, transaction_id, message)
+            return True, message, transaction_id
         else:
+            payment_ledger.cancel_payment(payment_id)
             return False, f"Payment failed: {message}", None
             
+    except GatewayTimeout as e:
+        # The charge may still go through: keep the key and the fee claimed
+        _hold_timed_out_payment(payment_id, e)
+        return False, f"Payment processing error: {str(e)}. It will not be charged again.", None
     except Exception as e:
         # Handle payment gateway errors
+        payment_ledger.cancel_payment(payment_id)
         return False, f"Payment processing error: {str(e)}", None
 
 
 
+def _recorded_payment_result(payment: Dict) -> Tuple[bool, str, Optional[str]]:
+    """pay_late_fees() result for a payment already in the ledger."""
+    if payment['status'] == payment_ledger.UNKNOWN:
+        return False, "Payment is still being confirmed with the payment gateway.", None
+    if payment['status'] != payment_ledger.COMPLETED:
+        return False, "Payment is already being processed.", None
+    return True, payment['message'], payment['transaction_id']
+
+
+def _hold_timed_out_payment(payment_id: int, timeout: GatewayTimeout) -> None:
+    """
+    Mark a payment whose gateway call timed out as unknown, and settle it
+    in the ledger when the abandoned call finishes. A call that fails
+    without an answer leaves it unknown for reconcile_payments() to report.
+    """
+    payment_ledger.mark_payment_unknown(payment_id, str(timeout))
+    if timeout.future is None:
+        return
+
+    def settle(future):
+        try:
+            success, transaction_id, message = future.result()
+        except Exception:
+            return
+        if success:
+            payment_ledger.complete_payment(payment_id, transaction_id, f"Payment successful! {message}")
+        else:
+            payment_ledger.cancel_payment(payment_id)
+
+    timeout.future.add_done_callback(settle)
+
+
+def _hold_timed_out_refund(transaction_id: str, amount: float, reserved: bool, timeout: GatewayTimeout) -> None:
+    """
+    Keep the reservation of a refund whose gateway call timed out, and
+    settle it when the abandoned call finishes: released if the gateway
+    declined it, kept if it went through or failed without an answer.
+    """
+    if timeout.future is None:
+        return
+
+    def settle(future):
+        try:
+            success, _ = future.result()
+        except Exception:
+            return
+        if success:
+            status_cache.invalidate(transaction_id)
+        elif reserved:
+            payment_ledger.release_refund(transaction_id, amount)
+
+    timeout.future.add_done_callback(settle)
+
+
+
+
+
+
+
+# Largest single charge the payment gateway accepts
+GATEWAY_CHARGE_LIMIT = 1000.00
+
 
+def split_fee_charges(loans: List[Dict], charge_limit: float = GATEWAY_CHARGE_LIMIT) -> List[List[Dict]]:
+    """
+    Group loans with fees into as few charges as possible, none over charge_limit.
+    Each book's fee stays whole within one charge so the allocation is exact.
+    """
+    charges = []
+    totals = []
+    for loan in sorted(loans, key=lambda loan: loan['fee_amount'], reverse=True):
+        cents = round(loan['fee_amount'] * 100)
+        for index, total in enumerate(totals):
+            if total + cents <= round(charge_limit * 100):
+                charges[index].append(loan)
+                totals[index] += cents
+                break
+        else:
+            charges.append([loan])
+            totals.append(cents)
+    return charges
+
+
+
+def pay_all_late_fees(patron_id: str, payment_gateway: PaymentGateway = None,
+                      charge_limit: float = GATEWAY_CHARGE_LIMIT) -> Tuple[bool, str, List[Dict]]:
+    """
+    Pay all of a patron's outstanding late fees in as few gateway calls as possible.
+    
+    Fees for every open loan are computed in one pass and combined into one
+    charge, split into several only if the total is over the gateway's limit.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        payment_gateway: Payment gateway instance (injectable for testing)
+        charge_limit: Largest amount to send in one charge
+        
+    Returns:
+        tuple: (success: bool, message: str, charges: list) where each charge is
+        {'transaction_id', 'amount', 'allocations': [{'book_id', 'title', 'fee_amount'}]}
+        for every charge that went through
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+    
+    owed = [loan for loan in calculate_patron_late_fees(patron_id) if loan['fee_amount'] > 0]
+    if not owed:
+        return False, "No late fees to pay.", []
+    
+    if payment_gateway is None:
+        payment_gateway = get_payment_gateway()
+    
+    batches = split_fee_charges(owed, charge_limit)
+    charges = []
+    for batch in batches:
+        amount = round(sum(loan['fee_amount'] for loan in batch), 2)
+        paid = f" ({len(charges)} of {len(batches)} charges went through)" if charges else ""
+        payment_id, _ = payment_ledger.start_payment(patron_id, amount, batch)
+        if payment_id is None:
+            return False, f"Late fees are already being paid.{paid}", charges
+        try:
+            success, transaction_id, message = payment_gateway.process_payment(
+                patron_id=patron_id,
+                amount=amount,
+                description=f"Late fees for {len(batch)} book(s)"
+            )
+        except GatewayTimeout as e:
+            _hold_timed_out_payment(payment_id, e)
+            return False, f"Payment processing error: {str(e)}. It will not be charged again.{paid}", charges
+        except Exception as e:
+            success, message = False, f"Payment processing error: {str(e)}"
+        
+        if not success:
+            payment_ledger.cancel_payment(payment_id)
+            return False, f"Payment failed: {message}{paid}", charges
+        
+        payment_ledger.complete_payment(payment_id, transaction_id, f"Payment successful! {message}")
+        charges.append({
+            'transaction_id': transaction_id,
+            'amount': amount,
+            'allocations': [{'book_id': loan['book_id'], 'title': loan['title'], 'fee_amount': loan['fee_amount']}
+                            for loan in batch]
+        })
+    
+    total = sum(charge['amount'] for charge in charges)
+    return True, f"Payment successful! Paid ${total:.2f} for {len(owed)} book(s).", charges
 
 
 
@@ -445,12 +580,18 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     if amount <= 0:
         return False, "Refund amount must be greater than 0."
     
-    if amount > 15.00:  # Maximum late fee per book
+    # Payments in the ledger are checked against what was actually paid;
+    # older transactions fall back to the per-book fee cap
+    payment = payment_ledger.find_payment_by_transaction(transaction_id)
+    if payment:
+        if not payment_ledger.reserve_refund(transaction_id, amount):
+            return False, "Refund amount exceeds the amount paid."
+    elif amount > 15.00:  # Maximum late fee per book
         return False, "Refund amount exceeds maximum late fee."
     
-    # Use provided gateway or create new one
+    # Use provided gateway or the shared client (deadlines, retries, circuit breaker)
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = get_payment_gateway()
     
     # Process refund through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
@@ -458,9 +599,18 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         success, message = payment_gateway.refund_payment(transaction_id, amount)
         
         if success:
+            status_cache.invalidate(transaction_id)
             return True, message
         else:
+            if payment:
+                payment_ledger.release_refund(transaction_id, amount)
             return False, f"Refund failed: {message}"
             
+    except GatewayTimeout as e:
+        # The refund may still go through: keep it counted against the payment
+        _hold_timed_out_refund(transaction_id, amount, payment is not None, e)
+        return False, f"Refund processing error: {str(e)}. It may still go through."
     except Exception as e:
+        if payment:
+            payment_ledger.release_refund(transaction_id, amount)
         return False, f"Refund processing error: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Payment Jobs Module - Background Payment Processing
+Runs late fee payments on a background thread pool so web requests return
+a job ID immediately instead of waiting on the payment gateway. Job state
+is kept in the payment_jobs table, so whichever worker process a status
+poll reaches can answer it.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from database import get_db_connection
+from .library_service import pay_late_fees
+from .gateway_client import get_payment_gateway
+
+PAYMENT_WORKERS = 8          # payments processed at once
+GATEWAY_CONCURRENCY = 4      # gateway calls in flight at once, across all workers
+MAX_TRACKED_JOBS = 10000     # finished jobs kept for status polling (oldest dropped first)
+
+
+class BoundedGateway:
+    """Wraps a payment gateway so at most max_concurrency calls run at the same time."""
+
+    def __init__(self, gateway, max_concurrency: int = GATEWAY_CONCURRENCY):
+        self.gateway = gateway
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def process_payment(self, *args, **kwargs):
+        with self._slots:
+            return self.gateway.process_payment(*args, **kwargs)
+
+    def refund_payment(self, *args, **kwargs):
+        with self._slots:
+            return self.gateway.refund_payment(*args, **kwargs)
+
+    def verify_payment_status(self, *args, **kwargs):
+        with self._slots:
+            return self.gateway.verify_payment_status(*args, **kwargs)
+
+
+class PaymentJobQueue:
+    """
+    Background executor for late fee payments.
+    
+    Jobs move from 'queued' to 'processing' to 'succeeded' or 'failed';
+    get_job() returns the current state for polling, from any process.
+    """
+
+    def __init__(self, gateway=None, max_workers: int = PAYMENT_WORKERS,
+                 max_concurrency: int = GATEWAY_CONCURRENCY, max_jobs: int = MAX_TRACKED_JOBS):
+        self.gateway = BoundedGateway(gateway or get_payment_gateway(), max_concurrency)
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='payment')
+
+    def submit(self, kind: str, work: Callable, **params) -> str:
+        """Queue work(gateway) as a job and return its ID straight away."""
+        job_id = uuid.uuid4().hex
+        conn = get_db_connection()
+        conn.execute('''
+            INSERT INTO payment_jobs (job_id, kind, params, status, submitted_at)
+            VALUES (?, ?, ?, 'queued', ?)
+        ''', (job_id, kind, json.dumps(params), time.time()))
+        self._forget_old_jobs(conn)
+        conn.commit()
+        conn.close()
+        self._executor.submit(self._run, job_id, work)
+        return job_id
+
+    def submit_late_fee_payment(self, patron_id: str, book_id: int,
+                                idempotency_key: Optional[str] = None) -> str:
+        """Queue pay_late_fees(patron_id, book_id) and return the job ID."""
+        return self.submit('late_fee',
+                           lambda gateway: pay_late_fees(patron_id, book_id, gateway, idempotency_key),
+                           patron_id=patron_id, book_id=book_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job's current state, or None if it is unknown."""
+        conn = get_db_connection()
+        row = conn.execute('SELECT * FROM payment_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['success'] = None if job['success'] is None else bool(job['success'])
+        return job
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id: str, work: Callable):
+        self._update(job_id, status='processing')
+        try:
+            success, message, transaction_id = work(self.gateway)
+        except Exception as e:
+            success, message, transaction_id = False, f"Payment processing error: {str(e)}", None
+        self._update(job_id, status='succeeded' if success else 'failed', success=success,
+                     message=message, transaction_id=transaction_id, finished_at=time.time())
+
+    def _update(self, job_id: str, **changes):
+        assignments = ', '.join(f'{column} = ?' for column in changes)
+        conn = get_db_connection()
+        conn.execute(f'UPDATE payment_jobs SET {assignments} WHERE job_id = ?', (*changes.values(), job_id))
+        conn.commit()
+        conn.close()
+
+    def _forget_old_jobs(self, conn):
+        # only finished jobs are dropped; queued and running ones stay pollable
+        excess = conn.execute('SELECT COUNT(*) FROM payment_jobs').fetchone()[0] - self.max_jobs
+        if excess <= 0:
+            return
+        conn.execute('''
+            DELETE FROM payment_jobs WHERE rowid IN (
+                SELECT rowid FROM payment_jobs WHERE finished_at IS NOT NULL ORDER BY rowid LIMIT ?)
+        ''', (excess,))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_payment_queue() -> PaymentJobQueue:
+    """Get the process-wide payment job queue, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PaymentJobQueue()
+        return _queue
+
+
+def set_payment_queue(queue: Optional[PaymentJobQueue]):
+    """Replace the process-wide queue (e.g. with one using a test gateway)."""
+    global _queue
+    with _queue_lock:
+        _queue = queue
+
+
+def shutdown_payment_queue(wait: bool = True):
+    """Shut down the process-wide queue, if one was started, letting queued jobs finish."""
+    with _queue_lock:
+        queue = _queue
+    if queue is not None:
+        queue.shutdown(wait)
+
+
+def _forget_queue_after_fork():
+    # the parent's worker threads don't exist in a forked child
+    global _queue, _queue_lock
+    _queue = None
+    _queue_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_queue_after_fork)
@@ -0,0 +1,224 @@
+"""
+Payment Ledger Module - Recorded Late Fee Payments
+Every charge that goes through the payment gateway is recorded in the
+payments table, with the loans it settled in payment_allocations. The
+ledger lets retries with the same idempotency key return the original
+result without charging again, and lets refunds be checked against the
+amount actually paid.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import get_db_connection
+
+# Payment statuses
+PENDING = 'pending'
+COMPLETED = 'completed'
+UNKNOWN = 'unknown'       # the gateway call timed out; the charge may still go through
+
+# Amounts are compared to the cent
+_CENT = 0.005
+
+
+def _payment_row(conn: sqlite3.Connection, column: str, value) -> Optional[Dict]:
+    payment = conn.execute(f'SELECT * FROM payments WHERE {column} = ?', (value,)).fetchone()
+    return dict(payment) if payment else None
+
+
+def find_payment(idempotency_key: str) -> Optional[Dict]:
+    """Get the payment recorded under an idempotency key, if any."""
+    conn = get_db_connection()
+    payment = _payment_row(conn, 'idempotency_key', idempotency_key)
+    conn.close()
+    return payment
+
+
+def find_payment_by_transaction(transaction_id: str) -> Optional[Dict]:
+    """Get the payment with the given gateway transaction ID, if any."""
+    conn = get_db_connection()
+    payment = _payment_row(conn, 'transaction_id', transaction_id)
+    conn.close()
+    return payment
+
+
+def get_payment_allocations(payment_id: int) -> List[Dict]:
+    """Get the loans a payment settled, as book_id, borrow_record_id and amount."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT book_id, borrow_record_id, amount FROM payment_allocations
+        WHERE payment_id = ? ORDER BY rowid
+    ''', (payment_id,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def list_completed_payments(start: datetime, end: datetime) -> List[Dict]:
+    """Get completed payments made in [start, end), oldest first."""
+    return list_payments(start, end, COMPLETED)
+
+
+def list_payments(start: datetime, end: datetime, status: str) -> List[Dict]:
+    """Get payments with the given status made in [start, end), oldest first."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT * FROM payments
+        WHERE status = ? AND created_at >= ? AND created_at < ?
+        ORDER BY id
+    ''', (status, start.isoformat(), end.isoformat())).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def start_payment(patron_id: str, amount: float, allocations: List[Dict],
+                  idempotency_key: Optional[str] = None) -> Tuple[Optional[int], Optional[Dict]]:
+    """
+    Record a pending payment before the gateway is charged.
+
+    The idempotency key is claimed here, so of several concurrent requests
+    with the same key only one goes on to charge the gateway. Pending
+    payments count towards a loan's fees_paid, and a loan whose fees_paid
+    has changed since the caller priced it is refused, so concurrent
+    requests without a key cannot pay the same fee twice either.
+
+    Args:
+        patron_id: 6-digit library card ID
+        amount: amount about to be charged
+        allocations: loans being paid, as dicts with book_id, record_id, fee_amount
+            and the fees_paid the fee was computed with
+        idempotency_key: client-supplied key identifying this payment attempt
+
+    Returns:
+        tuple: (payment_id, None) if recorded, (None, existing payment) if
+        the idempotency key was already used, or (None, None) if another
+        payment for one of the loans got there first
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for loan in allocations:
+            if loan.get('record_id') is None or 'fees_paid' not in loan:
+                continue
+            reserved = conn.execute('''
+                SELECT COALESCE(SUM(amount), 0) FROM payment_allocations WHERE borrow_record_id = ?
+            ''', (loan['record_id'],)).fetchone()[0]
+            if abs(reserved - loan['fees_paid']) > _CENT:
+                conn.rollback()
+                return None, None
+        cursor = conn.execute('''
+            INSERT INTO payments (idempotency_key, patron_id, amount, status, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (idempotency_key, patron_id, amount, PENDING, datetime.now().isoformat()))
+        payment_id = cursor.lastrowid
+        conn.executemany('''
+            INSERT INTO payment_allocations (payment_id, borrow_record_id, book_id, amount)
+            VALUES (?, ?, ?, ?)
+        ''', [(payment_id, loan.get('record_id'), loan['book_id'], loan['fee_amount'])
+              for loan in allocations])
+        conn.commit()
+        return payment_id, None
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return None, _payment_row(conn, 'idempotency_key', idempotency_key)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def complete_payment(payment_id: int, transaction_id: str, message: str) -> bool:
+    """Mark a pending or unknown payment completed once the gateway has accepted it."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE payments SET status = ?, transaction_id = ?, message = ?
+            WHERE id = ? AND status IN (?, ?)
+        ''', (COMPLETED, transaction_id, message, payment_id, PENDING, UNKNOWN))
+        conn.commit()
+        return cursor.rowcount == 1
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return False
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def mark_payment_unknown(payment_id: int, message: str) -> None:
+    """
+    Record that the gateway call for a pending payment timed out. The payment
+    keeps its idempotency key and its allocations, so the fee is not charged
+    again, until complete_payment() or cancel_payment() settles it.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('UPDATE payments SET status = ?, message = ? WHERE id = ? AND status = ?',
+                     (UNKNOWN, message, payment_id, PENDING))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def cancel_payment(payment_id: int) -> None:
+    """Remove a pending or unknown payment the gateway declined, freeing its idempotency key."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            DELETE FROM payment_allocations WHERE payment_id IN (
+                SELECT id FROM payments WHERE id = ? AND status IN (?, ?))
+        ''', (payment_id, PENDING, UNKNOWN))
+        conn.execute('DELETE FROM payments WHERE id = ? AND status IN (?, ?)', (payment_id, PENDING, UNKNOWN))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def reserve_refund(transaction_id: str, amount: float) -> bool:
+    """
+    Count a refund against a completed payment before the gateway is asked for it.
+    Fails if it would take total refunds past the amount paid.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE payments SET refunded_amount = refunded_amount + ?
+            WHERE transaction_id = ? AND status = ? AND refunded_amount + ? <= amount + ?
+        ''', (amount, transaction_id, COMPLETED, amount, _CENT))
+        conn.commit()
+        return cursor.rowcount == 1
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def release_refund(transaction_id: str, amount: float) -> None:
+    """Undo reserve_refund() for a refund the gateway declined."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE payments SET refunded_amount = MAX(refunded_amount - ?, 0)
+            WHERE transaction_id = ?
+        ''', (amount, transaction_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def refundable_amount(payment: Dict) -> float:
+    """Amount of a payment that has not been refunded yet."""
+    return round(payment['amount'] - payment['refunded_amount'], 2)
@@ -0,0 +1,166 @@
+"""
+Payment Status Module - Cached Payment Verification
+verify_payment_status costs a gateway round trip (0.3s). Statuses are
+cached here: completed transactions for as long as they stay in the cache,
+anything still in flight for a few seconds. verify_many() checks many
+transactions at once on a bounded thread pool, which is what end-of-day
+reconciliation uses.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from .gateway_client import get_payment_gateway
+from .payment_ledger import list_completed_payments, list_payments, UNKNOWN
+
+STATUS_CACHE_SIZE = 100000   # transactions kept (least recently used dropped first)
+PENDING_STATUS_TTL = 10.0    # seconds a status other than 'completed' is trusted
+VERIFY_WORKERS = 16          # verify_payment_status calls in flight in verify_many()
+
+
+class PaymentStatusCache:
+    """
+    LRU cache of verify_payment_status results.
+    'completed' is final and never expires; other statuses expire after pending_ttl.
+    """
+
+    def __init__(self, size: int = STATUS_CACHE_SIZE, pending_ttl: float = PENDING_STATUS_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.size = size
+        self.pending_ttl = pending_ttl
+        self._clock = clock
+        self._statuses = OrderedDict()   # transaction_id -> (expires_at or None, status)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, transaction_id: str) -> Optional[Dict]:
+        """Get a copy of a cached status, or None on a miss."""
+        with self._lock:
+            entry = self._statuses.get(transaction_id)
+            if entry is not None and entry[0] is not None and entry[0] <= self._clock():
+                del self._statuses[transaction_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._statuses.move_to_end(transaction_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, transaction_id: str, status: Dict):
+        with self._lock:
+            expires_at = None if status.get('status') == 'completed' else self._clock() + self.pending_ttl
+            self._statuses[transaction_id] = (expires_at, dict(status))
+            self._statuses.move_to_end(transaction_id)
+            while len(self._statuses) > self.size:
+                self._statuses.popitem(last=False)
+
+    def invalidate(self, transaction_id: str):
+        """Drop a transaction whose status has changed, e.g. after a refund."""
+        with self._lock:
+            self._statuses.pop(transaction_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._statuses.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._statuses),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+status_cache = PaymentStatusCache()
+
+
+def verify_payment(transaction_id: str, payment_gateway=None) -> Dict:
+    """verify_payment_status() for one transaction, answered from the cache when possible."""
+    status = status_cache.get(transaction_id)
+    if status is None:
+        status = (payment_gateway or get_payment_gateway()).verify_payment_status(transaction_id)
+        status_cache.put(transaction_id, status)
+    return status
+
+
+def verify_many(transaction_ids: Iterable[str], payment_gateway=None,
+                max_workers: int = VERIFY_WORKERS) -> Dict[str, Dict]:
+    """
+    Statuses for many transactions at once.
+
+    Cached statuses are returned straight away; the rest are checked with
+    the gateway, at most max_workers at a time. A transaction whose check
+    failed gets {'status': 'error', 'message': ...}, which is not cached.
+
+    Returns:
+        dict: transaction_id -> status dict, for each distinct ID given
+    """
+    gateway = payment_gateway or get_payment_gateway()
+    results = {}
+    missing = []
+    for transaction_id in dict.fromkeys(transaction_ids):
+        status = status_cache.get(transaction_id)
+        if status is None:
+            missing.append(transaction_id)
+        else:
+            results[transaction_id] = status
+
+    def check(transaction_id):
+        try:
+            status = gateway.verify_payment_status(transaction_id)
+            status_cache.put(transaction_id, status)
+            return transaction_id, status
+        except Exception as e:
+            return transaction_id, {'transaction_id': transaction_id, 'status': 'error', 'message': str(e)}
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing)),
+                                thread_name_prefix='verify') as executor:
+            results.update(executor.map(check, missing))
+    return results
+
+
+def reconcile_payments(day: Optional[date] = None, payment_gateway=None) -> Dict:
+    """
+    Check every payment recorded in the ledger on one day against the gateway.
+
+    Args:
+        day: day the payments were made (defaults to today)
+
+    Returns:
+        dict: date, payments checked, completed count, unsettled payments
+        (transaction_id, amount, status), unknown payments (payment_id,
+        patron_id, amount) whose charge timed out and has not been settled,
+        and seconds taken
+    """
+    day = day or date.today()
+    start = time.perf_counter()
+    start_of_day = datetime.combine(day, datetime.min.time())
+    end_of_day = start_of_day + timedelta(days=1)
+    payments = list_completed_payments(start_of_day, end_of_day)
+
+    statuses = verify_many([payment['transaction_id'] for payment in payments], payment_gateway)
+    unsettled = [
+        {'transaction_id': payment['transaction_id'], 'amount': payment['amount'],
+         'status': statuses[payment['transaction_id']].get('status')}
+        for payment in payments
+        if statuses[payment['transaction_id']].get('status') != 'completed'
+    ]
+    return {
+        'date': day.isoformat(),
+        'payments': len(payments),
+        'completed': len(payments) - len(unsettled),
+        'unsettled': unsettled,
+        'unknown': [{'payment_id': payment['id'], 'patron_id': payment['patron_id'], 'amount': payment['amount']}
+                    for payment in list_payments(start_of_day, end_of_day, UNKNOWN)],
+        'seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    # point the database module at a throwaway file so tests don't share library.db
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    database.init_database()
+    yield database.DATABASE
+    database.close_db_connections()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def library_db():
+    # the mock-based payment tests still touch the payment ledger in library.db,
+    # so make sure its schema exists even when they run on their own
+    database.init_database()
+    yield
+    database.close_db_connections()
+
+
+def borrow_overdue(patron_id, isbn, days_overdue=10):
+    # a new book, lent on a 14 day loan that fell due days_overdue days ago
+    database.insert_book(f"Overdue Book {isbn}", "Author", isbn, 5, 5)
+    book_id = database.get_book_by_isbn(isbn)["id"]
+    due = datetime.now() - timedelta(days=days_overdue)
+    database.borrow_book_transaction(patron_id, book_id, due - timedelta(days=14), due)
+    return book_id
@@ -3,7 +3,8 @@ import pytest
 
 def reset_db():
     from pathlib import Path
-    from database import init_database
+    from database import init_database, close_db_connections
+    close_db_connections()
     Path("library.db").unlink(missing_ok=True)
     init_database()
 
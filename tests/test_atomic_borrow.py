@@ -0,0 +1,120 @@
+import threading
+from datetime import datetime, timedelta
+
+from database import (
+    get_db_connection, get_book_by_isbn, insert_book,
+    borrow_book_transaction, return_book_transaction,
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def open_loans(book_id):
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM borrow_records WHERE book_id = ? AND return_date IS NULL",
+                         (book_id,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def run_threads(target, count):
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        target(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# **************** Negative Test Cases ****************
+def test_atomic_borrow_unknown_book(temp_db):
+    now = datetime.now()
+    status, book = borrow_book_transaction("123456", 999, now, now + timedelta(days=14))
+
+    assert status == "not_found"
+    assert book is None
+
+
+def test_atomic_borrow_limit_leaves_no_partial_writes(temp_db):
+    # a refused borrow must not take a copy or leave a loan behind
+    insert_book("Atomic Book", "Author", "1000000000001", 10, 10)
+    book_id = get_book_by_isbn("1000000000001")["id"]
+    for _ in range(5):
+        borrow_book_by_patron("123456", book_id)
+
+    success, message = borrow_book_by_patron("123456", book_id)
+
+    assert success == False
+    assert "maximum borrowing limit" in message.lower()
+    assert get_book_by_isbn("1000000000001")["available_copies"] == 5
+    assert open_loans(book_id) == 5
+
+
+def test_atomic_return_not_borrowed(temp_db):
+    insert_book("Atomic Book", "Author", "1000000000002", 1, 1)
+    book_id = get_book_by_isbn("1000000000002")["id"]
+
+    status, loan = return_book_transaction("123456", book_id, datetime.now())
+
+    assert status == "not_borrowed"
+    assert get_book_by_isbn("1000000000002")["available_copies"] == 1
+
+
+def test_atomic_borrow_no_overselling_under_contention(temp_db):
+    # 3 copies, 24 patrons racing for them: exactly 3 loans, never a negative count
+    insert_book("Last Copies", "Author", "1000000000003", 3, 3)
+    book_id = get_book_by_isbn("1000000000003")["id"]
+    results = []
+
+    run_threads(lambda i: results.append(borrow_book_by_patron(f"{200000 + i}", book_id)), 24)
+
+    assert sum(1 for success, _ in results if success) == 3
+    assert all("not available" in message for success, message in results if not success)
+    assert get_book_by_isbn("1000000000003")["available_copies"] == 0
+    assert open_loans(book_id) == 3
+
+
+def test_atomic_borrow_limit_holds_under_contention(temp_db):
+    # one patron firing 12 borrows at once still ends up with only 5 books
+    insert_book("Plenty", "Author", "1000000000004", 50, 50)
+    book_id = get_book_by_isbn("1000000000004")["id"]
+    results = []
+
+    run_threads(lambda i: results.append(borrow_book_by_patron("300000", book_id)), 12)
+
+    assert sum(1 for success, _ in results if success) == 5
+    assert open_loans(book_id) == 5
+    assert get_book_by_isbn("1000000000004")["available_copies"] == 45
+
+
+# **************** Positive Test Cases ****************
+def test_atomic_borrow_and_return_round_trip(temp_db):
+    insert_book("Atomic Book", "Author", "1000000000005", 2, 2)
+    book_id = get_book_by_isbn("1000000000005")["id"]
+    now = datetime.now()
+
+    status, book = borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))
+    assert status == "borrowed"
+    assert book["available_copies"] == 1
+
+    status, loan = return_book_transaction("123456", book_id, now + timedelta(days=1))
+    assert status == "returned"
+    assert loan["due_date"] == (now + timedelta(days=14)).replace(microsecond=0)
+    assert get_book_by_isbn("1000000000005")["available_copies"] == 2
+
+
+def test_atomic_return_under_contention(temp_db):
+    # returning and borrowing the same title concurrently keeps copies and loans in step
+    insert_book("Busy Book", "Author", "1000000000006", 10, 10)
+    book_id = get_book_by_isbn("1000000000006")["id"]
+    for i in range(10):
+        borrow_book_by_patron(f"{400000 + i}", book_id)
+
+    run_threads(lambda i: return_book_by_patron(f"{400000 + i}", book_id), 10)
+
+    assert open_loans(book_id) == 0
+    assert get_book_by_isbn("1000000000006")["available_copies"] == 10
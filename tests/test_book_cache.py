@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+
+import database
+from database import (
+    BookCache, get_book_by_id, get_book_by_isbn, get_book_cache_stats, insert_book,
+    update_book_availability, borrow_book_transaction, return_book_transaction,
+)
+from datetime import datetime, timedelta
+
+
+def seed():
+    insert_book("Cached Book", "Author", "1000000000001", 3, 3)
+    return get_book_by_isbn("1000000000001")["id"]
+
+
+# **************** Negative Test Cases ****************
+def test_book_cache_missing_book_not_cached(temp_db):
+    # a lookup for an ISBN that doesn't exist yet must not hide the book once it's added
+    assert get_book_by_isbn("1000000000002") is None
+    insert_book("Late Arrival", "Author", "1000000000002", 1, 1)
+    assert get_book_by_isbn("1000000000002")["title"] == "Late Arrival"
+
+
+def test_book_cache_disabled(temp_db, monkeypatch):
+    monkeypatch.setattr(database, "BOOK_CACHE_ENABLED", False)
+    book_id = seed()
+    before = get_book_cache_stats()
+    get_book_by_id(book_id)
+    get_book_by_id(book_id)
+    after = get_book_cache_stats()
+
+    assert after["hits"] == before["hits"]
+    assert after["misses"] == before["misses"]
+
+
+def test_book_cache_returns_copies(temp_db):
+    # callers mutating a returned dict must not corrupt the cache
+    book_id = seed()
+    get_book_by_id(book_id)["title"] = "Scribbled"
+    assert get_book_by_id(book_id)["title"] == "Cached Book"
+
+
+def test_book_cache_stale_read_not_stored():
+    # a read that started before a write finished after it: its result is dropped
+    cache = BookCache(size=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.put({"id": 1, "isbn": "1000000000001", "available_copies": 3}, generation)
+    assert cache.get(book_id=1) is None
+
+
+def test_book_cache_sees_other_processes_writes(temp_db):
+    # a borrow committed by another worker is visible without waiting for the TTL
+    book_id = seed()
+    get_book_by_id(book_id)
+    other = sqlite3.connect(temp_db)
+    other.execute("UPDATE books SET available_copies = 0 WHERE id = ?", (book_id,))
+    other.commit()
+    other.close()
+
+    assert get_book_by_id(book_id)["available_copies"] == 0
+    assert get_book_by_isbn("1000000000001")["available_copies"] == 0
+
+
+def test_book_cache_resets_after_log_gap(temp_db):
+    book_id = seed()
+    get_book_by_id(book_id)
+    other = sqlite3.connect(temp_db)
+    other.execute("UPDATE books SET total_copies = 5 WHERE id = ?", (book_id,))
+    other.execute("DELETE FROM book_changes")   # as if pruned past our position
+    other.execute("UPDATE books SET title = 'Renamed' WHERE id = ?", (book_id,))
+    other.commit()
+    other.close()
+
+    assert get_book_by_id(book_id)["total_copies"] == 5
+
+
+# **************** Positive Test Cases ****************
+def test_book_cache_hits_by_id_and_isbn(temp_db):
+    book_id = seed()
+    database.book_cache.clear()
+    before = get_book_cache_stats()
+    get_book_by_id(book_id)
+    get_book_by_id(book_id)
+    get_book_by_isbn("1000000000001")
+    after = get_book_cache_stats()
+
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+
+
+def test_book_cache_invalidated_by_writes(temp_db):
+    # every write to a book is visible on the next lookup
+    book_id = seed()
+    now = datetime.now()
+
+    get_book_by_id(book_id)
+    update_book_availability(book_id, -1)
+    assert get_book_by_id(book_id)["available_copies"] == 2
+
+    borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))
+    assert get_book_by_isbn("1000000000001")["available_copies"] == 1
+
+    return_book_transaction("123456", book_id, now)
+    assert get_book_by_id(book_id)["available_copies"] == 2
+
+
+def test_book_cache_lru_eviction_and_ttl():
+    cache = BookCache(size=2, ttl=60)
+    for book_id in (1, 2, 3):
+        cache.put({"id": book_id, "isbn": f"{book_id:013d}"}, cache.generation)
+
+    assert cache.get(book_id=1) is None
+    assert cache.get(isbn=f"{3:013d}")["id"] == 3
+    assert cache.stats()["evictions"] == 1
+
+    expired = BookCache(size=2, ttl=-1)
+    expired.put({"id": 1, "isbn": "1"}, expired.generation)
+    assert expired.get(book_id=1) is None
+    assert expired.stats()["expirations"] == 1
+
+
+def test_book_cache_consistent_under_concurrent_borrows(temp_db):
+    # readers hammering the cache while copies are borrowed always end on the committed value
+    book_id = seed()
+    now = datetime.now()
+
+    def reader():
+        for _ in range(200):
+            get_book_by_id(book_id)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    threads += [threading.Thread(target=borrow_book_transaction, args=(f"{200000 + i}", book_id, now, now))
+                for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert get_book_by_id(book_id)["available_copies"] == 0
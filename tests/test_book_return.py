@@ -1,10 +1,11 @@
 from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
-from database import init_database, get_book_by_isbn
+from database import init_database, get_book_by_isbn, close_db_connections
 import pytest
 
 # Note: since return_book_by_patron is not implemented, the return message will be made up here
 def reset_db():
     from pathlib import Path
+    close_db_connections()
     Path("library.db").unlink(missing_ok=True)
     init_database()
 
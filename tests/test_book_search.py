@@ -1,5 +1,5 @@
 from services.library_service import search_books_in_catalog, add_book_to_catalog
-from database import init_database, get_book_by_isbn
+from database import init_database, get_book_by_isbn, close_db_connections
 import pytest
 from pathlib import Path
 
@@ -7,6 +7,7 @@ from pathlib import Path
 # to ensure the test code does not fail
 def setup_function(_):
     # fresh DB
+    close_db_connections()
     Path("library.db").unlink(missing_ok=True)
     init_database()
 
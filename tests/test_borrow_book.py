@@ -1,10 +1,11 @@
 from services.library_service import borrow_book_by_patron, add_book_to_catalog
-from database import init_database, get_book_by_isbn
+from database import init_database, get_book_by_isbn, close_db_connections
 import pytest
 
 
 def reset_db():
     from pathlib import Path
+    close_db_connections()
     Path("library.db").unlink(missing_ok=True)
     init_database()
 
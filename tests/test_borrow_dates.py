@@ -0,0 +1,112 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import (
+    insert_book, get_book_by_isbn, get_patron_borrowed_books, borrow_book_transaction,
+    return_book_transaction, to_timestamp, from_timestamp, migrate_database, SCHEMA_MIGRATIONS
+)
+from services.fee_service import sweep_late_fees
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    # somewhere with daylight saving time, so local and UTC times differ
+    monkeypatch.setenv("TZ", "America/Toronto")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def legacy_database(path):
+    """A database at schema version 6, with ISO text dates in borrow_records."""
+    conn = sqlite3.connect(path)
+    for migration in SCHEMA_MIGRATIONS[:6]:
+        if callable(migration):
+            migration(conn)
+        else:
+            for statement in migration:
+                conn.execute(statement)
+    conn.execute("PRAGMA user_version = 6")
+    conn.commit()
+    return conn
+
+
+# **************** Negative Test Cases ****************
+def test_borrow_dates_migration_keeps_open_loans_open(tmp_path):
+    conn = legacy_database(str(tmp_path / "legacy.db"))
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)",
+                 ("123456", 1, "2025-01-02T10:00:00", "2025-01-16T10:00:00"))
+    conn.commit()
+    migrate_database(conn)
+
+    row = conn.execute("SELECT return_date, typeof(borrow_date) FROM borrow_records").fetchone()
+    assert row == (None, "integer")
+    conn.close()
+
+
+def test_borrow_dates_overdue_is_second_precise(temp_db):
+    insert_book("Due Now", "Author", "1000000000020", 1, 1)
+    book_id = get_book_by_isbn("1000000000020")["id"]
+    now = datetime.now()
+    borrow_book_transaction("123456", book_id, now - timedelta(days=14), now + timedelta(seconds=30))
+
+    assert get_patron_borrowed_books("123456")[0]["is_overdue"] is False
+
+
+# **************** Positive Test Cases ****************
+def test_borrow_dates_round_trip(temp_db):
+    value = datetime(2025, 3, 9, 2, 30, 15, 500000)
+
+    assert from_timestamp(to_timestamp(value)) == value.replace(microsecond=0)
+    assert from_timestamp(None) is None
+
+
+def test_borrow_dates_migration_converts_local_times(tmp_path, local_timezone):
+    conn = legacy_database(str(tmp_path / "legacy.db"))
+    dates = ["2025-01-02T10:00:00.250000", "2025-07-01T23:59:59", "2025-11-02T01:30:00"]
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) "
+                 "VALUES (?, ?, ?, ?, ?)", ("123456", 1, *dates))
+    conn.commit()
+
+    migrate_database(conn)
+
+    row = conn.execute("SELECT borrow_date, due_date, return_date FROM borrow_records").fetchone()
+    assert list(row) == [to_timestamp(datetime.fromisoformat(date)) for date in dates]
+    indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_borrow_records_open_due" in indexes
+    conn.close()
+
+
+def test_borrow_dates_stored_as_integers(temp_db):
+    insert_book("Integer Dates", "Author", "1000000000021", 1, 1)
+    book_id = get_book_by_isbn("1000000000021")["id"]
+    now = datetime.now()
+    borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))
+
+    status, loan = return_book_transaction("123456", book_id, now + timedelta(days=3))
+
+    assert status == "returned"
+    assert loan["return_date"] == (now + timedelta(days=3)).replace(microsecond=0)
+    conn = database.get_db_connection()
+    types = conn.execute("SELECT typeof(borrow_date), typeof(due_date), typeof(return_date) "
+                         "FROM borrow_records WHERE book_id = ?", (book_id,)).fetchone()
+    conn.close()
+    assert tuple(types) == ("integer", "integer", "integer")
+
+
+def test_borrow_dates_sweep_counts_local_days(temp_db, local_timezone):
+    insert_book("Late Evening", "Author", "1000000000022", 1, 1)
+    book_id = get_book_by_isbn("1000000000022")["id"]
+    # due late in the local evening, which is already the next day in UTC
+    due = datetime(2025, 6, 10, 22, 0)
+    borrow_book_transaction("123456", book_id, due - timedelta(days=14), due)
+
+    rows = sweep_late_fees(as_of=datetime(2025, 6, 13, 9, 0))
+
+    assert rows[0]["max_days_overdue"] == 3
+    assert rows[0]["total_fee"] == 1.5
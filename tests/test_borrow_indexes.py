@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import database
+from database import get_db_connection, get_schema_version, to_timestamp, SCHEMA_VERSION
+
+
+def query_plan(sql, params):
+    conn = get_db_connection()
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    conn.close()
+    return " ".join(row["detail"] for row in rows)
+
+
+# **************** Negative Test Cases ****************
+def test_borrow_indexes_not_used_for_returned_loans(temp_db):
+    # the indexes only cover open loans, history queries must not pretend to use them
+    plan = query_plan("SELECT * FROM borrow_records WHERE patron_id = ? AND return_date IS NOT NULL", ("123456",))
+    assert "idx_borrow_records_open" not in plan
+
+
+# **************** Positive Test Cases ****************
+def test_borrow_indexes_migration_recorded(temp_db):
+    # running the migrations again is a no-op once user_version is current
+    conn = get_db_connection()
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert database.migrate_database(conn) == 0
+    names = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+
+    assert {"idx_borrow_records_open_patron", "idx_borrow_records_open_book", "idx_borrow_records_open_due"} <= names
+
+
+def test_borrow_indexes_patron_borrow_count(temp_db):
+    plan = query_plan("""
+        SELECT COUNT(*) as count FROM borrow_records 
+        WHERE patron_id = ? AND return_date IS NULL
+    """, ("123456",))
+    assert "idx_borrow_records_open_patron" in plan
+
+
+def test_borrow_indexes_patron_borrowed_books(temp_db):
+    plan = query_plan("""
+        SELECT br.*, b.title, b.author 
+        FROM borrow_records br 
+        JOIN books b ON br.book_id = b.id 
+        WHERE br.patron_id = ? AND br.return_date IS NULL
+        ORDER BY br.borrow_date
+    """, ("123456",))
+    assert "USING INDEX idx_borrow_records_open_patron" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_borrow_indexes_return_date_update(temp_db):
+    plan = query_plan("""
+        UPDATE borrow_records 
+        SET return_date = ? 
+        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+    """, (to_timestamp(datetime.now()), "123456", 1))
+    # either open-loan index narrows the update to a handful of rows
+    assert "USING INDEX idx_borrow_records_open_" in plan
+    assert "SCAN" not in plan
+
+
+def test_borrow_indexes_overdue_sweep(temp_db):
+    plan = query_plan("""
+        SELECT * FROM borrow_records WHERE return_date IS NULL AND due_date < ?
+    """, (to_timestamp(datetime.now()),))
+    assert "USING INDEX idx_borrow_records_open_due" in plan
@@ -0,0 +1,126 @@
+import io
+import json
+
+import pytest
+
+from app import create_app
+from database import get_book_by_isbn, insert_book
+from services.import_service import import_books_file, import_books_stream, MAX_REPORTED_ERRORS
+
+CSV_BOOKS = """title,author,isbn,total_copies
+Bulk One,Author A,1000000000001,3
+Bulk Two,Author B,1000 0000 00002,1
+,Author C,1000000000003,1
+Bulk Four,Author D,12345,1
+Bulk Five,Author E,1000000000005,zero
+Bulk One Again,Author A,1000000000001,2
+Already Here,Author F,9999999999999,1
+"""
+
+
+@pytest.fixture
+def client(temp_db):
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+# **************** Negative Test Cases ****************
+def test_bulk_import_reports_row_errors(temp_db, tmp_path):
+    # every bad row is reported with its line number and the R1 message
+    insert_book("Already Here", "Author F", "9999999999999", 1, 1)
+    path = tmp_path / "books.csv"
+    path.write_text(CSV_BOOKS)
+
+    report = import_books_file(str(path))
+    errors = {error["line"]: error["error"] for error in report["errors"]}
+
+    assert report["rows"] == 7
+    assert report["imported"] == 2
+    assert report["rejected"] == 3
+    assert report["duplicates"] == 2
+    assert errors[4] == "Title is required."
+    assert errors[5] == "ISBN must be exactly 13 digits."
+    assert errors[6] == "Total copies must be a positive integer."
+    assert errors[7] == "ISBN appears more than once in this import."
+    assert errors[8] == "A book with this ISBN already exists."
+
+
+def test_bulk_import_bad_jsonl_lines(temp_db):
+    stream = io.StringIO('{"title": "Ok", "author": "A", "isbn": "1000000000010", "total_copies": 1}\nnot json\n[1, 2]\n')
+    report = import_books_stream(stream, "jsonl")
+
+    assert report["imported"] == 1
+    assert [error["line"] for error in report["errors"]] == [2, 3]
+
+
+def test_bulk_import_caps_reported_errors(temp_db):
+    rows = "title,author,isbn,total_copies\n" + "x,y,bad,1\n" * (MAX_REPORTED_ERRORS + 5)
+    report = import_books_stream(io.StringIO(rows), "csv")
+
+    assert report["rejected"] == MAX_REPORTED_ERRORS + 5
+    assert len(report["errors"]) == MAX_REPORTED_ERRORS
+
+
+def test_bulk_import_rejects_rows_that_are_not_utf8(client, tmp_path):
+    body = (b"title,author,isbn,total_copies\n"
+            b"Good One,Author,3000000000011,1\n"
+            b"Bad \xff Title,Author,3000000000012,1\n"
+            b"Good Two,Author,3000000000013,1\n")
+    data = {"file": (io.BytesIO(body), "books.csv")}
+    response = client.post("/api/books/import", data=data, content_type="multipart/form-data")
+    path = tmp_path / "books.jsonl"
+    path.write_bytes(b'{"title": "Bad \xff", "author": "A", "isbn": "3000000000014", "total_copies": 1}\n')
+
+    report = response.get_json()
+    assert response.status_code == 200
+    assert report["imported"] == 2 and report["rejected"] == 1
+    assert report["errors"] == [{"line": 3, "isbn": None, "error": "Row is not valid UTF-8."}]
+    assert get_book_by_isbn("3000000000012") is None
+    assert import_books_file(str(path))["rejected"] == 1
+
+
+def test_bulk_import_api_requires_file(client):
+    assert client.post("/api/books/import", data="hello", content_type="text/plain").status_code == 400
+
+
+# **************** Positive Test Cases ****************
+def test_bulk_import_jsonl_across_chunks(temp_db):
+    # chunk boundaries don't lose rows or let duplicates through
+    lines = [json.dumps({"title": f"Book {i}", "author": "A", "isbn": f"{2000000000000 + i % 7}", "total_copies": 2})
+             for i in range(10)]
+    report = import_books_stream(io.StringIO("\n".join(lines)), "jsonl", chunk_size=3)
+
+    assert report["imported"] == 7
+    assert report["duplicates"] == 3
+    assert report["rows_per_sec"] > 0
+    book = get_book_by_isbn("2000000000003")
+    assert book["total_copies"] == 2 and book["available_copies"] == 2
+
+
+def test_bulk_import_api_upload(client):
+    data = {"file": (io.BytesIO(b"title,author,isbn,total_copies\nUploaded,Author,3000000000001,4\n"), "books.csv")}
+    response = client.post("/api/books/import", data=data, content_type="multipart/form-data")
+
+    assert response.status_code == 200
+    assert response.get_json()["imported"] == 1
+    assert get_book_by_isbn("3000000000001")["title"] == "Uploaded"
+
+
+def test_bulk_import_api_raw_body(client):
+    body = '{"title": "Raw", "author": "Author", "isbn": "3000000000002", "total_copies": 1}\n'
+    response = client.post("/api/books/import", data=body, content_type="application/x-ndjson")
+
+    assert response.get_json()["imported"] == 1
+
+
+def test_bulk_import_cli(client, tmp_path):
+    path = tmp_path / "books.csv"
+    path.write_text("title,author,isbn,total_copies\nCli Book,Author,3000000000003,1\n")
+    runner = client.application.test_cli_runner()
+
+    result = runner.invoke(args=["import-books", str(path)])
+
+    assert result.exit_code == 0
+    assert "1 imported" in result.output
+    assert get_book_by_isbn("3000000000003") is not None
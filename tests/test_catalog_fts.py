@@ -0,0 +1,94 @@
+import database
+from database import get_db_connection, insert_book, get_book_by_isbn, search_books
+from services.library_service import search_books_in_catalog
+
+
+def seed():
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("Great Expectations", "Charles Dickens", "9780141439563", 2, 2)
+    insert_book("The Greatest Showman Songbook", "Various", "9781495098453", 1, 1)
+    insert_book("1984", "George Orwell", "9780451524935", 1, 1)
+
+
+# **************** Negative Test Cases ****************
+def test_catalog_fts_no_word_characters(temp_db):
+    # punctuation-only searches have nothing to match on
+    seed()
+    assert search_books_in_catalog("?!", "title") == []
+
+
+def test_catalog_fts_unknown_field(temp_db):
+    seed()
+    assert search_books("Great", "publisher") == []
+
+
+def test_catalog_fts_is_word_prefix_not_substring(temp_db):
+    # "reat" is inside "Great" but no word starts with it
+    seed()
+    assert search_books_in_catalog("reat", "title") == []
+
+
+# **************** Positive Test Cases ****************
+def test_catalog_fts_prefix_and_multiword(temp_db):
+    seed()
+    titles = {book["title"] for book in search_books_in_catalog("gre", "title")}
+    assert titles == {"The Great Gatsby", "Great Expectations", "The Greatest Showman Songbook"}
+
+    result = search_books_in_catalog("great gats", "title")
+    assert [book["title"] for book in result] == ["The Great Gatsby"]
+
+
+def test_catalog_fts_returns_book_rows(temp_db):
+    # results have the same shape as get_book_by_isbn / get_all_books rows
+    seed()
+    result = search_books_in_catalog("fitzgerald", "author")
+    assert result == [get_book_by_isbn("9780743273565")]
+
+
+def test_catalog_fts_ranks_better_matches_first(temp_db):
+    seed()
+    insert_book("Great Great Great", "Anon", "9780000000001", 1, 1)
+    result = search_books_in_catalog("great", "title")
+    assert result[0]["title"] == "Great Great Great"
+
+
+def test_catalog_fts_triggers_follow_updates(temp_db):
+    # renaming or deleting a book is reflected in the index without a rebuild
+    seed()
+    book_id = get_book_by_isbn("9780451524935")["id"]
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Nineteen Eighty-Four' WHERE id = ?", (book_id,))
+    conn.commit()
+    conn.close()
+
+    assert search_books_in_catalog("1984", "title") == []
+    assert search_books_in_catalog("nineteen eighty", "title")[0]["id"] == book_id
+
+    conn = get_db_connection()
+    conn.execute("DELETE FROM books WHERE id = ?", (book_id,))
+    conn.commit()
+    conn.close()
+    assert search_books_in_catalog("nineteen", "title") == []
+
+
+def test_catalog_fts_isbn_uses_unique_index(temp_db):
+    seed()
+    conn = get_db_connection()
+    plan = " ".join(row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN SELECT * FROM books WHERE isbn = ?", ("9780451524935",)))
+    conn.close()
+
+    assert "USING INDEX" in plan
+    assert search_books_in_catalog("9780451524935", "isbn")[0]["title"] == "1984"
+
+
+def test_catalog_fts_like_fallback_without_index(temp_db):
+    # databases created by an SQLite without FTS5 still get substring search
+    seed()
+    conn = get_db_connection()
+    conn.execute("DROP TABLE books_fts")
+    conn.commit()
+    conn.close()
+
+    titles = {book["title"] for book in search_books_in_catalog("reat", "title")}
+    assert titles == {"The Great Gatsby", "Great Expectations", "The Greatest Showman Songbook"}
+    assert search_books("100%", "title") == []
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from app import create_app
+from database import insert_book, get_books_page, iter_books, encode_cursor, decode_cursor
+
+
+def seed(count):
+    for i in range(count):
+        insert_book(f"Paged Book {i:03d}", "Author", f"{1000000000000 + i}", 1, 1)
+
+
+@pytest.fixture
+def client(temp_db):
+    app = create_app(sample_data=True)
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+# **************** Negative Test Cases ****************
+def test_catalog_pagination_bad_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
+
+
+def test_catalog_pagination_api_rejects_bad_args(client):
+    assert client.get("/api/books?limit=0").status_code == 400
+    assert client.get("/api/books?limit=abc").status_code == 400
+    assert client.get("/api/books?after=garbage").status_code == 400
+    assert client.get("/api/books?limit=abc").get_json() == {"error": "Limit must be a positive integer"}
+
+
+def test_catalog_pagination_rejects_wrong_cursor_types(client):
+    for key in ((1, {"a": 1}), ([1], 2), ("Title", "2"), ("Title", True)):
+        cursor = encode_cursor(key)
+        assert client.get(f"/api/books?after={cursor}").status_code == 400
+        response = client.get(f"/catalog?after={cursor}")
+        assert response.status_code == 200
+        assert b"Invalid catalog page." in response.data
+
+
+def test_catalog_pagination_page_with_bad_cursor_falls_back(client):
+    # the HTML catalog shows the first page with an error rather than failing
+    response = client.get("/catalog?after=garbage")
+    assert response.status_code == 200
+    assert b"Invalid catalog page." in response.data
+
+
+# **************** Positive Test Cases ****************
+def test_catalog_pagination_walks_every_book_once(temp_db):
+    # duplicate titles are split by id, so nothing is skipped or repeated
+    seed(7)
+    insert_book("Paged Book 003", "Other Author", "2000000000000", 1, 1)
+
+    seen = []
+    after = None
+    while True:
+        books, after = get_books_page(after, 3)
+        seen.extend(book["isbn"] for book in books)
+        if after is None:
+            break
+
+    assert len(seen) == 8
+    assert len(set(seen)) == 8
+    assert [len(page) for page in iter_books(3)] == [3, 3, 2]
+
+
+def test_catalog_pagination_cursor_round_trip():
+    assert decode_cursor(encode_cursor(("Title, with 'quotes'", 42))) == ("Title, with 'quotes'", 42)
+
+
+def test_catalog_pagination_api_pages(client):
+    # the client fixture adds the 3 sample books
+    seed(4)
+    first = client.get("/api/books?limit=5").get_json()
+    assert first["count"] == 5
+    assert first["next"] is not None
+
+    second = client.get(f"/api/books?limit=5&after={first['next']}").get_json()
+    assert second["count"] == 2
+    assert second["next"] is None
+    titles = [book["title"] for book in first["books"] + second["books"]]
+    assert titles == sorted(titles)
+
+
+def test_catalog_pagination_html_next_link(client):
+    seed(4)
+    response = client.get("/catalog?limit=2")
+    assert response.status_code == 200
+    assert b"Next Page" in response.data
+    assert response.data.count(b'name="book_id"') <= 2
+
+
+def test_catalog_pagination_stream(client):
+    seed(4)
+    response = client.get("/api/books/stream")
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    assert response.mimetype == "application/x-ndjson"
+    assert len(lines) == 7
@@ -0,0 +1,176 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import (
+    insert_book, insert_books_bulk, get_all_books, get_book_by_isbn, get_books_page, search_books,
+    borrow_book_transaction, catalog_snapshot, BookRecord, _search_snapshot
+)
+
+
+def sql_books():
+    conn = database.get_db_connection()
+    rows = conn.execute("SELECT * FROM books ORDER BY title, id").fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+@pytest.fixture
+def catalog(temp_db):
+    for i, (title, author) in enumerate([("Dune", "Frank Herbert"), ("Emma", "Jane Austen"),
+                                         ("Beloved", "Toni Morrison"), ("Dune", "Another Herbert")]):
+        insert_book(title, author, f"{1000000000000 + i}", 2, 2)
+    return temp_db
+
+
+# **************** Negative Test Cases ****************
+def test_catalog_snapshot_sees_other_connections(catalog):
+    # a write from outside this process's helpers (e.g. another worker) is picked up
+    get_all_books()
+    loads = catalog_snapshot.stats()["loads"]
+    other = sqlite3.connect(catalog)
+    other.execute("UPDATE books SET available_copies = 0 WHERE isbn = '1000000000001'")
+    other.execute("DELETE FROM books WHERE isbn = '1000000000002'")
+    other.commit()
+    other.close()
+
+    assert get_all_books() == sql_books()
+    assert catalog_snapshot.stats()["loads"] == loads
+
+
+def test_catalog_snapshot_reloads_after_log_gap(catalog):
+    get_all_books()
+    loads = catalog_snapshot.stats()["loads"]
+    conn = database.get_db_connection()
+    conn.execute("UPDATE books SET total_copies = 3")
+    conn.execute("DELETE FROM book_changes")   # as if pruned past our position
+    conn.execute("UPDATE books SET title = 'Emma (Annotated)' WHERE title = 'Emma'")
+    conn.commit()
+    conn.close()
+
+    assert get_all_books() == sql_books()
+    assert catalog_snapshot.stats()["loads"] == loads + 1
+
+
+def test_catalog_snapshot_disabled(catalog, monkeypatch):
+    monkeypatch.setattr(database, "CATALOG_SNAPSHOT_ENABLED", False)
+    loads = catalog_snapshot.stats()["loads"]
+
+    assert get_all_books() == sql_books()
+    assert get_books_page(None, 2)[0] == sql_books()[:2]
+    assert catalog_snapshot.stats()["loads"] == loads
+
+
+def test_catalog_snapshot_isbn_search_skips_snapshot(catalog):
+    # ISBN search stays an indexed lookup, so it never loads the whole catalog
+    catalog_snapshot.clear()
+    loads = catalog_snapshot.stats()["loads"]
+
+    assert search_books("1000000000001", "isbn")[0]["title"] == "Emma"
+    assert catalog_snapshot.stats()["loads"] == loads
+    assert catalog_snapshot.stats()["books"] == 0
+
+
+def test_catalog_snapshot_search_with_single_connection(catalog, monkeypatch):
+    # the substring search must not hold a connection while the snapshot loads with another
+    conn = database.get_db_connection()
+    conn.execute("DROP TABLE books_fts")
+    conn.commit()
+    conn.close()
+    catalog_snapshot.clear()
+    monkeypatch.setattr(database, "POOL_SIZE", 1)
+    monkeypatch.setattr(database, "POOL_TIMEOUT", 0.1)
+    monkeypatch.setattr(database, "_pool", None)
+
+    try:
+        assert [b["author"] for b in search_books("herb", "author")] == ["Frank Herbert", "Another Herbert"]
+    finally:
+        database.get_pool().close_all()
+
+
+# **************** Positive Test Cases ****************
+def test_catalog_snapshot_matches_database(catalog):
+    books = get_all_books()
+
+    assert books == sql_books()
+    assert [book["title"] for book in books] == ["Beloved", "Dune", "Dune", "Emma"]
+
+
+def test_catalog_snapshot_incremental_updates(catalog):
+    get_all_books()
+    before = catalog_snapshot.stats()
+
+    insert_book("Anna Karenina", "Leo Tolstoy", "1000000000010", 1, 1)
+    book_id = get_book_by_isbn("1000000000000")["id"]
+    now = datetime.now()
+    borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))
+
+    books = get_all_books()
+    assert books == sql_books()
+    assert books[0]["title"] == "Anna Karenina"
+    assert {b["id"]: b for b in books}[book_id]["available_copies"] == 1
+    after = catalog_snapshot.stats()
+    assert after["loads"] == before["loads"]
+    assert after["updates"] == before["updates"] + 1
+
+
+def test_catalog_snapshot_pages_match_keyset_query(catalog, monkeypatch):
+    insert_books_bulk([(f"Dune {i % 3}", "Author", f"{3000000000000 + i}", 1, 1) for i in range(9)])
+
+    def walk():
+        pages, after = [], None
+        while True:
+            books, after = get_books_page(after, 3)
+            pages.append((books, after))
+            if after is None:
+                return pages
+
+    from_snapshot = walk()
+    monkeypatch.setattr(database, "CATALOG_SNAPSHOT_ENABLED", False)
+
+    assert from_snapshot == walk()
+    assert len(from_snapshot) == 5
+
+
+def test_catalog_snapshot_borrow_updates_in_place(catalog):
+    # a borrow keeps the book's place in catalog order; a retitle moves it
+    get_all_books()
+    book_id = get_book_by_isbn("1000000000003")["id"]
+    now = datetime.now()
+    borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))
+
+    books, _ = get_books_page(None, 10)
+    assert books == sql_books()
+    assert {b["id"]: b for b in books}[book_id]["available_copies"] == 1
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE books SET title = 'Anathem' WHERE id = ?", (book_id,))
+    conn.commit()
+    conn.close()
+    assert get_books_page(None, 1)[0][0]["id"] == book_id
+    assert get_all_books() == sql_books()
+
+
+def test_catalog_snapshot_bulk_insert(catalog):
+    get_all_books()
+    insert_books_bulk([(f"Bulk {i}", "Author", f"{2000000000000 + i}", 1, 1) for i in range(50)])
+
+    assert get_all_books() == sql_books()
+
+
+def test_catalog_snapshot_search(catalog):
+    assert search_books("1000000000001", "isbn")[0]["title"] == "Emma"
+    assert search_books("9999999999999", "isbn") == []
+    # the substring search used when SQLite lacks FTS5
+    assert [b["author"] for b in _search_snapshot("herb", "author")] == ["Frank Herbert", "Another Herbert"]
+    assert len(_search_snapshot("e", "title", limit=2)) == 2
+
+
+def test_catalog_snapshot_record_is_compact():
+    record = BookRecord(1, "Title", "Author", "1000000000000", 1, 1)
+
+    assert not hasattr(record, "__dict__")
+    assert record.as_dict() == {"id": 1, "title": "Title", "author": "Author", "isbn": "1000000000000",
+                                "total_copies": 1, "available_copies": 1}
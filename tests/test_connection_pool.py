@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+import database
+from database import ConnectionPool, PoolTimeout, get_db_connection, get_pool_stats, insert_book, get_book_by_isbn
+
+
+# **************** Negative Test Cases ****************
+def test_pool_times_out_when_exhausted(tmp_path):
+    # a pool of one connection cannot hand out a second one until the first is returned
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.05)
+    conn = pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    assert pool.stats()["timeouts"] == 1
+    conn.close()
+    pool.close_all()
+
+
+def test_pool_rolls_back_unfinished_transaction(temp_db):
+    # work that was never committed must not leak to the next borrower of the connection
+    conn = get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES ('a', 'b', '1111111111111', 1, 1)")
+    conn.close()
+
+    assert get_book_by_isbn("1111111111111") is None
+
+
+# **************** Positive Test Cases ****************
+def test_pool_reuses_connections(temp_db, monkeypatch):
+    # repeated helper calls should be served by the same idle connection
+    monkeypatch.setattr(database, "BOOK_CACHE_ENABLED", False)
+    before = get_pool_stats()
+    insert_book("Pool Book", "Pool Author", "2222222222222", 1, 1)
+    get_book_by_isbn("2222222222222")
+    get_book_by_isbn("2222222222222")
+    after = get_pool_stats()
+
+    assert after["misses"] == before["misses"]
+    assert after["hits"] - before["hits"] == 3
+    assert after["in_use"] == 0
+
+
+def test_pool_is_bounded_across_threads(temp_db):
+    # many threads hammering the helpers never open more than POOL_SIZE connections
+    insert_book("Pool Book", "Pool Author", "3333333333333", 1, 1)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                assert get_book_by_isbn("3333333333333")["title"] == "Pool Book"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = get_pool_stats()
+    assert errors == []
+    assert stats["open"] <= database.POOL_SIZE
+    assert stats["in_use"] == 0
+
+
+def test_pool_pins_connection_to_app_context(temp_db):
+    # inside a Flask app context every helper shares one connection until teardown
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    app.teardown_appcontext(database.release_db_connection)
+
+    with app.app_context():
+        first = get_db_connection()
+        insert_book("Pool Book", "Pool Author", "4444444444444", 1, 1)
+        assert get_db_connection() is first
+        assert get_pool_stats()["in_use"] == 1
+
+    assert get_pool_stats()["in_use"] == 0
+    assert get_book_by_isbn("4444444444444") is not None
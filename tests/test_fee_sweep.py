@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from database import get_db_connection, insert_book, get_book_by_isbn, borrow_book_transaction, return_book_transaction
+from services.fee_service import sweep_late_fees, calculate_patron_late_fees
+
+
+def borrow_due(patron_id, book_id, due):
+    borrow_book_transaction(patron_id, book_id, due - timedelta(days=14), due)
+
+
+def seed():
+    insert_book("Sweep Book", "Author", "1000000000001", 100, 100)
+    book_id = get_book_by_isbn("1000000000001")["id"]
+    now = datetime.now()
+    for patron_id, days in (("111111", 2), ("111111", 9), ("222222", 30), ("333333", -3), ("444444", 0)):
+        borrow_due(patron_id, book_id, now - timedelta(days=days, seconds=1))
+    return book_id, now
+
+
+# **************** Negative Test Cases ****************
+def test_fee_sweep_empty_library(temp_db):
+    assert sweep_late_fees() == []
+
+
+def test_fee_sweep_skips_returned_and_not_yet_due(temp_db):
+    book_id, now = seed()
+    return_book_transaction("222222", book_id, now)
+
+    patrons = {row["patron_id"] for row in sweep_late_fees(now)}
+    # 222222 returned their book, 333333 is not due yet
+    assert patrons == {"111111", "444444"}
+
+
+# **************** Positive Test Cases ****************
+def test_fee_sweep_totals(temp_db):
+    book_id, now = seed()
+    totals = {row["patron_id"]: row for row in sweep_late_fees(now)}
+
+    assert totals["111111"]["overdue_loans"] == 2
+    assert totals["111111"]["total_fee"] == 1.0 + 5.5
+    assert totals["111111"]["max_days_overdue"] == 9
+    assert totals["222222"]["total_fee"] == 15.0
+    # due earlier today: overdue, but not a full day late yet
+    assert totals["444444"]["total_fee"] == 0.0
+
+
+def test_fee_sweep_matches_patron_fee_engine(temp_db):
+    # SQL tiers and the Python tiers agree for every day up to past the cap
+    insert_book("Sweep Book", "Author", "1000000000002", 100, 100)
+    book_id = get_book_by_isbn("1000000000002")["id"]
+    now = datetime.now()
+    for days in range(25):
+        borrow_due(f"{500000 + days}", book_id, now - timedelta(days=days, hours=1))
+
+    for row in sweep_late_fees(now):
+        expected = sum(loan["fee_amount"] for loan in calculate_patron_late_fees(row["patron_id"], now))
+        assert row["total_fee"] == expected
+
+
+def test_fee_sweep_as_of_later_date(temp_db):
+    # billing can be run for a future date, e.g. to preview next week's fees
+    book_id, now = seed()
+    totals = {row["patron_id"]: row for row in sweep_late_fees(now + timedelta(days=10))}
+    assert totals["333333"]["total_fee"] == 3.5 + 0.0
+    assert totals["333333"]["max_days_overdue"] == 7
+
+
+def test_fee_sweep_uses_open_loan_index(temp_db):
+    from services.fee_service import _SWEEP_SQL
+    conn = get_db_connection()
+    plan = " ".join(row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + _SWEEP_SQL, {
+        "as_of": "2030-01-01", "as_of_date": "2030-01-01", "tier_days": 7,
+        "first_rate": 0.5, "second_rate": 1.0, "max_fee": 15.0}))
+    conn.close()
+    # work is proportional to open loans, never to the whole loan history
+    assert "USING INDEX idx_borrow_records_open_" in plan
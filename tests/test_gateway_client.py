@@ -0,0 +1,234 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import insert_book, get_book_by_isbn, borrow_book_transaction
+from services import payment_ledger
+from services.gateway_client import (
+    ResilientGateway, CircuitBreaker, GatewayError, GatewayTimeout, CircuitOpenError,
+    percentile, CLOSED, OPEN, HALF_OPEN
+)
+from services.library_service import pay_late_fees, refund_late_fee_payment
+
+
+class FaultyGateway:
+    """
+    Local fake of PaymentGateway that injects faults.
+    Each call takes the next scripted fault: a number of seconds to hang,
+    an exception to raise, or None to answer normally.
+    """
+
+    def __init__(self, *faults):
+        self.faults = list(faults)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _next_fault(self, name):
+        with self._lock:
+            self.calls.append(name)
+            fault = self.faults.pop(0) if self.faults else None
+        if isinstance(fault, Exception):
+            raise fault
+        if fault:
+            time.sleep(fault)
+
+    def process_payment(self, patron_id, amount, description=""):
+        self._next_fault('process_payment')
+        return True, f"txn_{patron_id}", f"Payment of ${amount:.2f} processed successfully"
+
+    def refund_payment(self, transaction_id, amount):
+        self._next_fault('refund_payment')
+        return True, "Refund processed"
+
+    def verify_payment_status(self, transaction_id):
+        self._next_fault('verify_payment_status')
+        return {"transaction_id": transaction_id, "status": "completed"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(gateway, **kwargs):
+    kwargs.setdefault('timeout', 0.1)
+    kwargs.setdefault('base_delay', 0.001)
+    return ResilientGateway(gateway, **kwargs)
+
+
+# **************** Negative Test Cases ****************
+def test_gateway_client_deadline():
+    # a hung gateway call is abandoned at the deadline instead of blocking
+    client = make_client(FaultyGateway(1.0))
+
+    start = time.perf_counter()
+    with pytest.raises(GatewayTimeout):
+        client.process_payment("123456", 5.0)
+
+    assert time.perf_counter() - start < 0.5
+    assert client.metrics()['timeouts'] == 1
+
+
+def test_gateway_client_charges_are_not_retried():
+    gateway = FaultyGateway(ConnectionError("reset"), None)
+    client = make_client(gateway)
+
+    with pytest.raises(GatewayError):
+        client.process_payment("123456", 5.0)
+
+    assert gateway.calls == ['process_payment']
+
+
+def test_gateway_client_verify_gives_up_after_retries():
+    gateway = FaultyGateway(*[ConnectionError("reset")] * 4)
+    client = make_client(gateway, retries=2)
+
+    with pytest.raises(GatewayError):
+        client.verify_payment_status("txn_1")
+
+    assert len(gateway.calls) == 3
+    assert client.metrics()['retries'] == 2
+
+
+def test_gateway_client_breaker_fails_fast():
+    # once the breaker opens, calls are rejected without touching the gateway
+    gateway = FaultyGateway(*[ConnectionError("down")] * 3)
+    client = make_client(gateway, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+
+    for _ in range(3):
+        with pytest.raises(GatewayError):
+            client.refund_payment("txn_1", 1.0)
+    with pytest.raises(CircuitOpenError):
+        client.refund_payment("txn_1", 1.0)
+
+    assert len(gateway.calls) == 3
+    metrics = client.metrics()
+    assert metrics['breaker_state'] == OPEN
+    assert metrics['rejected'] == 1
+
+
+def test_gateway_client_errors_reach_pay_late_fees(temp_db):
+    # a timed-out charge may still go through, so retries must not charge again
+    insert_book("Slow Book", "Author", "1000000000070", 1, 1)
+    book_id = get_book_by_isbn("1000000000070")["id"]
+    due = datetime.now() - timedelta(days=10)
+    borrow_book_transaction("123456", book_id, due - timedelta(days=14), due)
+    gateway = FaultyGateway(0.3)
+    client = make_client(gateway)
+
+    success, message, txn = pay_late_fees("123456", book_id, client, idempotency_key="k1")
+    retry = pay_late_fees("123456", book_id, client, idempotency_key="k1")
+    other_click = pay_late_fees("123456", book_id, client)
+
+    assert success == False
+    assert "did not respond" in message
+    assert txn is None
+    assert retry[0] == False and "being confirmed" in retry[1]
+    assert other_click[0] == False and "No late fees" in other_click[1]
+    assert payment_ledger.find_payment("k1")["status"] == payment_ledger.UNKNOWN
+
+    # the abandoned call finishes and settles the payment in the ledger
+    deadline = time.monotonic() + 5
+    while payment_ledger.find_payment("k1")["status"] != payment_ledger.COMPLETED:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert pay_late_fees("123456", book_id, client, idempotency_key="k1")[2] == "txn_123456"
+    assert gateway.calls == ["process_payment"]
+
+
+def test_gateway_client_timed_out_refund_stays_reserved(temp_db):
+    # the refund may still go through, so a second one can't take the payment past what was paid
+    payment_id, _ = payment_ledger.start_payment("123456", 10.0, [])
+    payment_ledger.complete_payment(payment_id, "txn_refund_1", "ok")
+    gateway = FaultyGateway(0.3)
+    client = make_client(gateway)
+
+    first = refund_late_fee_payment("txn_refund_1", 10.0, client)
+    second = refund_late_fee_payment("txn_refund_1", 10.0, client)
+
+    assert first[0] == False and "did not respond" in first[1]
+    assert second == (False, "Refund amount exceeds the amount paid.")
+    assert gateway.calls == ["refund_payment"]
+    time.sleep(0.4)
+    assert payment_ledger.find_payment_by_transaction("txn_refund_1")["refunded_amount"] == 10.0
+
+
+def test_gateway_client_breaker_rejection_frees_payment(temp_db, mocker):
+    mocker.patch("services.library_service.calculate_late_fee_for_book",
+                 return_value={'fee_amount': 5.0, 'days_overdue': 10, 'status': 'late'})
+    mocker.patch("services.library_service.get_book_by_id", return_value={'id': 1, 'title': 'Slow Book'})
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+    client = make_client(FaultyGateway(), breaker=breaker)
+
+    success, message, txn = pay_late_fees("123456", 1, client, idempotency_key="k2")
+
+    assert success == False
+    assert "unavailable" in message
+    assert payment_ledger.find_payment("k2") is None
+
+
+# **************** Positive Test Cases ****************
+def test_gateway_client_verify_retries_transient_failures():
+    gateway = FaultyGateway(ConnectionError("reset"), 1.0, None)
+    client = make_client(gateway)
+
+    status = client.verify_payment_status("txn_1")
+
+    assert status["status"] == "completed"
+    assert len(gateway.calls) == 3
+
+
+def test_gateway_client_breaker_half_open_recovery():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+    # one trial call at a time
+    assert breaker.allow() == True
+    assert breaker.allow() == False
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_gateway_client_breaker_reopens_on_failed_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    assert breaker.allow() == True
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+
+
+def test_gateway_client_latency_metrics():
+    client = make_client(FaultyGateway())
+
+    for _ in range(20):
+        client.process_payment("123456", 5.0)
+
+    latency = client.metrics()['latency_ms']['process_payment']
+    assert latency['count'] == 20
+    assert latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+    assert client.metrics()['breaker_state'] == CLOSED
+
+
+def test_gateway_client_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 0.50) == 50
+    assert percentile(samples, 0.95) == 95
+    assert percentile(samples, 1.0) == 100
+    assert percentile([7], 0.99) == 7
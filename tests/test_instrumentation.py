@@ -0,0 +1,109 @@
+import json
+import logging
+
+import pytest
+
+import database
+import instrumentation
+from app import create_app
+from services.gateway_client import ResilientGateway
+
+
+@pytest.fixture
+def instrumented(temp_db, monkeypatch):
+    monkeypatch.setattr(instrumentation, "INSTRUMENTATION_ENABLED", True)
+    monkeypatch.setattr(database, "CONNECTION_FACTORY", database.PooledConnection)
+    instrumentation.metrics.reset()
+    app = create_app(sample_data=True)
+    yield app.test_client()
+    instrumentation.init_instrumentation(app, enabled=False)
+
+
+@pytest.fixture
+def plain(temp_db, monkeypatch):
+    monkeypatch.setattr(instrumentation, "INSTRUMENTATION_ENABLED", False)
+    instrumentation.metrics.reset()
+    return create_app().test_client()
+
+
+def server_timing(response):
+    return dict(part.strip().split(";", 1) for part in response.headers["Server-Timing"].split(","))
+
+
+# **************** Negative Test Cases ****************
+def test_instrumentation_disabled_adds_nothing(plain):
+    response = plain.get("/catalog")
+
+    assert "Server-Timing" not in response.headers
+    assert database.CONNECTION_FACTORY is database.PooledConnection
+    assert instrumentation.metrics.snapshot()["requests"] == {}
+
+
+def test_instrumentation_disabled_metrics_still_served(plain):
+    response = plain.get("/metrics")
+
+    assert response.status_code == 200
+    assert "library_db_pool_size" in response.get_data(as_text=True)
+
+
+# **************** Positive Test Cases ****************
+def test_instrumentation_server_timing(instrumented):
+    response = instrumented.get("/catalog")
+
+    timings = server_timing(response)
+    assert set(timings) >= {"app", "db"}
+    assert 'desc="0 queries"' not in timings["db"]
+    assert float(timings["app"].split("=")[1]) > 0
+
+
+def test_instrumentation_counts_statements(instrumented):
+    # /api/late_fee checks the book change log, looks up the book, then the patron's loans
+    database.book_cache.clear()
+    response = instrumented.get("/api/late_fee/123456/3")
+
+    assert 'desc="3 queries"' in server_timing(response)["db"]
+
+
+def test_instrumentation_structured_log(instrumented, caplog):
+    # no caplog.at_level: enabling instrumentation must make the logger emit INFO lines itself
+    instrumented.get("/api/books?limit=5")
+
+    assert instrumentation.logger.isEnabledFor(logging.INFO)
+    assert instrumentation.logger.handlers
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["endpoint"] == "/api/books"
+    assert record["status"] == 200
+    assert record["sql_count"] >= 1
+
+
+def test_instrumentation_gateway_time(instrumented):
+    # a payment through the resilient client shows up as gateway time
+    class Gateway:
+        def refund_payment(self, transaction_id, amount):
+            return True, "ok"
+
+    client = ResilientGateway(Gateway())
+    app = instrumented.application
+
+    @app.route("/_refund")
+    def refund():
+        client.refund_payment("txn_1", 1.0)
+        return "ok"
+
+    response = instrumented.get("/_refund")
+
+    assert 'desc="1 calls"' in server_timing(response)["gateway"]
+    assert instrumentation.metrics.snapshot()["gateway_calls"] == 1
+
+
+def test_instrumentation_prometheus_metrics(instrumented):
+    instrumented.get("/catalog")
+    instrumented.get("/catalog")
+
+    text = instrumented.get("/metrics").get_data(as_text=True)
+
+    assert 'library_http_requests_total{method="GET",endpoint="/catalog",status="200"} 2' in text
+    assert 'library_http_request_duration_seconds_count{endpoint="/catalog"} 2' in text
+    assert 'library_http_request_duration_seconds_bucket{endpoint="/catalog",le="+Inf"} 2' in text
+    assert "# TYPE library_sql_statements_total counter" in text
+    assert "library_gateway_breaker_open 0" in text
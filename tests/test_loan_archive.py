@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+import database
+from database import (
+    insert_book, get_book_by_isbn, borrow_book_transaction, return_book_transaction,
+    get_borrow_record, get_patron_loan_history, get_patron_borrow_count, check_patron_counters
+)
+from services.archive_service import archive_closed_loans, get_archive_stats
+
+NOW = datetime(2025, 6, 30, 12, 0)
+
+
+def loan(patron_id, book_id, borrowed_days_ago, returned_days_ago=None):
+    borrowed = NOW - timedelta(days=borrowed_days_ago)
+    borrow_book_transaction(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    if returned_days_ago is not None:
+        return_book_transaction(patron_id, book_id, NOW - timedelta(days=returned_days_ago))
+
+
+def seed():
+    insert_book("Archive Book", "Author", "1000000000050", 100, 100)
+    book_id = get_book_by_isbn("1000000000050")["id"]
+    loan("123456", book_id, 800, 790)    # old, returned: archived
+    loan("123456", book_id, 500, 400)    # old, returned: archived
+    loan("123456", book_id, 40, 30)      # recent, returned: stays
+    loan("123456", book_id, 900)         # very old but still out: stays
+    loan("654321", book_id, 700, 690)    # old, returned: archived
+    return book_id
+
+
+def record_ids(table):
+    conn = database.get_db_connection()
+    ids = [row[0] for row in conn.execute(f"SELECT id FROM {table} ORDER BY id")]
+    conn.close()
+    return ids
+
+
+# **************** Negative Test Cases ****************
+def test_loan_archive_nothing_to_archive(temp_db):
+    seed()
+
+    report = archive_closed_loans(older_than_days=1000, now=NOW)
+
+    assert report["archived"] == 0 and report["batches"] == 0
+    assert get_archive_stats() == {"hot": 5, "archived": 0}
+
+
+def test_loan_archive_keeps_open_loans(temp_db):
+    book_id = seed()
+
+    archive_closed_loans(older_than_days=365, now=NOW)
+
+    # the 900 day old loan is still out: it stays, and the counters are untouched
+    assert get_patron_borrow_count("123456") == 1
+    assert check_patron_counters() == []
+    status, _ = return_book_transaction("123456", book_id, NOW)
+    assert status == "returned"
+
+
+# **************** Positive Test Cases ****************
+def test_loan_archive_moves_old_returned_loans(temp_db):
+    seed()
+    before = record_ids("borrow_records")
+
+    report = archive_closed_loans(older_than_days=365, now=NOW)
+
+    assert report["archived"] == 3
+    assert record_ids("borrow_records_archive") == [before[0], before[1], before[4]]
+    assert record_ids("borrow_records") == [before[2], before[3]]
+
+
+def test_loan_archive_in_batches(temp_db):
+    seed()
+
+    report = archive_closed_loans(older_than_days=365, batch_size=1, now=NOW)
+
+    assert report == dict(report, archived=3, batches=3)
+    assert archive_closed_loans(older_than_days=365, batch_size=1, now=NOW)["archived"] == 0
+
+
+def test_loan_archive_history_spans_both_tables(temp_db):
+    seed()
+    first_id = record_ids("borrow_records")[0]
+    archive_closed_loans(older_than_days=365, now=NOW)
+
+    history = get_patron_loan_history("123456")
+
+    assert [(loan["borrow_date"], loan["archived"]) for loan in history] == [
+        (NOW - timedelta(days=40), False), (NOW - timedelta(days=500), True), (NOW - timedelta(days=800), True)]
+    assert history[0]["title"] == "Archive Book"
+    record = get_borrow_record(first_id)
+    assert record["archived"] and record["return_date"] == NOW - timedelta(days=790)
+    assert get_borrow_record(999999) is None
+
+
+def test_loan_archive_cli(temp_db):
+    seed()
+    runner = create_app().test_cli_runner()
+
+    result = runner.invoke(args=["archive-loans", "--older-than-days", "0"])
+
+    assert result.exit_code == 0
+    assert "4 loans archived" in result.output
+    assert "1 in borrow_records, 4 archived" in result.output
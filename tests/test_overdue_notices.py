@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from database import insert_book, get_book_by_isbn, borrow_book_transaction, return_book_transaction
+from services import payment_ledger
+from services.notice_service import (
+    iter_overdue_loans, iter_overdue_notices, write_overdue_notices, write_overdue_notice_file, CSV_FIELDS
+)
+
+NOW = datetime(2025, 6, 30, 12, 0)
+
+
+def seed():
+    insert_book("Notice Book", "Author", "1000000000040", 100, 100)
+    book_id = get_book_by_isbn("1000000000040")["id"]
+    # (patron, days overdue at NOW); negative means not due yet
+    for patron_id, days in (("222222", 30), ("111111", 2), ("111111", 9), ("333333", -3), ("444444", 5)):
+        due = NOW - timedelta(days=days, seconds=1)
+        borrow_book_transaction(patron_id, book_id, due - timedelta(days=14), due)
+    return book_id
+
+
+# **************** Negative Test Cases ****************
+def test_overdue_notices_none_overdue(temp_db):
+    stream = io.StringIO()
+
+    report = write_overdue_notices(stream, "jsonl", NOW)
+
+    assert report["patrons"] == 0 and report["loans"] == 0
+    assert stream.getvalue() == ""
+
+
+def test_overdue_notices_skip_returned_and_not_due(temp_db):
+    book_id = seed()
+    return_book_transaction("444444", book_id, NOW)
+
+    patrons = [notice["patron_id"] for notice in iter_overdue_notices(NOW)]
+
+    assert patrons == ["111111", "222222"]
+
+
+def test_overdue_notices_deduct_paid_fees(temp_db):
+    seed()
+    loan = next(loan for loan in iter_overdue_loans(NOW) if loan["patron_id"] == "222222")
+    payment_id, _ = payment_ledger.start_payment("222222", 10.0, [dict(loan, fee_amount=10.0)])
+    payment_ledger.complete_payment(payment_id, "txn_notice_1", "ok")
+
+    notice = next(notice for notice in iter_overdue_notices(NOW) if notice["patron_id"] == "222222")
+
+    assert notice["total_fee"] == 5.0
+
+
+def test_overdue_notices_no_partial_file(temp_db, tmp_path, mocker):
+    seed()
+    mocker.patch("services.notice_service.write_overdue_notices", side_effect=RuntimeError("disk full"))
+    out = tmp_path / "out"
+    out.mkdir()
+
+    with pytest.raises(RuntimeError):
+        write_overdue_notice_file(str(out / "notices.jsonl"), as_of=NOW)
+
+    assert list(out.iterdir()) == []
+
+
+# **************** Positive Test Cases ****************
+def test_overdue_notices_grouped_per_patron(temp_db):
+    seed()
+
+    notices = list(iter_overdue_notices(NOW))
+
+    assert [(n["patron_id"], n["overdue_loans"], n["total_fee"]) for n in notices] == [
+        ("111111", 2, 1.0 + 5.5), ("222222", 1, 15.0), ("444444", 1, 2.5)]
+    assert [loan["days_overdue"] for loan in notices[0]["loans"]] == [9, 2]
+
+
+def test_overdue_notices_stream_in_batches(temp_db):
+    seed()
+
+    loans = iter_overdue_loans(NOW, fetch_size=1)
+    first = next(loans)
+    loans.close()   # the connection goes back to the pool
+
+    assert first["patron_id"] == "111111"
+
+
+def test_overdue_notices_jsonl(temp_db):
+    seed()
+    stream = io.StringIO()
+
+    report = write_overdue_notices(stream, "jsonl", NOW)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert report == dict(report, patrons=3, loans=4, total_fee=24.0)
+    assert lines[1]["patron_id"] == "222222"
+    assert lines[1]["as_of"] == NOW.isoformat()
+    assert lines[1]["loans"][0]["fee_amount"] == 15.0
+
+
+def test_overdue_notices_csv(temp_db):
+    seed()
+    stream = io.StringIO()
+
+    write_overdue_notices(stream, "csv", NOW)
+
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert tuple(rows[0]) == CSV_FIELDS
+    assert [row["patron_id"] for row in rows] == ["111111", "111111", "222222", "444444"]
+    assert rows[0]["patron_total_fee"] == "6.5"
+    assert datetime.fromisoformat(rows[0]["due_date"]) < NOW
+
+
+def test_overdue_notices_cli(temp_db, tmp_path):
+    seed()
+    path = tmp_path / "notices.csv"
+    runner = create_app().test_cli_runner()
+
+    result = runner.invoke(args=["overdue-notices", str(path), "--as-of", "2025-06-30T12:00:00"])
+
+    assert result.exit_code == 0
+    assert "3 patrons, 4 overdue loans, $24.00" in result.output
+    assert path.read_text().startswith("patron_id,")
@@ -0,0 +1,175 @@
+import sqlite3
+from datetime import datetime
+
+from app import create_app
+from conftest import borrow_overdue
+import database
+from database import (
+    insert_book, get_book_by_isbn, borrow_book_transaction, return_book_transaction,
+    get_patron, get_patron_borrow_count, check_patron_counters, migrate_database, SCHEMA_MIGRATIONS
+)
+from services.fee_service import refresh_outstanding_fees
+from services.library_service import borrow_book_by_patron, return_book_by_patron, get_patron_status_report
+from services import payment_ledger
+
+
+def add_book(isbn, copies=10):
+    insert_book(f"Counter Book {isbn}", "Author", isbn, copies, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def corrupt(patron_id, open_loans):
+    conn = database.get_db_connection()
+    conn.execute("UPDATE patrons SET open_loans = ? WHERE patron_id = ?", (open_loans, patron_id))
+    conn.commit()
+    conn.close()
+
+
+# **************** Negative Test Cases ****************
+def test_patron_counters_unknown_patron(temp_db):
+    assert get_patron("999999") is None
+    assert get_patron_borrow_count("999999") == 0
+
+
+def test_patron_counters_limit_uses_counter(temp_db):
+    book_id = add_book("1000000000030")
+    borrow_book_by_patron("123456", book_id)
+    corrupt("123456", 5)
+
+    success, message = borrow_book_by_patron("123456", book_id)
+
+    assert not success
+    assert "maximum borrowing limit" in message
+
+
+def test_patron_counters_check_finds_drift(temp_db):
+    book_id = add_book("1000000000031")
+    borrow_book_by_patron("123456", book_id)
+    borrow_book_by_patron("654321", book_id)
+    corrupt("123456", 3)
+    corrupt("654321", -1)
+
+    mismatches = check_patron_counters()
+
+    assert mismatches == [{"patron_id": "123456", "open_loans": 3, "actual": 1},
+                          {"patron_id": "654321", "open_loans": -1, "actual": 1}]
+    # without repair nothing changes
+    assert get_patron_borrow_count("123456") == 3
+
+
+def test_patron_counters_cli_reports_drift(temp_db):
+    book_id = add_book("1000000000032")
+    borrow_book_by_patron("123456", book_id)
+    corrupt("123456", 2)
+    runner = create_app().test_cli_runner()
+
+    result = runner.invoke(args=["check-patrons"])
+    assert result.exit_code == 1
+    assert "123456: open_loans 2, actual 1" in result.output
+
+    result = runner.invoke(args=["check-patrons", "--repair"])
+    assert result.exit_code == 0
+    assert get_patron_borrow_count("123456") == 1
+
+
+# **************** Positive Test Cases ****************
+def test_patron_counters_follow_borrow_and_return(temp_db):
+    first, second = add_book("1000000000033"), add_book("1000000000034")
+
+    borrow_book_by_patron("123456", first)
+    borrow_book_by_patron("123456", second)
+    assert get_patron_borrow_count("123456") == 2
+
+    return_book_by_patron("123456", first)
+    assert get_patron_borrow_count("123456") == 1
+    assert check_patron_counters() == []
+
+
+def test_patron_counters_rollback_leaves_counter(temp_db):
+    book_id = add_book("1000000000035", copies=1)
+    borrow_book_by_patron("123456", book_id)
+
+    # no copies left: the transaction rolls back and the counter is untouched
+    status, _ = borrow_book_transaction("654321", book_id, datetime.now(), datetime.now())
+    assert status == "unavailable"
+    assert get_patron_borrow_count("654321") == 0
+
+
+def test_patron_counters_repair_rebuilds(temp_db):
+    book_id = add_book("1000000000036")
+    borrow_book_by_patron("123456", book_id)
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM patrons")
+    conn.commit()
+    conn.close()
+
+    assert len(check_patron_counters(repair=True)) == 1
+    assert get_patron_borrow_count("123456") == 1
+    assert check_patron_counters() == []
+
+
+def test_patron_counters_backfilled_by_migration(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    for migration in SCHEMA_MIGRATIONS[:7]:
+        if callable(migration):
+            migration(conn)
+        else:
+            for statement in migration:
+                conn.execute(statement)
+    conn.execute("PRAGMA user_version = 7")
+    conn.executemany("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) "
+                     "VALUES (?, 1, 0, 0, ?)", [("123456", None), ("123456", None), ("123456", 1), ("654321", 1)])
+    conn.commit()
+
+    migrate_database(conn)
+
+    assert conn.execute("SELECT patron_id, open_loans FROM patrons ORDER BY patron_id").fetchall() == \
+        [("123456", 2), ("654321", 0)]
+    conn.close()
+
+
+def test_patron_counters_outstanding_fees(temp_db):
+    borrow_overdue("123456", "1000000000037", 3)
+    borrow_overdue("123456", "1000000000040", 10)
+
+    assert refresh_outstanding_fees() == 1
+    patron = get_patron("123456")
+    assert patron["outstanding_fees"] == 1.5 + 6.5
+    assert patron["fees_as_of"] is not None
+
+    # completing a payment takes it off the stored total
+    payment_id, _ = payment_ledger.start_payment("123456", 1.5, [])
+    payment_ledger.complete_payment(payment_id, "txn_counter_1", "ok")
+    assert get_patron("123456")["outstanding_fees"] == 6.5
+
+
+def test_patron_counters_payment_completed_after_refresh(temp_db):
+    # a payment pending or timed out at refresh time is deducted once, when it completes
+    borrow_overdue("123456", "1000000000039", 10)
+    borrow_overdue("123456", "1000000000041", 20)
+    records = database.get_patron_borrowed_books("123456")   # 20 days overdue first
+    pending, _ = payment_ledger.start_payment("123456", 6.5, [dict(records[1], fee_amount=6.5)])
+    timed_out, _ = payment_ledger.start_payment("123456", 10.0, [dict(records[0], fee_amount=10.0)])
+    payment_ledger.mark_payment_unknown(timed_out, "Payment gateway did not respond within 2s")
+
+    refresh_outstanding_fees()
+    assert get_patron("123456")["outstanding_fees"] == 15.0 + 6.5
+
+    payment_ledger.complete_payment(pending, "txn_counter_2", "ok")
+    payment_ledger.complete_payment(timed_out, "txn_counter_3", "ok")
+    assert get_patron("123456")["outstanding_fees"] == 5.0
+    # a later refresh agrees with the trigger
+    refresh_outstanding_fees()
+    assert get_patron("123456")["outstanding_fees"] == 5.0
+
+
+def test_patron_counters_report_header(temp_db):
+    book_id = add_book("1000000000038")
+    borrow_book_by_patron("123456", book_id)
+    borrow_book_by_patron("123456", book_id)
+    return_book_by_patron("123456", book_id)
+
+    report = get_patron_status_report("123456")
+
+    assert report["current_borrow_count"] == 1
+    assert len(report["currently_borrowed"]) == 1
@@ -0,0 +1,70 @@
+import pytest
+
+import database
+from conftest import borrow_overdue
+from services.fee_service import late_fee_for_days, calculate_patron_late_fees
+from services.library_service import get_patron_status_report, calculate_late_fee_for_book
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    # record every SQL statement run through pooled connections
+    executed = []
+    get_connection = database.get_db_connection
+
+    def traced_connection():
+        conn = get_connection()
+        conn.set_trace_callback(executed.append)
+        return conn
+
+    monkeypatch.setattr(database, "get_db_connection", traced_connection)
+    return executed
+
+
+# **************** Negative Test Cases ****************
+def test_fee_engine_no_fee_before_due():
+    assert late_fee_for_days(0) == 0.0
+    assert late_fee_for_days(-3) == 0.0
+
+
+def test_fee_engine_patron_without_loans(temp_db, statements):
+    assert calculate_patron_late_fees("123456") == []
+    assert get_patron_status_report("123456")["current_borrow_count"] == 0
+
+
+# **************** Positive Test Cases ****************
+def test_fee_engine_tiers():
+    assert late_fee_for_days(1) == 0.5
+    assert late_fee_for_days(7) == 3.5
+    assert late_fee_for_days(8) == 4.5
+    assert late_fee_for_days(18) == 14.5
+    assert late_fee_for_days(19) == 15.0
+    assert late_fee_for_days(400) == 15.0
+
+
+def test_fee_engine_matches_per_book_calculation(temp_db):
+    # the bulk engine and calculate_late_fee_for_book agree book by book
+    book_ids = [borrow_overdue("123456", f"100000000000{i}", days) for i, days in enumerate((0, 3, 10, 30))]
+
+    fees = {loan["book_id"]: loan for loan in calculate_patron_late_fees("123456")}
+
+    for book_id in book_ids:
+        single = calculate_late_fee_for_book("123456", book_id)
+        assert fees[book_id]["fee_amount"] == single["fee_amount"]
+        assert fees[book_id]["days_overdue"] == single["days_overdue"]
+
+
+def test_fee_engine_status_report_single_query(temp_db, statements):
+    # five overdue books cost the patron's counters row, one SELECT for the history
+    # and one for the loans, not 1 + 2 per book
+    for i, days in enumerate((1, 5, 9, 12, 40)):
+        borrow_overdue("123456", f"200000000000{i}", days)
+    statements.clear()
+
+    report = get_patron_status_report("123456")
+
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 3
+    assert report["current_borrow_count"] == 5
+    assert report["owed_late_fees"] == 0.5 + 2.5 + 5.5 + 8.5 + 15.0
+    assert len(report["currently_borrowed"]) == 5
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+import database
+from database import (
+    insert_book, get_book_by_isbn, borrow_book_transaction, return_book_transaction,
+    get_patron_borrow_history, encode_cursor
+)
+from services.archive_service import archive_closed_loans
+from services.library_service import get_patron_status_report
+
+NOW = datetime(2025, 6, 30, 12, 0)
+
+
+@pytest.fixture
+def client(temp_db):
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def history(patron_id="123456", days=(10, 20, 30, 40, 50), open_days=()):
+    """Returned loans borrowed the given number of days before NOW, plus open ones."""
+    insert_book("History Book", "Author", "1000000000060", 100, 100)
+    book_id = get_book_by_isbn("1000000000060")["id"]
+    for days_ago in days:
+        borrowed = NOW - timedelta(days=days_ago)
+        borrow_book_transaction(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+        return_book_transaction(patron_id, book_id, borrowed + timedelta(days=7))
+    for days_ago in open_days:
+        borrowed = NOW - timedelta(days=days_ago)
+        borrow_book_transaction(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    return book_id
+
+
+def all_pages(patron_id, limit):
+    loans, after = [], None
+    while True:
+        page, after = get_patron_borrow_history(patron_id, after, limit)
+        loans.extend(page)
+        if after is None:
+            return loans
+
+
+# **************** Negative Test Cases ****************
+def test_patron_history_empty(temp_db):
+    assert get_patron_borrow_history("123456") == ([], None)
+
+
+def test_patron_history_skips_open_loans_and_other_patrons(temp_db):
+    history(open_days=(5,))
+    history(patron_id="654321", days=(15,))
+
+    loans, next_key = get_patron_borrow_history("123456")
+
+    assert len(loans) == 5 and next_key is None
+    assert all(loan["return_date"] is not None for loan in loans)
+
+
+def test_patron_history_route_rejects_bad_input(client):
+    assert client.get("/api/patrons/12345/history").status_code == 400
+    assert client.get("/api/patrons/123456/history?after=nonsense").status_code == 400
+    assert client.get("/api/patrons/123456/history?limit=0").status_code == 400
+
+
+def test_patron_history_route_rejects_wrong_cursor_types(client):
+    history()
+    # a catalog cursor is (title, id); history cursors are (borrow date, id)
+    for key in (("History Book", 2), ([1], 2), (1, {"a": 1}), (True, 2)):
+        response = client.get(f"/api/patrons/123456/history?after={encode_cursor(key)}")
+        assert response.status_code == 400
+
+
+# **************** Positive Test Cases ****************
+def test_patron_history_most_recent_first(temp_db):
+    history()
+
+    loans, _ = get_patron_borrow_history("123456")
+
+    assert [loan["borrow_date"] for loan in loans] == [NOW - timedelta(days=d) for d in (10, 20, 30, 40, 50)]
+    assert loans[0]["title"] == "History Book"
+
+
+def test_patron_history_pages_cover_everything_once(temp_db):
+    # loans borrowed at the same second are told apart by id
+    history(days=(10, 10, 10, 20, 20, 30, 40))
+
+    loans = all_pages("123456", limit=2)
+
+    assert len(loans) == 7
+    assert len({loan["id"] for loan in loans}) == 7
+    keys = [(loan["borrow_date"], loan["id"]) for loan in loans]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_patron_history_includes_archived_loans(temp_db):
+    history()
+    archive_closed_loans(older_than_days=30, now=NOW)
+
+    loans = all_pages("123456", limit=2)
+
+    assert [loan["archived"] for loan in loans] == [False, False, False, True, True]
+
+
+def test_patron_history_query_plan(temp_db):
+    conn = database.get_db_connection()
+    sql = database._HISTORY_PAGE_SQL.format(after="AND (br.borrow_date, br.id) < (:date, :id)",
+                                            archive_after="AND (ar.borrow_date, ar.id) < (:date, :id)")
+    plan = " ".join(row["detail"] for row in conn.execute(
+        "EXPLAIN QUERY PLAN " + sql, {"patron_id": "123456", "date": 0, "id": 0, "limit": 51}))
+    conn.close()
+
+    assert "idx_borrow_records_closed_patron" in plan
+    assert "idx_borrow_records_archive_patron" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_patron_history_route(client):
+    history()
+
+    first = client.get("/api/patrons/123456/history?limit=3").get_json()
+    second = client.get(f"/api/patrons/123456/history?limit=3&after={first['next']}").get_json()
+
+    assert first["count"] == 3 and second["count"] == 2
+    assert second["next"] is None
+    assert first["loans"][0]["borrow_date"] == (NOW - timedelta(days=10)).isoformat()
+    assert first["next"] == encode_cursor(
+        (database.to_timestamp(NOW - timedelta(days=30)), first["loans"][2]["id"]))
+
+
+def test_patron_history_in_status_report(temp_db):
+    history(days=(10, 20), open_days=(3,))
+
+    report = get_patron_status_report("123456")
+
+    assert report["borrow_history"] == [
+        ("History Book", NOW - timedelta(days=10), NOW - timedelta(days=3)),
+        ("History Book", NOW - timedelta(days=20), NOW - timedelta(days=13))]
+    assert report["current_borrow_count"] == 1
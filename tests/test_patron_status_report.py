@@ -1,9 +1,10 @@
 from services.library_service import get_patron_status_report, add_book_to_catalog, return_book_by_patron, borrow_book_by_patron
-from database import init_database, get_book_by_isbn
+from database import init_database, get_book_by_isbn, close_db_connections
 import pytest
 
 def reset_db():
     from pathlib import Path
+    close_db_connections()
     Path("library.db").unlink(missing_ok=True)
     init_database()
 
@@ -57,8 +58,6 @@ def test_get_patron_status_report_show_all_borrowed_books():
 
 
 
-# THIS TEST CODE IS TEMPORARILY NON FUNCTIONAL. IT IS THE TEST CASE WHICH EXPECTS THE get_patron_status_report() FUNCTION TO BE FULLY IMPLEMENTED
-'''
 def test_get_patron_status_report_show_all_returned_books():
     # should return a dictionary where there is 1 currently borrowed books, 2 in borrow history, and zero owed
     borrow_book_by_patron("444444", Book_test_id)
@@ -73,6 +72,5 @@ def test_get_patron_status_report_show_all_returned_books():
     assert len(result_dict["currently_borrowed"]) == 1
     assert result_dict["owed_late_fees"] == 0
     assert len(result_dict["borrow_history"]) == 2
-'''
 
 
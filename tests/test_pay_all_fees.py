@@ -0,0 +1,67 @@
+from conftest import borrow_overdue
+from services.library_service import pay_all_late_fees, split_fee_charges, PaymentGateway
+
+
+# **************** Negative Test Cases ****************
+def test_pay_all_late_fees_invalid_patron(mocker):
+    gateway = mocker.Mock(spec=PaymentGateway)
+
+    success, message, charges = pay_all_late_fees("12 456", gateway)
+
+    assert success == False
+    assert "Invalid patron ID" in message
+    gateway.process_payment.assert_not_called()
+
+
+def test_pay_all_late_fees_nothing_owed(temp_db, mocker):
+    borrow_overdue("123456", "1000000000001", -3)
+    gateway = mocker.Mock(spec=PaymentGateway)
+
+    success, message, charges = pay_all_late_fees("123456", gateway)
+
+    assert success == False
+    assert "No late fees to pay" in message
+    gateway.process_payment.assert_not_called()
+
+
+def test_pay_all_late_fees_stops_on_failed_charge(temp_db, mocker):
+    # the second of two charges fails: the first is still reported as paid
+    for i in range(3):
+        borrow_overdue("123456", f"100000000001{i}", 30)
+    gateway = mocker.Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = [(True, "txn_1", "ok"), (False, "", "Payment declined")]
+
+    success, message, charges = pay_all_late_fees("123456", gateway, charge_limit=30.0)
+
+    assert success == False
+    assert "1 of 2 charges went through" in message
+    assert [charge["transaction_id"] for charge in charges] == ["txn_1"]
+
+
+# **************** Positive Test Cases ****************
+def test_pay_all_late_fees_single_charge(temp_db, mocker):
+    # three overdue books, one on time: one gateway call for the total of the three
+    book_ids = [borrow_overdue("123456", f"100000000002{i}", days) for i, days in enumerate((3, 10, 30))]
+    borrow_overdue("123456", "1000000000029", -2)
+    gateway = mocker.Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_123", "ok")
+
+    success, message, charges = pay_all_late_fees("123456", gateway)
+
+    assert success == True
+    gateway.process_payment.assert_called_once_with(
+        patron_id="123456", amount=1.5 + 6.5 + 15.0, description="Late fees for 3 book(s)")
+    assert len(charges) == 1
+    allocations = {a["book_id"]: a["fee_amount"] for a in charges[0]["allocations"]}
+    assert allocations == {book_ids[0]: 1.5, book_ids[1]: 6.5, book_ids[2]: 15.0}
+
+
+def test_pay_all_late_fees_split_over_limit():
+    # whole books are packed into charges that each stay under the limit
+    loans = [{"book_id": i, "title": f"B{i}", "fee_amount": fee} for i, fee in enumerate((15.0, 15.0, 9.5, 4.5, 1.0))]
+
+    batches = split_fee_charges(loans, charge_limit=20.0)
+
+    assert all(sum(loan["fee_amount"] for loan in batch) <= 20.0 for batch in batches)
+    assert sorted(loan["book_id"] for batch in batches for loan in batch) == [0, 1, 2, 3, 4]
+    assert len(batches) == 3
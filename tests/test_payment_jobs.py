@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+import pytest
+
+from app import create_app
+from conftest import borrow_overdue
+from database import insert_book, get_book_by_isbn
+from services.payment_jobs import PaymentJobQueue, set_payment_queue
+
+
+class LocalGateway:
+    """Stand-in for PaymentGateway: same interface, short delay, records concurrency."""
+
+    def __init__(self, delay=0.05, succeed=True):
+        self.delay = delay
+        self.succeed = succeed
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def process_payment(self, patron_id, amount, description=""):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if not self.succeed:
+            return False, "", "Payment declined"
+        return True, f"txn_{patron_id}_{self.calls}", f"Payment of ${amount:.2f} processed successfully"
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get_job(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.fixture
+def queue():
+    gateway = LocalGateway()
+    queue = PaymentJobQueue(gateway, max_workers=8, max_concurrency=2)
+    yield queue
+    queue.shutdown()
+
+
+@pytest.fixture
+def client(temp_db, queue):
+    app = create_app()
+    app.config["TESTING"] = True
+    set_payment_queue(queue)
+    yield app.test_client()
+    set_payment_queue(None)
+
+
+# **************** Negative Test Cases ****************
+def test_payment_jobs_no_fee_fails(temp_db, queue):
+    insert_book("On Time", "Author", "1000000000001", 1, 1)
+    job_id = queue.submit_late_fee_payment("123456", get_book_by_isbn("1000000000001")["id"])
+
+    job = wait_for(queue, job_id)
+    assert job["status"] == "failed"
+    assert "No late fees to pay" in job["message"]
+
+
+def test_payment_jobs_gateway_exception(temp_db):
+    class BrokenGateway(LocalGateway):
+        def process_payment(self, *args, **kwargs):
+            raise ConnectionError("gateway down")
+
+    queue = PaymentJobQueue(BrokenGateway())
+    job_id = queue.submit_late_fee_payment("123456", borrow_overdue("123456", "1000000000002"))
+
+    job = wait_for(queue, job_id)
+    queue.shutdown()
+    assert job["status"] == "failed"
+    assert "gateway down" in job["message"]
+
+
+def test_payment_jobs_api_validation(client):
+    assert client.post("/api/payments", json={"patron_id": "12", "book_id": 1}).status_code == 400
+    assert client.post("/api/payments", json={"patron_id": "123456", "book_id": "x"}).status_code == 400
+    assert client.get("/api/payments/unknown").status_code == 404
+    # JSON that isn't an object is rejected, not a 500
+    for body in (["123456", 1], "123456"):
+        response = client.post("/api/payments", json=body)
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+
+# **************** Positive Test Cases ****************
+def test_payment_jobs_return_immediately_and_bound_concurrency(temp_db, queue):
+    # submitting doesn't wait on the gateway, and only 2 gateway calls ever overlap
+    book_ids = [borrow_overdue(f"{200000 + i}", f"200000000000{i}") for i in range(6)]
+
+    start = time.perf_counter()
+    job_ids = [queue.submit_late_fee_payment(f"{200000 + i}", book_id) for i, book_id in enumerate(book_ids)]
+    assert time.perf_counter() - start < queue.gateway.gateway.delay
+
+    jobs = [wait_for(queue, job_id) for job_id in job_ids]
+    assert all(job["status"] == "succeeded" for job in jobs)
+    assert all(job["transaction_id"].startswith("txn_") for job in jobs)
+    assert queue.gateway.gateway.max_in_flight == 2
+
+
+def test_payment_jobs_api_round_trip(client, queue):
+    book_id = borrow_overdue("123456", "1000000000003")
+
+    response = client.post("/api/payments", json={"patron_id": "123456", "book_id": book_id})
+    assert response.status_code == 202
+    body = response.get_json()
+
+    wait_for(queue, body["job_id"])
+    job = client.get(body["status_url"]).get_json()
+    assert job["status"] == "succeeded"
+    assert "Payment successful" in job["message"]
+
+
+def test_payment_jobs_polled_from_another_worker(client, queue):
+    # job state is in SQLite, so a poll that reaches a different worker's queue still finds it
+    book_id = borrow_overdue("123456", "1000000000004")
+    job_id = client.post("/api/payments", json={"patron_id": "123456", "book_id": book_id}).get_json()["job_id"]
+    wait_for(queue, job_id)
+
+    other_worker = PaymentJobQueue(LocalGateway())
+    set_payment_queue(other_worker)
+    job = client.get(f"/api/payments/{job_id}").get_json()
+    other_worker.shutdown()
+
+    assert job["status"] == "succeeded"
+    assert job["params"] == {"patron_id": "123456", "book_id": book_id}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_payment_jobs_polled_from_another_process(temp_db, queue):
+    job_id = queue.submit("noop", lambda gateway: (True, "done", "txn_noop"))
+    wait_for(queue, job_id)
+
+    pid = os.fork()
+    if pid == 0:
+        job = PaymentJobQueue(LocalGateway()).get_job(job_id)
+        os._exit(0 if job and job["transaction_id"] == "txn_noop" and job["success"] is True else 1)
+
+    assert os.waitpid(pid, 0)[1] == 0
+
+
+def test_payment_jobs_forget_oldest_finished(temp_db):
+    # only max_jobs are tracked; the oldest finished job is dropped first
+    queue = PaymentJobQueue(LocalGateway(), max_jobs=2)
+    job_ids = []
+    for _ in range(3):
+        job_ids.append(queue.submit("noop", lambda gateway: (True, "done", None)))
+        wait_for(queue, job_ids[-1])
+    queue.shutdown()
+
+    assert queue.get_job(job_ids[0]) is None
+    assert queue.get_job(job_ids[1])["status"] == "succeeded"
+    assert queue.get_job(job_ids[2])["status"] == "succeeded"
@@ -0,0 +1,180 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import borrow_overdue
+from database import get_pool_stats
+from services.fee_service import sweep_late_fees
+from services import library_service
+from services.library_service import (
+    pay_late_fees, pay_all_late_fees, refund_late_fee_payment,
+    calculate_late_fee_for_book, PaymentGateway
+)
+from services import payment_ledger
+
+
+def gateway_charging(mocker, *transaction_ids):
+    gateway = mocker.Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = [(True, txn, "ok") for txn in transaction_ids]
+    gateway.refund_payment.return_value = (True, "Refund processed")
+    return gateway
+
+
+# **************** Negative Test Cases ****************
+def test_ledger_declined_payment_frees_key(temp_db, mocker):
+    # a declined charge leaves nothing recorded, so the same key can be retried
+    book_id = borrow_overdue("123456", "3000000000001", 10)
+    gateway = mocker.Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = [(False, "", "Card declined"), (True, "txn_ok", "ok")]
+
+    first = pay_late_fees("123456", book_id, gateway, idempotency_key="click-1")
+    second = pay_late_fees("123456", book_id, gateway, idempotency_key="click-1")
+
+    assert first[0] == False
+    assert second[0] == True
+    assert second[2] == "txn_ok"
+    assert gateway.process_payment.call_count == 2
+
+
+def test_ledger_pending_key_is_not_charged_twice(temp_db, mocker):
+    # a key whose first attempt is still at the gateway is not charged again
+    book_id = borrow_overdue("123456", "3000000000002", 10)
+    payment_ledger.start_payment("123456", 6.5, [], "click-2")
+    gateway = gateway_charging(mocker, "txn_2")
+
+    success, message, txn = pay_late_fees("123456", book_id, gateway, idempotency_key="click-2")
+
+    assert success == False
+    assert "already being processed" in message
+    gateway.process_payment.assert_not_called()
+
+
+def test_ledger_concurrent_payments_without_key_charge_once(temp_db, mocker):
+    # both requests price the fee before either records its payment
+    book_id = borrow_overdue("123456", "3000000000009", 10)
+    barrier = threading.Barrier(2)
+    price = library_service.calculate_late_fee_for_book
+
+    def priced_together(patron_id, book_id):
+        fee = price(patron_id, book_id)
+        barrier.wait(timeout=5)
+        return fee
+
+    mocker.patch("services.library_service.calculate_late_fee_for_book", side_effect=priced_together)
+    gateway = gateway_charging(mocker, "txn_a", "txn_b")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pay_late_fees("123456", book_id, gateway)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(result[0] for result in results) == [False, True]
+    assert "already being paid" in next(result[1] for result in results if not result[0])
+    assert gateway.process_payment.call_count == 1
+
+
+def test_ledger_pending_payment_counts_as_paid(temp_db):
+    book_id = borrow_overdue("123456", "3000000000010", 10)
+    fee = calculate_late_fee_for_book("123456", book_id)
+    payment_ledger.start_payment("123456", fee["fee_amount"], [dict(fee, book_id=book_id)])
+
+    assert calculate_late_fee_for_book("123456", book_id)["fee_amount"] == 0.0
+    assert payment_ledger.start_payment("123456", fee["fee_amount"], [dict(fee, book_id=book_id)]) == (None, None)
+
+
+def test_ledger_errors_return_connection_to_pool(temp_db):
+    # a non-integrity error must roll back and still release the pooled connection
+    book_id = borrow_overdue("123456", "3000000000011", 10)
+    fee = calculate_late_fee_for_book("123456", book_id)
+
+    with pytest.raises(sqlite3.Error):
+        payment_ledger.start_payment("123456", object(), [dict(fee, book_id=book_id)])
+    with pytest.raises(sqlite3.Error):
+        payment_ledger.reserve_refund("txn_x", object())
+
+    assert get_pool_stats()["in_use"] == 0
+    assert payment_ledger.start_payment("123456", fee["fee_amount"], [dict(fee, book_id=book_id)])[0]
+
+
+def test_ledger_refund_over_amount_paid(temp_db, mocker):
+    book_id = borrow_overdue("123456", "3000000000003", 10)
+    gateway = gateway_charging(mocker, "txn_3")
+    pay_late_fees("123456", book_id, gateway)
+
+    assert refund_late_fee_payment("txn_3", 4.0, gateway)[0] == True
+    success, message = refund_late_fee_payment("txn_3", 3.0, gateway)
+
+    assert success == False
+    assert "exceeds the amount paid" in message
+    assert gateway.refund_payment.call_count == 1
+
+
+def test_ledger_declined_refund_is_released(temp_db, mocker):
+    book_id = borrow_overdue("123456", "3000000000004", 10)
+    gateway = gateway_charging(mocker, "txn_4")
+    pay_late_fees("123456", book_id, gateway)
+    gateway.refund_payment.return_value = (False, "Gateway unavailable")
+
+    assert refund_late_fee_payment("txn_4", 6.5, gateway)[0] == False
+    assert payment_ledger.find_payment_by_transaction("txn_4")["refunded_amount"] == 0
+
+
+# **************** Positive Test Cases ****************
+def test_ledger_retry_short_circuits(temp_db, mocker):
+    # the same idempotency key returns the first result without a second charge
+    book_id = borrow_overdue("123456", "3000000000005", 10)
+    gateway = gateway_charging(mocker, "txn_5", "txn_5b")
+
+    first = pay_late_fees("123456", book_id, gateway, idempotency_key="click-5")
+    second = pay_late_fees("123456", book_id, gateway, idempotency_key="click-5")
+
+    assert first == second
+    assert first[2] == "txn_5"
+    gateway.process_payment.assert_called_once()
+
+
+def test_ledger_records_payment_and_allocation(temp_db, mocker):
+    book_id = borrow_overdue("123456", "3000000000006", 10)
+    gateway = gateway_charging(mocker, "txn_6")
+
+    pay_late_fees("123456", book_id, gateway, idempotency_key="click-6")
+
+    payment = payment_ledger.find_payment("click-6")
+    assert payment["status"] == "completed"
+    assert payment["transaction_id"] == "txn_6"
+    assert payment["amount"] == 6.5
+    allocations = payment_ledger.get_payment_allocations(payment["id"])
+    assert [(a["book_id"], a["amount"]) for a in allocations] == [(book_id, 6.5)]
+
+
+def test_ledger_paid_fees_are_excluded(temp_db, mocker):
+    # once paid, a book's fee is no longer owed anywhere fees are computed
+    book_id = borrow_overdue("123456", "3000000000007", 10)
+    other_id = borrow_overdue("123456", "3000000000008", 3)
+    gateway = gateway_charging(mocker, "txn_7")
+
+    pay_late_fees("123456", book_id, gateway)
+
+    assert calculate_late_fee_for_book("123456", book_id)["fee_amount"] == 0
+    assert calculate_late_fee_for_book("123456", other_id)["fee_amount"] == 1.5
+    sweep = {row["patron_id"]: row for row in sweep_late_fees()}
+    assert sweep["123456"]["total_fee"] == 1.5
+    assert pay_late_fees("123456", book_id, gateway)[1] == "No late fees to pay for this book."
+
+
+def test_ledger_records_pay_all_charges(temp_db, mocker):
+    for i in range(2):
+        borrow_overdue("123456", f"300000000001{i}", 30)
+    gateway = gateway_charging(mocker, "txn_all")
+
+    success, message, charges = pay_all_late_fees("123456", gateway)
+
+    assert success == True
+    payment = payment_ledger.find_payment_by_transaction("txn_all")
+    assert payment["amount"] == 30.0
+    assert len(payment_ledger.get_payment_allocations(payment["id"])) == 2
+    # a ledger payment can be refunded beyond the per-book cap, up to what was paid
+    assert refund_late_fee_payment("txn_all", 20.0, gateway)[0] == True
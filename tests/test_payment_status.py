@@ -0,0 +1,127 @@
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from services import payment_ledger
+from services.payment_status import (
+    PaymentStatusCache, status_cache, verify_payment, verify_many, reconcile_payments
+)
+
+
+class StatusGateway:
+    """Stand-in for PaymentGateway.verify_payment_status with a short delay and scripted statuses."""
+
+    def __init__(self, statuses=None, delay=0.05, fail=()):
+        self.statuses = statuses or {}
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def verify_payment_status(self, transaction_id):
+        with self._lock:
+            self.calls.append(transaction_id)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self._in_flight -= 1
+        if transaction_id in self.fail:
+            raise ConnectionError("gateway unreachable")
+        return {"transaction_id": transaction_id, "status": self.statuses.get(transaction_id, "completed")}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def empty_status_cache():
+    status_cache.clear()
+    yield
+    status_cache.clear()
+
+
+# **************** Negative Test Cases ****************
+def test_status_cache_pending_expires():
+    clock = FakeClock()
+    cache = PaymentStatusCache(pending_ttl=10, clock=clock)
+    cache.put("txn_1", {"status": "pending"})
+    cache.put("txn_2", {"status": "completed"})
+
+    clock.now = 11
+
+    assert cache.get("txn_1") is None
+    assert cache.get("txn_2") == {"status": "completed"}
+
+
+def test_status_cache_errors_not_cached():
+    gateway = StatusGateway(fail={"txn_bad"}, delay=0)
+
+    first = verify_many(["txn_bad"], gateway)
+    verify_many(["txn_bad"], gateway)
+
+    assert first["txn_bad"]["status"] == "error"
+    assert gateway.calls == ["txn_bad", "txn_bad"]
+
+
+def test_status_cache_reconcile_reports_unsettled(temp_db):
+    for txn in ("txn_a", "txn_b"):
+        payment_id, _ = payment_ledger.start_payment("123456", 5.0, [])
+        payment_ledger.complete_payment(payment_id, txn, "ok")
+    timed_out, _ = payment_ledger.start_payment("654321", 7.5, [])
+    payment_ledger.mark_payment_unknown(timed_out, "Payment gateway did not respond within 2s")
+    gateway = StatusGateway({"txn_b": "pending"}, delay=0)
+
+    report = reconcile_payments(date.today(), gateway)
+
+    assert report["payments"] == 2
+    assert report["completed"] == 1
+    assert report["unsettled"] == [{"transaction_id": "txn_b", "amount": 5.0, "status": "pending"}]
+    assert report["unknown"] == [{"payment_id": timed_out, "patron_id": "654321", "amount": 7.5}]
+
+
+# **************** Positive Test Cases ****************
+def test_status_cache_completed_served_locally():
+    gateway = StatusGateway(delay=0)
+
+    verify_payment("txn_1", gateway)
+    status = verify_payment("txn_1", gateway)
+
+    assert status["status"] == "completed"
+    assert gateway.calls == ["txn_1"]
+
+
+def test_status_cache_verify_many_is_concurrent():
+    # 64 checks of 50ms each finish in a fraction of the serial 3.2s, within the worker bound
+    gateway = StatusGateway()
+    ids = [f"txn_{i}" for i in range(64)]
+
+    start = time.perf_counter()
+    results = verify_many(ids + ids[:10], gateway, max_workers=16)
+    elapsed = time.perf_counter() - start
+
+    assert set(results) == set(ids)
+    assert len(gateway.calls) == 64
+    assert gateway.max_in_flight <= 16
+    assert elapsed < 1.5
+
+
+def test_status_cache_verify_many_uses_cache():
+    gateway = StatusGateway(delay=0)
+    verify_many(["txn_1", "txn_2"], gateway)
+    hits = status_cache.stats()["hits"]
+
+    verify_many(["txn_1", "txn_2", "txn_3"], gateway)
+
+    assert gateway.calls.count("txn_1") == 1
+    assert gateway.calls.count("txn_3") == 1
+    assert status_cache.stats()["hits"] - hits == 2
@@ -0,0 +1,70 @@
+import statistics
+import time
+
+import database
+from app import create_app
+from database import get_all_books, insert_books_bulk
+
+# create_app() on an up-to-date database, median of several runs
+STARTUP_BUDGET_SECONDS = 0.25
+
+
+def schema_state():
+    conn = database.get_db_connection()
+    state = (conn.execute("PRAGMA user_version").fetchone()[0],
+             conn.execute("PRAGMA schema_version").fetchone()[0])
+    conn.close()
+    return state
+
+
+# **************** Negative Test Cases ****************
+def test_startup_skips_sample_data_by_default(temp_db, mocker, monkeypatch):
+    monkeypatch.delenv("LIBRARY_SAMPLE_DATA", raising=False)
+    spy = mocker.spy(database, "add_sample_data")
+
+    create_app()
+
+    assert get_all_books() == []
+    spy.assert_not_called()
+
+
+def test_startup_runs_no_migrations_when_current(temp_db):
+    # the schema was migrated by the fixture: startup only reads user_version
+    before = schema_state()
+
+    create_app()
+
+    assert schema_state() == before
+    conn = database.get_db_connection()
+    assert database.migrate_database(conn) == 0
+    conn.close()
+
+
+# **************** Positive Test Cases ****************
+def test_startup_sample_data_flag(temp_db):
+    create_app(sample_data=True)
+    create_app(sample_data=True)
+
+    # added once, only to an empty catalog
+    assert len(get_all_books()) == 3
+
+
+def test_startup_migrates_fresh_database(temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "fresh.db"))
+
+    create_app()
+
+    assert schema_state()[0] == database.SCHEMA_VERSION
+
+
+def test_startup_within_budget(temp_db):
+    insert_books_bulk([(f"Book {i}", "Author", f"{1000000000000 + i}", 1, 1) for i in range(20000)])
+    create_app()
+
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        create_app(sample_data=True)
+        timings.append(time.perf_counter() - start)
+
+    assert statistics.median(timings) < STARTUP_BUDGET_SECONDS
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+import database
+from database import get_db_connection, get_storage_settings, insert_book, get_all_books, get_book_by_isbn
+
+
+def use_profile(monkeypatch, profile):
+    # connections pick up the profile when they are opened, so drop the pooled ones
+    database.close_db_connections()
+    monkeypatch.setattr(database, "STORAGE_PROFILE", profile)
+
+
+# **************** Negative Test Cases ****************
+def test_storage_profile_unknown_name(temp_db, monkeypatch):
+    # an unknown profile name should fail loudly instead of silently using defaults
+    use_profile(monkeypatch, "no_such_profile")
+
+    with pytest.raises(KeyError):
+        get_db_connection()
+
+
+# **************** Positive Test Cases ****************
+def test_storage_profile_wal_settings(temp_db, monkeypatch):
+    # the default profile puts the database in WAL mode with the tuned PRAGMAs
+    use_profile(monkeypatch, "wal")
+    settings = get_storage_settings()
+
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 1  # NORMAL
+    assert settings["busy_timeout"] == 5000
+    assert settings["cache_size"] == -16000
+
+
+def test_storage_profile_concurrent_writers_begin_immediate(temp_db, monkeypatch):
+    use_profile(monkeypatch, "concurrent")
+    settings = get_storage_settings()
+
+    assert settings["journal_mode"] == "wal"
+    assert settings["isolation_level"] == "IMMEDIATE"
+
+
+def test_storage_profile_writer_not_blocked_by_open_reader(temp_db, monkeypatch):
+    # in WAL mode a commit does not have to wait for a reader's transaction to finish,
+    # and the reader keeps its consistent snapshot
+    use_profile(monkeypatch, "wal")
+    insert_book("Before", "Author", "1000000000001", 1, 1)
+
+    reader = get_db_connection()
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT COUNT(*) FROM books").fetchone()[0] == 1
+
+    start = time.perf_counter()
+    assert insert_book("During", "Author", "1000000000002", 1, 1) == True
+    assert time.perf_counter() - start < 1.0
+
+    assert reader.execute("SELECT COUNT(*) FROM books").fetchone()[0] == 1
+    reader.close()
+    assert len(get_all_books()) == 2
+
+
+def test_storage_profile_readers_and_writers_load(temp_db, monkeypatch):
+    # small load test: catalog readers and borrow-style writers run side by side without lock errors
+    use_profile(monkeypatch, "concurrent")
+    insert_book("Load Book", "Author", "2000000000000", 1000, 1000)
+    book_id = get_book_by_isbn("2000000000000")["id"]
+    errors = []
+    reads = []
+    writes = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                get_all_books()
+                reads.append(1)
+            except Exception as e:
+                errors.append(e)
+
+    def writer():
+        for _ in range(50):
+            if not database.update_book_availability(book_id, -1):
+                errors.append("write failed")
+            writes.append(1)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer) for _ in range(4)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+
+    assert errors == []
+    assert len(writes) == 200
+    assert len(reads) > 0
+    assert get_book_by_isbn("2000000000000")["available_copies"] == 800
@@ -0,0 +1,63 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+import database
+
+fork_only = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+
+def in_child(check):
+    """Run check() in a forked child and return its exit status (0 = passed)."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if check() else 1)
+        except BaseException:
+            os._exit(2)
+    return os.waitpid(pid, 0)[1]
+
+
+# **************** Negative Test Cases ****************
+@fork_only
+def test_wsgi_child_drops_inherited_pool(temp_db):
+    # a forked worker must not reuse (or close) the parent's SQLite connections
+    database.get_db_connection().close()
+    parent_pool = database.get_pool()
+
+    status = in_child(lambda: database.get_pool() is not parent_pool
+                      and parent_pool in database._inherited_pools)
+
+    assert status == 0
+    assert database.get_pool() is parent_pool
+
+
+# **************** Positive Test Cases ****************
+def test_wsgi_app_preloads_without_open_connections(temp_db):
+    sys.modules.pop("wsgi", None)
+    wsgi = importlib.import_module("wsgi")
+
+    assert wsgi.app.name == "app"
+    assert database._pool is None
+
+
+@fork_only
+def test_wsgi_child_can_query(temp_db):
+    database.insert_book("Fork Book", "Author", "1234567890123", 1, 1)
+
+    status = in_child(lambda: database.get_book_by_isbn("1234567890123")["title"] == "Fork Book")
+
+    assert status == 0
+
+
+def test_wsgi_gunicorn_config():
+    config = {}
+    exec(open(os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")).read(), config)
+
+    assert config["preload_app"] is True
+    assert config["worker_class"] == "gthread"
+    assert callable(config["worker_exit"])
+    assert config["workers"] >= 1 and config["threads"] >= 1
+    assert config["graceful_timeout"] > 0 and config["keepalive"] > 0
@@ -0,0 +1,17 @@
+"""
+WSGI entry point for production serving, e.g.:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is created once here; with preload_app the pre-fork server imports
+this module in the master process and every worker inherits the result.
+"""
+
+from app import create_app
+from database import close_db_connections
+
+app = create_app()
+
+# Workers are forked from this process: don't let SQLite connections opened
+# while creating the app cross the fork
+close_db_connections()